@@ -1,3 +1,25 @@
-from magpie_ml.analytics import analytics
-from magpie_ml.layout import layout
+import importlib
+import sys
+import types
+
 from magpie_ml.logger import logger
+
+#   analytics and layout depend on pandas and matplotlib, they are imported 
+#   on the first access, so that a process running the logger stays small
+_lazyClasses = ('analytics', 'layout')
+
+def __getattr__(name):
+    if name in _lazyClasses:
+        # importing the submodule binds the class to the package (see below)
+        importlib.import_module('magpie_ml.' + name)
+        return globals()[name]
+    raise AttributeError("module 'magpie_ml' has no attribute '" + name + "'")
+
+class _package(types.ModuleType):
+    # importing a submodule binds it to the package, keep the class instead
+    def __setattr__(self, name, value):
+        if name in _lazyClasses and isinstance(value, types.ModuleType):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+sys.modules[__name__].__class__ = _package
@@ -9,6 +9,37 @@ Created on Thu Dec 31 19:35:19 2020
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+from collections import OrderedDict
+from magpie_ml.renderer import textCollection
+from magpie_ml.storage import sqliteStore, isSqliteFile
+from magpie_ml.segments import openLog
+from magpie_ml.export import isParquetDataset, exportParquet, readParquetEvents, readParquetStrokes, dictionaryCodes
+from magpie_ml.query import analyticsQuery
+from magpie_ml import parallel
+from magpie_ml.kernels import chronologicalDtype, cellStatistics, flightMatrices, concurrencyTimeline, rolloverMatrices, normalizeByDistance
+
+#%% selection of memoized results
+def _copyResult(result):
+    # the memoized arrays are never handed out
+    if(isinstance(result, np.ndarray)):
+        return result.copy()
+    if(isinstance(result, tuple)):
+        return tuple(_copyResult(r) for r in result)
+    if(isinstance(result, dict)):
+        return {k: _copyResult(r) for k, r in result.items()}
+    return result
+
+def _selectButtons(result, index):
+    # (mean, var, count) of every button
+    return tuple(r[index] for r in result)
+
+def _selectPaired(result, index):
+    # (table, offsets, unmatched) of getPairedTiming
+    table, offsets, unmatched = result
+    sizes = offsets[index + 1] - offsets[index]
+    selected = np.concatenate([table[:0]] + [table[offsets[i]:offsets[i+1]] for i in index])
+    selected['button'] = np.repeat(np.arange(len(index), dtype=selected['button'].dtype), sizes)
+    return selected, np.concatenate(([0], np.cumsum(sizes))).astype(np.int64), {k: u[index] for k, u in unmatched.items()}
 
 #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% ANALYTICS %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
@@ -21,19 +52,94 @@ class analytics:
     useful timing information, while handling possible 
     missing data (NaNs).
 
+    The log is either a text file of the logger or an SQLite database 
+    (logger(..., backend='sqlite')). The events of a database are read 
+    on the first use and only within the time window and the buttons 
+    requested, the methods getDwellStatistics and getTransitionStatistics 
+    are computed by the database without reading the events. 
+    A Parquet dataset (exportParquet(path)) is read in the same way, 
+    only the columns and the row groups needed by the request are read. 
+    A compressed log (logger(..., compression='gzip')) is decompressed 
+    in chunks while it is parsed.
+
+    The results of getPairedTiming, getDwellStatistics, 
+    getTransitionStatistics, getFlightMatrices and getRollover are 
+    memoized in an LRU cache under (method, buttons, parameters, 
+    version of the data). The key strokes and the dwell time of a subset 
+    of buttons are selected from the result of all buttons (computed 
+    once), the cache is invalidated when the events are loaded or 
+    appended (appendLog(path)).
+
+    The key strokes and the transitions of a large log are computed by 
+    "processes" processes (see the module parallel), the events are 
+    split into partitions and the partial results are merged.
+
     Attributes:
 
     Methods:
-        analytics(buttons, path='loggedData.txt')
+        analytics(buttons, path='loggedData.txt', window=None, buttonFilter=None, cacheSize=32, processes=1)
+        appendLog(path)
+        query()
+        getDwellStatistics(buttons=buttons)
+        getTransitionStatistics(timeLimit, buttons=buttons)
         getTiming(buttons=buttons)
+        getPairedTiming(buttons=buttons)
+        getFlightMatrices(timeLimit, buttons=buttons, distance=None)
+        getRollover(buttons=buttons)
+        getGroupStatistics(groups, timeLimit, buttons=buttons)
         getChronologicalTiming(buttons=buttons)
         getChronOccuranceyMatrix(eventList, buttons=buttons)
         plotMatrixHeatmap(ax, matrix, buttons, defaultLook=True)
+        exportParquet(path, rowGroupSize=65536, compression='zstd')
         
     """
-    def __init__(self, buttons, path='loggedData.txt'):
-        # read data
-        self._df = pd.read_csv(path, delimiter='\t')
+    def __init__(self, buttons, path='loggedData.txt', window=None, buttonFilter=None, cacheSize=32, processes=1):
+        """Inits analytics class.
+        
+        Arguments:
+            buttons: list(<str>)
+                Default list of buttons of the methods.
+            path: <str>
+                'loggedData.txt': (default) path to the text log 
+                    (plain or compressed segments), the SQLite database 
+                    of the logger or the directory of a Parquet dataset
+            window: (<float>, <float>)
+                None: (default) all events
+                (start, end): events with start <= Time <= end, where the 
+                    appended sessions continue 60 [s] after each other
+            buttonFilter: list(<str>)
+                None: (default) events of all buttons
+                list: events of the listed buttons only
+            cacheSize: <int>
+                32: (default) number of memoized results (0 disables 
+                    the memo)
+            processes: <int>
+                1: (default) compute in the current process
+                None: number of CPUs
+                <int>: number of processes of the key strokes and the 
+                    transitions of a large log
+        """
+        # get all symbols recognized by keyboardLayout
+        self._buttons = buttons
+        self._window = window
+        self._buttonFilter = buttonFilter
+        # memoized results, the version changes with the events
+        self._cache = OrderedDict()
+        self._cacheSize = cacheSize
+        self._version = 0
+        self._processes = processes
+        # database or dataset: the events are read on the first use of self._df
+        self._store = None
+        self._parquet = None
+        if(isSqliteFile(path)):
+            self._store = sqliteStore(path)
+            return
+        if(isParquetDataset(path)):
+            self._parquet = path
+            return
+        # read data (a compressed log is decompressed while parsing)
+        with openLog(path) as f:
+            self._df = pd.read_csv(f, delimiter='\t')
 #        self._df['Time']   = self._df['Time'].astype(float)
         self._df['Key']    = self._df['Key'].str.strip()
         self._df['Button'] = self._df['Button'].str.strip()
@@ -41,6 +147,8 @@ class analytics:
         
         # check appended data (every appended data start by headline "Time	Key	Button	Event")
         appendEvents = self._df.loc[(self._df['Time'] == 'Time')]
+        # every appended session restarts the button counters
+        self._df['Session'] = (self._df['Time'] == 'Time').cumsum()
         # get last line
         lastLineIdx = self._df.tail(1).index[0]
         
@@ -65,13 +173,286 @@ class analytics:
                 
         # drop header lines
         self._df = self._df.drop(appendEvents.index.values)
-
-        # get all symbols recognized by keyboardLayout
-        self._buttons = buttons
+        
+        # keep the requested events only
+        if(window is not None):
+            self._df = self._df.loc[(self._df['Time'] >= window[0]) & (self._df['Time'] <= window[1])]
+        if(buttonFilter is not None):
+            self._df = self._df.loc[self._df['Button'].isin(buttonFilter)]
+    
+    #%% events of a database
+    def __getattr__(self, name):
+        # the events of a database are read on the first use
+        if(name == '_df' and self.__dict__.get('_store', None) is not None):
+            self._df = self._readStore()
+            self._version += 1
+            return self._df
+        if(name == '_df' and self.__dict__.get('_parquet', None) is not None):
+            self._df = self._readParquet()
+            self._version += 1
+            return self._df
+        raise AttributeError("'analytics' object has no attribute '"+name+"'")
+    
+    def _readStore(self, chunkSize=100000):
+        """Read the events of the database in chunks.
+        
+        Arguments:
+            chunkSize: <int>
+                100000: (default) rows read at once
+                    
+        Returns:
+            <DataFrame>
+                Columns 'Time', 'Key', 'Button', 'Event', 'Session' 
+                (as parsed from a text log).
+        """
+        columns = ['Session', 'Time', 'Key', 'Button', 'Event']
+        cursor = self._store.readEvents(self._window, self._buttonFilter)
+        chunks = [pd.DataFrame.from_records([], columns=columns)]
+        while True:
+            rows = cursor.fetchmany(chunkSize)
+            if(len(rows) == 0):
+                break
+            chunks.append(pd.DataFrame.from_records(rows, columns=columns))
+        df = pd.concat(chunks, ignore_index=True)
+        df = df.astype({'Session': int, 'Time': float, 'Event': int})
+        return df[['Time', 'Key', 'Button', 'Event', 'Session']]
+    
+    def _readParquet(self):
+        """Read the events of the Parquet dataset.
+        
+        Returns:
+            <DataFrame>
+                Columns 'Time', 'Key', 'Button', 'Event', 'Session' 
+                (as parsed from a text log).
+        """
+        table = readParquetEvents(self._parquet, self._window, self._buttonFilter)
+        df = pd.DataFrame({'Time':    table['time'].to_numpy(),
+                           'Key':     table['key'].to_pandas().astype(object).values,
+                           'Button':  table['button'].to_pandas().astype(object).values,
+                           'Event':   table['event'].to_numpy().astype(int),
+                           'Session': table['session'].to_numpy().astype(int)})
+        return df
+    
+    #%% append a log
+    def appendLog(self, path):
+        """Append the sessions of another log
+        
+        The log is parsed as by analytics(buttons, path) with the same 
+        buttonFilter, its sessions continue 60 [s] after the last event 
+        (the window is not applied to the appended events). The memoized 
+        results are invalidated.
+        
+        Arguments:
+            path: <str>
+                Path to the text log, the SQLite database or the 
+                directory of a Parquet dataset.
+                    
+        Returns:
+            <int>
+                Number of appended events.
+            
+        Raises:
+        """
+        df = analytics(self._buttons, path, buttonFilter=self._buttonFilter, cacheSize=0, processes=1)._df.copy()
+        if(len(self._df) > 0):
+            df['Time']    = df['Time'] + self._df['Time'].max() + 60
+            df['Session'] = df['Session'] + self._df['Session'].max() + 1
+        self._df = pd.concat([self._df, df[self._df.columns]], ignore_index=True)
+        self._version += 1
+        return len(df)
+    
+    #%% lazy query of several statistics
+    def query(self):
+        """Start a lazy query of several statistics computed in one pass
+        
+        See query.analyticsQuery, e.g.
+            log.query().window(t0, t1).buttons(buttons).dwell().transitions(1.5).execute()
+                    
+        Returns:
+            <analyticsQuery>
+            
+        Raises:
+        """
+        return analyticsQuery(self)
+    
+    #%% memoized results
+    def _memo(self, method, buttons, parameters, compute, select=None):
+        """Get the memoized result of a method, compute it on a miss.
+        
+        Arguments:
+            method: <str>
+                Name of the method.
+            buttons: list(<str>)
+            parameters: tuple
+                Other (hashable) parameters of the method.
+            compute: function(buttons)
+                Result of the method for the buttons.
+            select: function(result, index)
+                None: (default) the result is memoized for "buttons" only
+                function: selects the buttons at "index" of a result, 
+                    the result of a subset of the default buttons is 
+                    selected from the result of the default buttons
+                    
+        Returns:
+            Copy of the result.
+        """
+        if(self._cacheSize <= 0):
+            return compute(buttons)
+        buttons = tuple(buttons)
+        key = (method, buttons, parameters, self._version)
+        if(key not in self._cache):
+            source = None
+            if(select is not None):
+                # the most recent result of a superset of buttons
+                requested = set(buttons)
+                for cached in reversed(self._cache):
+                    if(cached[0] == method and cached[2:] == key[2:] and requested.issubset(cached[1])):
+                        source = cached
+                        break
+                if(source is None and requested.issubset(self._buttons) and buttons != tuple(self._buttons)):
+                    source = (method, tuple(self._buttons), parameters, self._version)
+                    self._remember(source, compute(list(source[1])))
+            if(source is None):
+                result = compute(list(buttons))
+            else:
+                self._cache.move_to_end(source)
+                index = {b: i for i, b in enumerate(source[1])}
+                result = select(self._cache[source], np.array([index[b] for b in buttons], dtype=np.int64))
+            self._remember(key, result)
+        self._cache.move_to_end(key)
+        return _copyResult(self._cache[key])
+    
+    def _remember(self, key, result):
+        # keep the "cacheSize" most recently used results
+        self._cache[key] = result
+        while len(self._cache) > self._cacheSize:
+            self._cache.popitem(last=False)
+    
+    #%% export
+    def exportParquet(self, path, rowGroupSize=65536, compression='zstd'):
+        """Write the events and the key strokes to a Parquet dataset
+        
+        See export.exportParquet(...), the dataset is read back by 
+        analytics(buttons, path).
+        
+        Arguments:
+            path: <str>
+                Directory of the dataset.
+            rowGroupSize: <int>
+                65536: (default) the largest number of rows of a row group
+            compression: <str>
+                'zstd': (default) compression of the Parquet files
+                    
+        Returns:
+            dict{'events': <int>, 'strokes': <int>}
+                Number of written events and key strokes.
+            
+        Raises:
+            Exception: pyarrow is not installed.
+        """
+        return exportParquet(self, path, rowGroupSize, compression)
+    
+    #%% buttons of the aggregations
+    def _queryButtons(self, buttons):
+        # buttons left out by buttonFilter have no events
+        if(self._buttonFilter is None):
+            return list(buttons)
+        return [b for b in buttons if b in set(self._buttonFilter)]
+        
+    #%% dwell time statistics
+    def getDwellStatistics(self, buttons=[]):
+        """Get statistics of the time buttons are held down
+        
+        With a database the statistics are computed by the database, 
+        with a Parquet dataset only the dwell column of the key strokes 
+        is read.
+        
+        Arguments:
+            buttons: list(<str>)
+                buttons: (default) list of buttons
+                    
+        Returns:
+            (mean, var, count): (<array(B)>, <array(B)>, <array(B)>)
+                Mean (NaN without key stroke), variance (NaN below 
+                2 key strokes) and count of the dwell time [s] of every 
+                button.
+            
+        Raises:
+        """
+        if(len(buttons)==0):
+            buttons = self._buttons
+        return self._memo('getDwellStatistics', buttons, (), self._getDwellStatistics, _selectButtons)
+    
+    def _getDwellStatistics(self, buttons):
+        """Dwell statistics of the buttons (not memoized)."""
+        if(self._store is not None and '_df' not in self.__dict__):
+            rows = self._store.queryDwell(self._queryButtons(buttons), self._window)
+            statistics = np.array([rows.get(b, (np.nan, np.nan, 0)) for b in buttons], dtype=float).reshape(-1, 3)
+            return statistics[:, 0], statistics[:, 1], statistics[:, 2]
+        if(self._parquet is not None and '_df' not in self.__dict__):
+            strokes = readParquetStrokes(self._parquet, self._window, self._queryButtons(buttons), columns=['button', 'timeDur'])
+            return cellStatistics(dictionaryCodes(strokes['button'], buttons), strokes['timeDur'].to_numpy(), len(buttons))
+        table, offsets, unmatched = self.getPairedTiming(buttons)
+        return cellStatistics(table['button'], table['timeDur'], len(buttons))
+    
+    #%% press-to-press transition statistics
+    def getTransitionStatistics(self, timeLimit, buttons=[]):
+        """Get statistics of the time between consecutive presses
+        
+        The consecutive presses of "buttons" are paired (other buttons 
+        are left out), the element [Y, X] relates the preceding button X 
+        to the pressed button Y (as getTimeCorrelationOcccuranceMatrix). 
+        With a database the statistics are computed by the database, 
+        with a Parquet dataset only the time and the button of the 
+        presses are read.
+        
+        Arguments:
+            timeLimit: <float>
+                A time limit beyond which the transition is considered 
+                outlier and left out.
+            buttons: list(<str>)
+                buttons: (default) list of buttons
+                    
+        Returns:
+            (mean, var, count): (<matrix>, <matrix>, <matrix>)
+                Mean, variance (NaN below 2 transitions) and count 
+                of the transition time [s].
+            
+        Raises:
+        """
+        if(len(buttons)==0):
+            buttons = self._buttons
+        return self._memo('getTransitionStatistics', buttons, (timeLimit,), lambda b: self._getTransitionStatistics(timeLimit, b))
+    
+    def _getTransitionStatistics(self, timeLimit, buttons):
+        """Transition statistics of the buttons (not memoized)."""
+        B = len(buttons)
+        if(self._store is not None and '_df' not in self.__dict__):
+            index = {b: i for i, b in enumerate(buttons)}
+            mean, var, count = np.full((B, B), np.nan), np.full((B, B), np.nan), np.zeros((B, B))
+            for (button, previous), (m, v, c) in self._store.queryTransitions(self._queryButtons(buttons), timeLimit, self._window).items():
+                if(previous in index):
+                    mean[index[button], index[previous]] = m
+                    var[index[button], index[previous]] = v
+                    count[index[button], index[previous]] = c
+            return mean, var, count
+        if(self._parquet is not None and '_df' not in self.__dict__):
+            presses = readParquetEvents(self._parquet, self._window, self._queryButtons(buttons), columns=['time', 'button'], presses=True)
+            codes = dictionaryCodes(presses['button'], buttons)
+            time = presses['time'].to_numpy()
+        else:
+            presses = self._df.loc[self._df['Event'] > 0]
+            codes = pd.Categorical(presses['Button'], categories=buttons).codes
+            time = presses['Time'].values
+        return parallel.transitionStatistics(codes[codes >= 0], time[codes >= 0], B, timeLimit, processes=self._processes)
+        
         
     #%% get timing of button presses, releases and press duration
     def getTiming(self, buttons=[]):
-        """Get chronological list of events for given buttons
+        """Get timing of key strokes for given buttons
+        
+        The key strokes of all sessions are kept (see getPairedTiming),
+        presses and releases without a pair are left out.
         
         Arguments:
             buttons: list(<str>)
@@ -89,54 +470,73 @@ class analytics:
         """
         if(len(buttons)==0):
             buttons = self._buttons
-        # get the maximum count of events for every button (from event counter)
-        maxCounter = {}
-        for button in buttons:
-            tempRows = self._df.loc[(self._df['Button'] == button)]
-            if(len(tempRows['Event']>0)):
-                maxCounter[button] = max(abs(tempRows['Event']))
-            else:
-                maxCounter[button] = 0
-        # initialize dictionaries with "buttons" as keys and empty list() as values
+        table, offsets, unmatched = self.getPairedTiming(buttons)
         timeIn  = {}
         timeOut = {}
         timeDur = {}
-        for button in buttons: 
-            timeIn[button]     = np.empty(maxCounter[button])
-            timeIn[button][:]  = np.nan
-            timeOut[button]    = np.empty(maxCounter[button])
-            timeOut[button][:] = np.nan
-            timeDur[button]    = np.empty(maxCounter[button])
-            timeDur[button][:] = np.nan
-        # fill-in 
-        for time, key, button, event in zip( self._df['Time'], self._df['Key'], self._df['Button'], self._df['Event'] ):
-            if(button in buttons):
-                # decode event
-                eventType  = np.sign(event)
-                eventCount = abs(event)-1
-                # Press event
-                if(eventType>=0):
-                    timeIn[button][eventCount] = time
-                # Release event            
-                elif(eventType<0): 
-                    timeOut[button][eventCount] = time
-        for button in buttons:
-            for tPress, tRelease in zip(timeIn[button], timeOut[button]):
-                timeDur[button] = np.subtract(timeOut[button], timeIn[button])
+        for idx, button in enumerate(buttons):
+            strokes = table[offsets[idx]:offsets[idx+1]]
+            timeIn[button]  = strokes['timeIn']
+            timeOut[button] = strokes['timeOut']
+            timeDur[button] = strokes['timeDur']
         return timeIn, timeOut, timeDur
     
+    #%% pair presses and releases of key strokes
+    def getPairedTiming(self, buttons=[]):
+        """Get paired key strokes of given buttons in a flat table
+        
+        A key stroke is identified by (session, button, counter), so the 
+        appended sessions of the log do not overwrite each other. 
+        
+        Arguments:
+            buttons: list(<str>)
+                buttons: (default) list of buttons
+                    
+        Returns:
+            table: <array> of kernels.pairedDtype
+                Key strokes (button, timeIn, timeOut, timeDur), where 
+                "button" is the index in "buttons", grouped by button 
+                and chronological within a button.
+            offsets: <array(B+1)>
+                Key strokes of buttons[b] are table[offsets[b]:offsets[b+1]].
+            unmatched: dict{'press': <array(B)>, 'release': <array(B)>}
+                Number of presses (releases) without a release (press) 
+                of every button.
+            
+        Raises:
+        """
+        if(len(buttons)==0):
+            buttons = self._buttons
+        return self._memo('getPairedTiming', buttons, (), self._getPairedTiming, _selectPaired)
+    
+    def _getPairedTiming(self, buttons):
+        """Paired key strokes of the buttons (not memoized)."""
+        # integer codes of buttons (-1 for other buttons)
+        codes = pd.Categorical(self._df['Button'], categories=buttons).codes
+        rows = codes >= 0
+        table, offsets, unmatchedPress, unmatchedRelease = parallel.pairPressRelease(self._df['Session'].values[rows], 
+                                                                                      codes[rows], 
+                                                                                      self._df['Event'].values[rows], 
+                                                                                      self._df['Time'].values[rows], 
+                                                                                      len(buttons), self._processes)
+        return table, offsets, {'press': unmatchedPress, 'release': unmatchedRelease}
+    
     #%% get chronological list of pressed buttons
-    def getChronologicalTiming(self, buttons=[]):
+    def getChronologicalTiming(self, buttons=[], asArray=False):
         """Get chronological list of events for given buttons
         
         Arguments:
             buttons: list(<str>)
                 buttons: (default) list of buttons
+            asArray: <bool>
+                False: (default) lists of [time, key, button, eventCount]
+                True: arrays of kernels.chronologicalDtype (button, time, 
+                    count), where "button" is the index in "buttons"
                     
         Returns:
-            chronologicalListIn: list(<str>)
+            chronologicalListIn: list(<str>) or <array>
                 chronological list of button presses
-            chronologicalListOut: list(<str>)
+            chronologicalListOut: list(<str>) or <array>
                 chronological list of button releases
             
         Raises:
@@ -145,32 +545,195 @@ class analytics:
         # buttons=[]     make default value self._buttons
         if(len(buttons)==0):
             buttons = self._buttons
-        # lists of chronological events
-        chronologicalListIn  = []
-        chronologicalListOut = []
-        # parse the file
-        for time, key, button, event in zip( self._df['Time'], self._df['Key'], self._df['Button'], self._df['Event'] ):
-            # check if button is in the requested list
-            if(button in buttons):
-                # decode event
-                eventType  = np.sign(event)
-                eventCount = abs(event)-1
-                # add to the list
-                if(eventType>=0):
-                    chronologicalListIn.append([time, key, button, eventCount])
-                elif(eventType<0):
-                    chronologicalListOut.append([time, key, button, eventCount])
-                    
+        # integer codes of buttons (-1 for other buttons)
+        codes = pd.Categorical(self._df['Button'], categories=buttons).codes
+        rows = codes >= 0
+        time  = self._df['Time'].values[rows]
+        event = self._df['Event'].values[rows]
+        pressed = event >= 0
         # check if lists are chronological
-        for idx in range(0, len(chronologicalListIn)-1):
-            if(chronologicalListIn[idx]>chronologicalListIn[idx+1]):
-                raise Exception("layout.getChronologicalTiming(..): "'Time'" is not purely ascending in chronologicalListIn at "+str(chronologicalListIn[idx])+" ")
-        for idx in range(0, len(chronologicalListOut)-1):
-            if(chronologicalListOut[idx]>chronologicalListOut[idx+1]):
-                raise Exception("layout.getChronologicalTiming(..): "'Time'" is not purely ascending in chronologicalListIn at "+str(chronologicalListOut[idx])+" ")
-                
+        for name, selection in (('chronologicalListIn', pressed), ('chronologicalListOut', ~pressed)):
+            backwards = np.flatnonzero(np.diff(time[selection]) < 0)
+            if(len(backwards) > 0):
+                raise Exception("analytics.getChronologicalTiming(..): 'Time' is not purely ascending in "+name+" at "+str(time[selection][backwards[0]])+" ")
+        if(asArray):
+            table = np.empty(len(time), dtype=chronologicalDtype)
+            table['button'] = codes[rows]
+            table['time']   = time
+            table['count']  = np.abs(event) - 1
+            return table[pressed], table[~pressed]
+        # lists of chronological events
+        chronologicalList = [list(row) for row in zip(time.tolist(), 
+                                                       self._df['Key'].values[rows].tolist(), 
+                                                       self._df['Button'].values[rows].tolist(), 
+                                                       (np.abs(event) - 1).tolist())]
+        chronologicalListIn  = [row for row, p in zip(chronologicalList, pressed) if p]
+        chronologicalListOut = [row for row, p in zip(chronologicalList, pressed) if not p]
         return chronologicalListIn, chronologicalListOut
     
+    #%% latency matrices between consecutive key strokes
+    def getFlightMatrices(self, timeLimit, buttons=[], distance=None):
+        """Calculate all latency matrices of consecutive key strokes
+        
+        The key strokes (see getPairedTiming) are ordered by the press 
+        time, for a key stroke X preceding the key stroke Y the 
+        latencies are
+            'PP': press X   -> press Y
+            'PR': press X   -> release Y
+            'RP': release X -> press Y (flight time, negative for rollover)
+            'RR': release X -> release Y
+        Only the paired key strokes are used: the presses without 
+        a release (e.g. auto-repeat presses of a held button) are left 
+        out and the first key stroke has no pair. The 'PP' counts are 
+        therefore lower than those of getTimeCorrelationOcccuranceMatrix, 
+        which pairs every press with the preceding press.
+        
+        Arguments:
+            timeLimit: <float>
+                A time limit of PP latency beyond which the pair is 
+                considered outlier and left out (of all matrices).
+            buttons: list(<str>)
+                buttons: (default) list of buttons
+            distance: <matrix>
+                None: (default) latencies in [s]
+                <matrix>: distances between "buttons" (e.g. 
+                    layout.getDistanceMatrix(buttons)), the mean and 
+                    variance are per unit of distance [s/key-width], 
+                    NaN for repeated buttons
+                    
+        Returns:
+            dict{'PP', 'PR', 'RP', 'RR': (<matrix>, <matrix>, <matrix>)}
+                Matrices with mean, variance and count of the latency 
+                f(Y|X), where X is a button on x-axis and preceedes 
+                the button Y on y-axis
+            
+        Raises:
+            Exception: "distance" does not match "buttons".
+        """
+        if(len(buttons)==0):
+            buttons = self._buttons
+        matrices = self._memo('getFlightMatrices', buttons, (timeLimit,), lambda b: self._getFlightMatrices(timeLimit, b))
+        if(distance is not None):
+            for name, (mean, var, count) in matrices.items():
+                matrices[name] = normalizeByDistance(mean, var, distance) + (count,)
+        return matrices
+    
+    def _getFlightMatrices(self, timeLimit, buttons):
+        """Latency matrices [s] of the buttons (not memoized)."""
+        table, offsets, unmatched = self.getPairedTiming(buttons)
+        return flightMatrices(table['button'], table['timeIn'], table['timeOut'], len(buttons), timeLimit)
+    
+    #%% key rollover
+    def getRollover(self, buttons=[]):
+        """Calculate the concurrency of key strokes and the key rollover
+        
+        The number of keys held down over time is obtained by a single 
+        sweep over the sorted presses and releases of the paired key 
+        strokes (see getPairedTiming). A key stroke Y rolls over every 
+        key stroke X held down at the press of Y (pressed before Y and 
+        released after it), e.g. shift held over A, B and C rolls over 
+        all three (see kernels.rolloverMatrices).
+        
+        Arguments:
+            buttons: list(<str>)
+                buttons: (default) list of buttons
+                    
+        Returns:
+            dict{'time': <array>, 'keysDown': <array>, 'timeAtKeysDown': <array>,
+                 'overlap': <matrix>, 'rollovers': <matrix>, 'strokes': <array>,
+                 'rolloverRate': <matrix>, 'rolloverRateTotal': <float>}
+                'time', 'keysDown': number of keys held down after 
+                    every press and release (concurrency timeline)
+                'timeAtKeysDown': time [s] spent with 0, 1, 2, ... keys down
+                'overlap': mean time [s] both keys are held down 
+                    f(Y|X), where X is a button on x-axis held down 
+                    at the press of the button Y on y-axis
+                'rollovers': count of presses of Y while X is held down
+                'strokes': count of key strokes of every button
+                'rolloverRate': fraction of the key strokes of Y pressed 
+                    while X is held down (rollovers/strokes of Y, NaN 
+                    without key strokes)
+                'rolloverRateTotal': fraction of key strokes pressed while 
+                    another key is held down
+            
+        Raises:
+        """
+        if(len(buttons)==0):
+            buttons = self._buttons
+        return self._memo('getRollover', buttons, (), self._getRollover)
+    
+    def _getRollover(self, buttons):
+        """Rollover of the buttons (not memoized)."""
+        table, offsets, unmatched = self.getPairedTiming(buttons)
+        time, keysDown, timeAtKeysDown = concurrencyTimeline(table['timeIn'], table['timeOut'])
+        overlap, rollovers, strokes, overlapping = rolloverMatrices(table['button'], table['timeIn'], table['timeOut'], len(buttons))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rolloverRate = rollovers / strokes[:, None]
+        rolloverRateTotal = overlapping / len(table) if len(table) > 0 else np.nan
+        return {'time': time, 'keysDown': keysDown, 'timeAtKeysDown': timeAtKeysDown, 
+                'overlap': overlap, 'rollovers': rollovers, 'strokes': strokes, 
+                'rolloverRate': rolloverRate, 'rolloverRateTotal': rolloverRateTotal}
+    
+    #%% statistics of groups of buttons (fingers, hands)
+    def getGroupStatistics(self, groups, timeLimit, buttons=[]):
+        """Calculate dwell and transition statistics of groups of buttons
+        
+        The groups are given by an index array aligned to "buttons", 
+        e.g. layout.getHandIndex(buttons) or layout.getFingerIndex(buttons).
+        Transitions are the PP latencies of consecutive key strokes 
+        (as in getFlightMatrices), the element [Y, X] relates the group 
+        X of the preceding key stroke to the group Y of the current one 
+        (e.g. for hands, [1, 0] is the left->right transition).
+        
+        Arguments:
+            groups: <array(B)>
+                Group number (0 ... G-1) of every button, the buttons 
+                with negative group number are left out.
+            timeLimit: <float>
+                A time limit beyond which the transition is considered 
+                outlier and left out.
+            buttons: list(<str>)
+                buttons: (default) list of buttons
+                    
+        Returns:
+            dict{'dwell': (<array(G)>, <array(G)>, <array(G)>),
+                 'transitions': (<matrix>, <matrix>, <matrix>),
+                 'sameGroup': (<float>, <float>, <float>),
+                 'otherGroup': (<float>, <float>, <float>)}
+                Mean, variance and count of the dwell time of every 
+                group, of the transitions between groups and of the 
+                transitions within the same group (e.g. same-finger) 
+                and between different groups.
+            
+        Raises:
+            Exception: "groups" does not match "buttons".
+        """
+        if(len(buttons)==0):
+            buttons = self._buttons
+        groups = np.asarray(groups, dtype=int)
+        if(len(groups) != len(buttons)):
+            raise Exception("analytics.getGroupStatistics(groups, ..): expected "+str(len(buttons))+" groups, got "+str(len(groups))+".")
+        groupCount = max(groups.max() + 1, 1) if len(groups) > 0 else 1
+        table, offsets, unmatched = self.getPairedTiming(buttons)
+        # group of every key stroke (chronological)
+        table = table[np.argsort(table['timeIn'], kind='stable')]
+        group = groups[table['button']]
+        # dwell time
+        keep = group >= 0
+        dwell = cellStatistics(group[keep], table['timeDur'][keep], groupCount)
+        # transitions between consecutive key strokes
+        period = np.diff(table['timeIn'])
+        previous, current = group[:-1], group[1:]
+        keep = (previous >= 0) & (current >= 0) & (period <= timeLimit)
+        previous, current, period = previous[keep], current[keep], period[keep]
+        mean, var, count = cellStatistics(current*groupCount + previous, period, groupCount**2)
+        shape = (groupCount, groupCount)
+        transitions = (mean.reshape(shape), var.reshape(shape), count.reshape(shape))
+        # same group / other group
+        same = cellStatistics((current != previous).astype(int), period, 2)
+        return {'dwell': dwell, 'transitions': transitions,
+                'sameGroup': tuple(s[0] for s in same), 'otherGroup': tuple(s[1] for s in same)}
+    
     # #%% occurance matrix
     # def getChronOccuranceyMatrix(self, eventList, buttons=[]):
     #     """Calculate occurance matrix of given buttons
@@ -210,17 +773,28 @@ class analytics:
     #     return MchronOccur
     
     #%% occurance matrix with time limit
-    def getTimeCorrelationOcccuranceMatrix(self, eventList, timeLimit, buttons=[]):
+    def getTimeCorrelationOcccuranceMatrix(self, eventList, timeLimit, buttons=[], distance=None):
         """Calculate time correletaion of occurance matrix of given buttons
         
+        Every event is paired with the preceding event (the first event 
+        with itself), events of other buttons are left out.
+        
         Arguments:
-            eventList: list([time, symbol, button, event], ...)
-                List of parsed events from the log file
+            eventList: list([time, symbol, button, event], ...) or <array>
+                List of parsed events from the log file, or the array 
+                of getChronologicalTiming(buttons, asArray=True) with 
+                the same "buttons"
             timeLimit: <float>
                 A time limit beyond which the entry is considered outlier and 
                 left out.
             buttons: list(<str>)
                 buttons: (default) list of buttons
+            distance: <matrix>
+                None: (default) time in [s]
+                <matrix>: distances between "buttons" (e.g. 
+                    layout.getDistanceMatrix(buttons)), the mean and 
+                    covariance are per unit of distance [s/key-width], 
+                    NaN for repeated buttons
                     
         Returns:
             <matrix>
@@ -242,57 +816,33 @@ class analytics:
             buttons = self._buttons
         # matrix size
         mSize = len(buttons)
-        # matrices storing results
-        _meanM = np.zeros((mSize, mSize))
-        _corrM = np.zeros((mSize, mSize))
-        _countM = np.zeros((mSize, mSize))
-        # get buffers storing values to calculate _mean and _corr
-        _buffer={}
-        for x in range(0, mSize):
-            for y in range(0, mSize):
-                _buffer[(x,y)] = []
-        # parse the data in the eventList
-        prevIter = iter(eventList)
-        prevEvent = next(prevIter)
-        # for every event
-        for event in eventList:
-            eventTime, eventKey, eventButton, eventCount = event
-            # for every button
-            if(eventButton in buttons):
-                # get the button name and time
-                prevEventButton = prevEvent[2]
-                prevEventTime = prevEvent[0]
-                # get indices within the matrix
-                mX = buttons.index(eventButton)
-                mY = buttons.index(prevEventButton)
-                # calculate period of time between events
-                period = eventTime - prevEventTime
-                # if the pause is not too great (elss than timeLimit), then count the values
-                if(period <= timeLimit):
-                    # append period to the list of f(x|y)
-                    _buffer[(mX,mY)].append(period)
-                    # keep total count in matrix
-                    _countM[mX][mY] += 1
-                # set the previous event
-                prevEvent = event
-                
-        for k in _buffer.keys():
-            # key "k" is a tupple of coordinates
-            mX = k[0]
-            mY = k[1]
-            _meanM[mX][mY] = np.mean(_buffer[(mX,mY)])
-            if(not _buffer[(mX,mY)] ):
-                _corrM[mX][mY] = np.nan
-#                print(_buffer[(mX,mY)])
-            else:
-                _corrM[mX][mY] = float( np.cov( _buffer[(mX,mY)] ) )
-            
+        # button codes and time of the events
+        if(isinstance(eventList, np.ndarray)):
+            codes = eventList['button'].astype(np.int64)
+            time  = eventList['time'].astype(np.float64)
+        else:
+            index = {b: i for i, b in enumerate(buttons)}
+            codes = np.array([index.get(event[2], -1) for event in eventList], dtype=np.int64)
+            time  = np.array([event[0] for event in eventList], dtype=np.float64)
+        keep = (codes >= 0) & (codes < mSize)
+        # the first event is its own previous event, the pauses above timeLimit are left out
+        _meanM, _corrM, _countM = parallel.transitionStatistics(codes[keep], time[keep], mSize, timeLimit, pairFirst=True, processes=self._processes)
+        if(distance is not None):
+            _meanM, _corrM = normalizeByDistance(_meanM, _corrM, distance)
         return _meanM , _corrM , _countM
     
     #%% plot heat map of a matrix
-    def plotMatrixHeatmap(self, axis, matrix, matrixLabels, defaultLook=True, fontSize=10):
+    @staticmethod
+    def plotMatrixHeatmap(axis, matrix, matrixLabels, defaultLook=True, fontSize=10, annotate='auto', topK=None, threshold=None):
         """Plot a heatmap of a matrix
         
+        The values of the cells are plotted (if defaultLook==True) 
+        according to "annotate". Every cell can have its own text 
+        artist, which becomes slow for large matrices (B*B texts), 
+        therefore the other modes draw all the values as a single 
+        collection and can label the significant cells only. The method 
+        does not need a parsed log, it can be called on the class.
+        
         Arguments:
             axis: <axis>
                 matplotlib handle to subplot axis.
@@ -305,13 +855,31 @@ class analytics:
                 False: just plot the heatmap
             fontSize: <int>
                 10: (default) size of plotted text if defaultLook==True
+            annotate: <str>
+                'auto': (default) chosen by the size of the matrix,
+                    'text' up to 20 buttons, 'nonzero' up to 100 buttons,
+                    'top' for larger matrices
+                'text': one text artist per cell (NaN cells are skipped)
+                'nonzero': single collection, NaN and zero cells are skipped
+                'top': single collection, only cells above "threshold" 
+                    and/or "topK" largest cells (topK defaults to 
+                    the number of buttons)
+                'none': values are not plotted
+            topK: <int>
+                None: (default) no limit on the number of labelled cells
+                <int>: label only K cells with the largest value
+            threshold: <float>
+                None: (default) no threshold
+                <float>: label only cells with value above threshold
                     
         Returns:
             <axis.imshow handle>
                 handle to the plot
             
         Raises:
+            Exception: Unknown "annotate" mode.
         """
+        matrix = np.asarray(matrix, dtype=float)
         im = axis.imshow(matrix)
         axis.set_xticks(np.arange(len(matrixLabels)))
         axis.set_yticks(np.arange(len(matrixLabels)))
@@ -321,18 +889,51 @@ class analytics:
             # Rotate the tick labels and set their alignment.
             plt.setp(axis.get_xticklabels(), rotation=0, ha="right", rotation_mode="anchor")
             
+            # choose the annotation by the size of the matrix
+            if(annotate == 'auto'):
+                if(len(matrixLabels) <= 20):
+                    annotate = 'text'
+                elif(len(matrixLabels) <= 100):
+                    annotate = 'nonzero'
+                else:
+                    annotate = 'top'
+            if(annotate not in ('text', 'nonzero', 'top', 'none')):
+                raise Exception("analytics.plotMatrixHeatmap(..., annotate=<'auto', 'text', 'nonzero', 'top', 'none'>, ...): incorrect parameter annotate=<"+str(annotate)+">")
+            
+            # select the cells to be labelled
+            finite = np.isfinite(matrix)
+            if(annotate == 'text'):
+                labelled = finite
+            elif(annotate == 'nonzero'):
+                labelled = finite & (matrix != 0)
+            elif(annotate == 'top'):
+                labelled = finite & (matrix != 0)
+                if(threshold is not None):
+                    labelled &= matrix > threshold
+                if(topK is None and threshold is None):
+                    topK = len(matrixLabels)
+            else:
+                labelled = np.zeros(matrix.shape, dtype=bool)
+            if(annotate != 'text' and topK is not None and topK < np.count_nonzero(labelled)):
+                candidates = np.flatnonzero(labelled)
+                top = candidates[np.argpartition(-matrix.flat[candidates], topK)[:topK]]
+                labelled = np.zeros(matrix.shape, dtype=bool)
+                labelled.flat[top] = True
+            rows, cols = np.nonzero(labelled)
+            
             # add the text, but adjust formatting according to numbers being plotted (decimal or whole)
-            maxNumber = np.max(np.absolute(matrix))
+            maxNumber = np.max(np.absolute(matrix[finite])) if finite.any() else 0.0
             if(maxNumber > 9.9):
                 # plot whole numbers
-                for i in range(len(matrixLabels)):
-                    for j in range(len(matrixLabels)):
-                        axis.text(j, i, int(matrix[i, j]), ha="center", va="center", color="w", fontsize=fontSize)
+                strings = [str(int(v)) for v in matrix[rows, cols]]
             else:
                 # plot floats
-                for i in range(len(matrixLabels)):
-                    for j in range(len(matrixLabels)):
-                        axis.text(j, i, '{:.2f}'.format(matrix[i, j]), ha="center", va="center", color="w", fontsize=fontSize)
+                strings = ['{:.2f}'.format(v) for v in matrix[rows, cols]]
+            if(annotate == 'text'):
+                for i, j, string in zip(rows, cols, strings):
+                    axis.text(j, i, string, ha="center", va="center", color="w", fontsize=fontSize)
+            elif(len(strings) > 0):
+                textCollection(axis, np.column_stack((cols, rows)), strings, fontSize=fontSize, color="w", centered=True)
             # set labels
             axis.set_title("value of  f(x)|y (e.g. probability p(X|Y))")
             axis.set_xlabel("f(Y)")
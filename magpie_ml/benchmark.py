@@ -0,0 +1,566 @@
+# -*- coding: utf-8 -*-
+#%% Imports - benchmark
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+import pandas as pd
+import datetime as dt
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from magpie_ml.analytics import analytics
+from magpie_ml.layout import layout
+from magpie_ml.synthetic import generator
+from magpie_ml.storage import sqliteStore
+from magpie_ml import export
+from magpie_ml import kernels
+from magpie_ml import parallel
+from magpie_ml.replay import replay
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% BENCHMARK %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Measurements of the package performance. Every measurement is a function
+#   returning plain python values, so that the results can be compared
+#   between versions of the package.
+
+#   script executed in a fresh interpreter to measure the cost of an import
+_importProbe = """
+import time
+_t = time.perf_counter()
+import {modules}
+_t = time.perf_counter() - _t
+try:
+    import resource
+    _rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in kilobytes elsewhere
+    _rss = _rss / 1024**2 if sys.platform == 'darwin' else _rss / 1024
+except ImportError:
+    _rss = float('nan')
+print(_t, _rss)
+"""
+
+#%% memory and startup time of an import
+def measureImportFootprint(modules, repeat=3):
+    """Measure the startup time and peak memory of importing modules.
+
+    Every measurement runs in a fresh interpreter, so that the
+    modules imported earlier do not influence the result.
+
+    Arguments:
+        modules: <str>
+            Comma separated modules to import (e.g. 'pandas, numpy').
+        repeat: <int>
+            3: (default) number of measurements, the fastest is kept
+
+    Raises:
+        Exception: The import failed.
+
+    Returns:
+        dict{'startup': <float>, 'rss': <float>}
+            Import time [s] and peak resident memory [MB]
+            of the interpreter.
+    """
+    results = []
+    for _ in range(repeat):
+        probe = 'import sys\n' + _importProbe.format(modules=modules)
+        out = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True)
+        if(out.returncode != 0):
+            raise Exception("benchmark.measureImportFootprint(..): import of <"+modules+"> failed:\n"+out.stderr)
+        startup, rss = out.stdout.split()
+        results.append((float(startup), float(rss)))
+    startup, rss = min(results)
+    return {'startup': startup, 'rss': rss}
+
+#%% footprint of the logger process
+def measureLoggerFootprint(repeat=3):
+    """Compare the footprint of the logger with its former dependencies.
+
+    The logger used to import pandas and numpy next to pynput,
+    the reference measurement imports the same set of modules.
+
+    Arguments:
+        repeat: <int>
+            3: (default) number of measurements, the fastest is kept
+
+    Raises:
+        Exception: The import failed (e.g. pynput has no backend).
+
+    Returns:
+        dict{<str>: dict{'startup': <float>, 'rss': <float>}}
+            Measurements of 'interpreter', 'logger' and 'reference'.
+    """
+    return {'interpreter': measureImportFootprint('sys', repeat),
+            'logger':      measureImportFootprint('magpie_ml.logger', repeat),
+            'reference':   measureImportFootprint('pynput.keyboard, pandas, numpy', repeat)}
+
+#%% draw time of heatmaps
+def benchmarkHeatmap(sizes=[10, 25, 50, 100], modes=['text', 'nonzero', 'top'], density=0.3, seed=0):
+    """Measure the draw time of analytics.plotMatrixHeatmap(...).
+
+    The matrix is random with a given fraction of non-zero cells
+    (transition matrices are sparse). The time includes plotting
+    and drawing the figure with the Agg backend.
+
+    Arguments:
+        sizes: list(<int>)
+            [10, 25, 50, 100]: (default) number of buttons B
+        modes: list(<str>)
+            ['text', 'nonzero', 'top']: (default) annotation modes
+        density: <float>
+            0.3: (default) fraction of non-zero cells
+        seed: <int>
+            0: (default) seed of the random matrix
+
+    Returns:
+        list(dict{'B': <int>, 'mode': <str>, 'draw': <float>})
+            Draw time [s] for every size and mode.
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for B in sizes:
+        matrix = rng.random((B, B)) * (rng.random((B, B)) < density)
+        labels = [str(b) for b in range(B)]
+        for mode in modes:
+            fig = Figure(figsize=(8, 8))
+            FigureCanvasAgg(fig)
+            axis = fig.add_subplot()
+            start = time.perf_counter()
+            analytics.plotMatrixHeatmap(axis, matrix, labels, defaultLook=True, fontSize=6, annotate=mode)
+            fig.canvas.draw()
+            results.append({'B': B, 'mode': mode, 'draw': time.perf_counter() - start})
+    return results
+
+#%% time and memory of a call
+def _measure(function, memory=True):
+    """Measure the run time and the peak of allocated memory of a call.
+
+    The memory is measured by tracemalloc in a second run, since
+    tracing slows down the call.
+
+    Arguments:
+        function: <callable>
+            Function without arguments.
+        memory: <bool>
+            True: (default) measure the peak memory as well
+            False: the peak memory is NaN
+
+    Returns:
+        (result, time, peak): (<any>, <float>, <float>)
+            Returned value, run time [s] and peak memory [MB].
+    """
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = float('nan')
+    if(memory):
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+#%% public API over log sizes and button counts
+def benchmarkAnalytics(sizes=[10**4, 10**5], buttonCounts=[26, 84], sessions=2, timeLimit=1.5, memory=True, seed=0):
+    """Measure the public API of analytics and layout on synthetic logs.
+
+    For every log size and button count a synthetic log is generated
+    (synthetic.generator) into a temporary directory and every method
+    is timed and memory-profiled. The results of analytics are not
+    memoized (cacheSize=0), every call is computed.
+
+    Arguments:
+        sizes: list(<int>)
+            [10**4, 10**5]: (default) number of logged events
+        buttonCounts: list(<int>)
+            [26, 84]: (default) number of typed (and analysed) buttons
+        sessions: <int>
+            2: (default) number of appended sessions in every log
+        timeLimit: <float>
+            1.5: (default) timeLimit of the transition matrix
+        memory: <bool>
+            True: (default) measure the peak memory (doubles the run time)
+        seed: <int>
+            0: (default) seed of the synthetic logs
+
+    Returns:
+        list(dict{'api': <str>, 'events': <int>, 'buttons': <int>, 'time': <float>, 'peak': <float>})
+            Run time [s] and peak memory [MB] of every measured call.
+    """
+    keyboard = layout()
+    symbolToButton = keyboard.getSymbolToButtonDict()
+    typeable = [b for b in keyboard.getButtonList() if b in set(symbolToButton.values())]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.txt')
+        for B in buttonCounts:
+            buttons = typeable[:B]
+            for events in sizes:
+                generator(symbolToButton, buttons, seed=seed).write(path, events//2, sessions=sessions)
+                def record(api, function):
+                    result, elapsed, peak = _measure(function, memory)
+                    results.append({'api': api, 'events': events, 'buttons': len(buttons), 'time': elapsed, 'peak': peak})
+                    return result
+                log = record('analytics.__init__', lambda: analytics(buttons, path=path, cacheSize=0))
+                record('analytics.getTiming', lambda: log.getTiming(buttons))
+                record('analytics.getPairedTiming', lambda: log.getPairedTiming(buttons))
+                record('analytics.getFlightMatrices', lambda: log.getFlightMatrices(timeLimit, buttons))
+                record('analytics.getRollover', lambda: log.getRollover(buttons))
+                record('analytics.getGroupStatistics', lambda: log.getGroupStatistics(keyboard.getFingerIndex(buttons), timeLimit, buttons))
+                chronIn, chronOut = record('analytics.getChronologicalTiming', lambda: log.getChronologicalTiming(buttons))
+                Mmean, Mcov, Mcount = record('analytics.getTimeCorrelationOcccuranceMatrix', lambda: log.getTimeCorrelationOcccuranceMatrix(chronIn, timeLimit, buttons))
+                record('analytics.query', lambda: log.query().dwell().transitions(timeLimit).flights(timeLimit).counts().execute())
+                arrayIn, arrayOut = record('analytics.getChronologicalTiming(asArray)', lambda: log.getChronologicalTiming(buttons, asArray=True))
+                record('analytics.getTimeCorrelationOcccuranceMatrix(array)', lambda: log.getTimeCorrelationOcccuranceMatrix(arrayIn, timeLimit, buttons))
+                # plots are drawn with the Agg backend
+                def draw(plot):
+                    fig = Figure(figsize=(12, 6))
+                    FigureCanvasAgg(fig)
+                    axis = fig.add_subplot(projection='3d' if plot == keyboard.plotKeyboard3D else None)
+                    plot(axis)
+                    fig.canvas.draw()
+                record('analytics.plotMatrixHeatmap', lambda: draw(lambda axis: log.plotMatrixHeatmap(axis, Mcount, buttons)))
+                record('layout.plotKeyboard2D', lambda: draw(keyboard.plotKeyboard2D))
+                record('layout.plotKeyboard3D', lambda: draw(keyboard.plotKeyboard3D))
+                record('layout.getRenderer2D', lambda: draw(lambda axis: keyboard.getRenderer2D(axis).update(np.arange(len(typeable)))))
+                record('layout.plotButtonRelations', lambda: draw(lambda axis: keyboard.plotButtonRelations(axis, Mcount, buttons)))
+    return results
+
+#%% text log vs SQLite database
+def benchmarkStorage(events=10**6, buttonCount=26, sessions=4, window=300.0, timeLimit=1.5, replayed=10**5, seed=0):
+    """Compare the text log with the SQLite database and the Parquet dataset.
+    
+    A synthetic log is written as text, imported into a database and 
+    exported to a Parquet dataset (if pyarrow is installed). 
+    The queries are restricted to a time window in the middle of the 
+    log and to 2 buttons (the typical query over a long log), or they 
+    run over the whole log. The write path of the logger is measured 
+    by a replay of synthetic events.
+
+    Arguments:
+        events: <int>
+            10**6: (default) number of logged events
+        buttonCount: <int>
+            26: (default) number of typed buttons
+        sessions: <int>
+            4: (default) number of appended sessions
+        window: <float>
+            300.0: (default) length [s] of the time window of the queries
+        timeLimit: <float>
+            1.5: (default) timeLimit of the transitions
+        replayed: <int>
+            10**5: (default) number of events replayed into the logger
+        seed: <int>
+            0: (default) seed of the synthetic log
+
+    Returns:
+        list(dict{'api': <str>, 'backend': <str>, 'events': <int>, 'time': <float>})
+            Run time [s] of every measured call.
+    """
+    keyboard = layout()
+    symbolToButton = keyboard.getSymbolToButtonDict()
+    # the escape button of the logger stops the replay
+    buttons = [b for b in keyboard.getButtonList() if b in set(symbolToButton.values()) and b != 'Esc'][:buttonCount]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        textPath, databasePath = os.path.join(directory, 'log.txt'), os.path.join(directory, 'log.db')
+        generator(symbolToButton, buttons, seed=seed).write(textPath, events//2, sessions=sessions)
+        def record(api, backend, function):
+            result, elapsed, peak = _measure(function, memory=False)
+            results.append({'api': api, 'backend': backend, 'events': events, 'time': elapsed})
+            return result
+        def importText():
+            store = sqliteStore(databasePath)
+            store.importText(textPath)
+            store.close()
+        record('sqliteStore.importText', 'sqlite', importText)
+        store = sqliteStore(databasePath)
+        middle = sum(store.getTimeRange())/2
+        store.close()
+        span = (middle - window/2, middle + window/2)
+        pair = buttons[:2]
+        backends = [('text', textPath), ('sqlite', databasePath)]
+        if(export.pa is not None):
+            parquetPath = os.path.join(directory, 'log.parquet')
+            record('analytics.exportParquet', 'parquet', lambda: analytics(buttons, path=textPath).exportParquet(parquetPath))
+            backends.append(('parquet', parquetPath))
+        for backend, path in backends:
+            record('window: getDwellStatistics', backend, lambda: analytics(buttons, path=path, window=span, buttonFilter=pair).getDwellStatistics(pair))
+            record('window: getTiming', backend, lambda: analytics(buttons, path=path, window=span, buttonFilter=pair).getTiming(pair))
+            record('all: getDwellStatistics', backend, lambda: analytics(buttons, path=path).getDwellStatistics(buttons))
+            record('all: getTransitionStatistics', backend, lambda: analytics(buttons, path=path).getTransitionStatistics(timeLimit, buttons))
+        # write path of the logger
+        for backend in ('text', 'sqlite'):
+            path = os.path.join(directory, 'replay.' + ('txt' if backend == 'text' else 'db'))
+            stream = list(generator(symbolToButton, buttons, seed=seed).events(replayed//2))
+            report = replay(symbolToButton, path=path, backend=backend).run(stream)
+            results.append({'api': 'logger (replay)', 'backend': backend, 'events': report['events'], 'time': report['seconds']})
+    return results
+
+#%% durability of the logger
+def benchmarkDurability(events=10**5, levels=['buffered', 'flush', 'fsync'], batchSizes=[1, 16, 256], realTime=False, seed=0):
+    """Throughput and latency of the logger at the levels of durability.
+    
+    Synthetic events are replayed into a text log (and into a database) 
+    at every level of durability and batch size of the group commit. 
+    The replay at maximum speed measures the cost of the commits, 
+    the batches are full; in real time the commits are driven by 
+    commitInterval.
+
+    Arguments:
+        events: <int>
+            10**5: (default) number of replayed events
+        levels: list(<str>)
+            ['buffered', 'flush', 'fsync']: (default) levels of durability
+        batchSizes: list(<int>)
+            [1, 16, 256]: (default) batch sizes of the group commit
+        realTime: <bool>
+            False: (default) replay at maximum speed
+        seed: <int>
+            0: (default) seed of the synthetic events
+
+    Returns:
+        list(dict{'backend': <str>, 'durability': <str>, 'batchSize': <int>, 'events': <int>,
+                  'eventsPerSecond': <float>, 'p50': <float>, 'p99': <float>, 'max': <float>})
+            Throughput and latency [s] of the logger callbacks.
+    """
+    keyboard = layout()
+    symbolToButton = keyboard.getSymbolToButtonDict()
+    buttons = [b for b in keyboard.getButtonList() if b in set(symbolToButton.values()) and b != 'Esc']
+    stream = list(generator(symbolToButton, buttons, seed=seed).events(events//2))
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in ('text', 'sqlite'):
+            for durability in levels:
+                # the batch size does not apply to a buffered text log
+                for batchSize in (batchSizes if durability != 'buffered' or backend == 'sqlite' else [None]):
+                    path = os.path.join(directory, backend + '_' + durability + '_' + str(batchSize) + ('.txt' if backend == 'text' else '.db'))
+                    arguments = {'backend': backend, 'durability': durability}
+                    if(batchSize is not None):
+                        arguments['batchSize'] = batchSize
+                    report = replay(symbolToButton, path=path, **arguments).run(stream, realTime=realTime)
+                    results.append({'backend': backend, 'durability': durability, 'batchSize': batchSize, 'events': report['events'],
+                                    'eventsPerSecond': report['eventsPerSecond'], 'p50': report['latency']['p50'],
+                                    'p99': report['latency']['p99'], 'max': report['latency']['max']})
+    return results
+
+#%% arrays of a synthetic log
+def _syntheticEvents(events, buttonCount, sessions, seed):
+    # session, button code, event and time of a parsed synthetic log
+    keyboard = layout()
+    symbolToButton = keyboard.getSymbolToButtonDict()
+    buttons = [b for b in keyboard.getButtonList() if b in set(symbolToButton.values())][:buttonCount]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'events.txt')
+        generator(symbolToButton, buttons, seed=seed).write(path, events//2, sessions=sessions)
+        df = analytics(buttons, path=path)._df
+    codes = pd.Categorical(df['Button'], categories=buttons).codes.astype(np.int64)
+    return df['Session'].values, codes, df['Event'].values, df['Time'].values, len(buttons)
+
+#%% compiled vs numpy kernels
+def benchmarkKernels(events=10**6, buttonCount=60, sessions=4, timeLimit=1.5, repeat=3, seed=0):
+    """Run time and parity of the sequential kernels on both backends.
+
+    The events of a synthetic log are paired (kernels.pairPressRelease) 
+    and the statistics of consecutive presses are accumulated 
+    (kernels.transitionStatistics) by the numpy kernels and, if numba 
+    is installed, by the compiled loops (compiled before the measurement). 
+    The results of the compiled loops are compared to the numpy kernels.
+
+    Arguments:
+        events: <int>
+            10**6: (default) number of events
+        buttonCount: <int>
+            60: (default) number of buttons
+        sessions: <int>
+            4: (default) number of sessions of the log
+        timeLimit: <float>
+            1.5: (default) time limit of the transitions
+        repeat: <int>
+            3: (default) the best of "repeat" runs is measured
+        seed: <int>
+            0: (default) seed of the synthetic log
+
+    Returns:
+        list(dict{'kernel': <str>, 'backend': <str>, 'events': <int>, 'time': <float>, 'parity': <bool>})
+            Run time [s] of every kernel and backend, parity with 
+            the numpy kernel.
+    """
+    session, codes, event, eventTime, B = _syntheticEvents(events, buttonCount, sessions, seed)
+    pressed = event > 0
+    calls = {'pairPressRelease':     lambda: kernels.pairPressRelease(session, codes, event, eventTime, B),
+             'transitionStatistics': lambda: kernels.transitionStatistics(codes[pressed], eventTime[pressed], B, timeLimit)}
+    results = []
+    backend = kernels.backend
+    try:
+        for name, call in calls.items():
+            kernels.setBackend('numpy')
+            reference = call()
+            for backendName in (['numpy', 'numba'] if kernels._jit is not None else ['numpy']):
+                kernels.setBackend(backendName)
+                result = call()
+                elapsed = min(_measure(call, False)[1] for _ in range(repeat))
+                results.append({'kernel': name, 'backend': backendName, 'events': len(event), 'time': elapsed, 'parity': _same(result, reference)})
+    finally:
+        kernels.setBackend(backend)
+    return results
+
+def _same(a, b):
+    # equal tables (exactly) and statistics (up to the rounding)
+    if(isinstance(a, tuple)):
+        return all(_same(x, y) for x, y in zip(a, b))
+    if(a.dtype.names is not None):
+        return all(np.array_equal(a[name], b[name]) for name in a.dtype.names)
+    return a.shape == b.shape and np.allclose(a, b, equal_nan=True)
+
+#%% partitioned kernels over processes
+def benchmarkParallel(events=4*10**6, processes=[1, 2, 4], buttonCount=60, sessions=1, timeLimit=1.5, seed=0):
+    """Wall time of the partitioned kernels over the number of processes.
+
+    The key strokes of a synthetic log are paired and the statistics of 
+    consecutive presses are accumulated by the module parallel, the 
+    results are compared to the serial kernels. A single session is 
+    partitioned by buttons, several sessions by sessions.
+
+    Arguments:
+        events: <int>
+            4*10**6: (default) number of events
+        processes: list(<int>)
+            [1, 2, 4]: (default) numbers of processes
+        buttonCount: <int>
+            60: (default) number of buttons
+        sessions: <int>
+            1: (default) number of sessions of the log
+        timeLimit: <float>
+            1.5: (default) time limit of the transitions
+        seed: <int>
+            0: (default) seed of the synthetic log
+
+    Returns:
+        list(dict{'kernel': <str>, 'processes': <int>, 'events': <int>, 'time': <float>, 'parity': <bool>})
+            Wall time [s] of every kernel and number of processes, parity 
+            with the serial kernel.
+    """
+    session, codes, event, eventTime, B = _syntheticEvents(events, buttonCount, sessions, seed)
+    pressed = event > 0
+    calls = {'pairPressRelease':     lambda p: parallel.pairPressRelease(session, codes, event, eventTime, B, p),
+             'transitionStatistics': lambda p: parallel.transitionStatistics(codes[pressed], eventTime[pressed], B, timeLimit, processes=p)}
+    results = []
+    for name, call in calls.items():
+        reference = call(1)
+        for p in processes:
+            result, elapsed, peak = _measure(lambda: call(p), False)
+            results.append({'kernel': name, 'processes': p, 'events': len(event), 'time': elapsed, 'parity': _same(result, reference)})
+    return results
+
+#%% keep the results
+#   measurements of the benchmarks, the other fields of a result identify it
+_lowerIsBetter  = ('time', 'peak', 'draw', 'startup', 'rss', 'p50', 'p99', 'max')
+_higherIsBetter = ('eventsPerSecond',)
+
+def _runResults(run):
+    # results of a run by benchmark (a list is a run of benchmarkAnalytics)
+    results = run['results']
+    return {'analytics': results} if isinstance(results, list) else results
+
+def _case(result):
+    # the fields identifying a result
+    return tuple(sorted((k, v) for k, v in result.items() if k not in _lowerIsBetter + _higherIsBetter + ('parity',)))
+
+def saveBenchmark(results, path='benchmark.jsonl'):
+    """Append results of a benchmark run to a file.
+
+    Every run is stored as one JSON line together with the versions
+    of python and the libraries, so that the runs can be compared.
+
+    Arguments:
+        results: dict(<str>: list(dict)) or list(dict)
+            Results of the benchmarks by name (e.g. {'analytics':
+            benchmarkAnalytics(...), 'kernels': benchmarkKernels(...)}),
+            a list is stored as the results of 'analytics'.
+        path: <str>
+            'benchmark.jsonl': (default) path to the file of runs
+
+    Returns:
+    """
+    run = {'timestamp': dt.datetime.now().isoformat(timespec='seconds'),
+           'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+           'machine': platform.machine(), 'results': results}
+    run['results'] = _runResults(run)
+    with open(path, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+def compareBenchmark(path='benchmark.jsonl', tolerance=0.25):
+    """Compare the last two benchmark runs stored in a file.
+
+    Arguments:
+        path: <str>
+            'benchmark.jsonl': (default) path to the file of runs
+        tolerance: <float>
+            0.25: (default) relative slow down (or memory increase)
+                reported as a regression
+
+    Returns:
+        list(dict{'benchmark', 'case', 'metric', 'before', 'after'})
+            Measurements of the last run worse than the previous run
+            by more than "tolerance" (slower, larger, fewer events per
+            second, or a lost parity), "case" are the fields identifying
+            the result (empty if there is no previous run).
+    """
+    with open(path, 'r') as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    if(len(runs) < 2):
+        return []
+    previous, last = _runResults(runs[-2]), _runResults(runs[-1])
+    regressions = []
+    for benchmark, results in last.items():
+        before = {_case(r): r for r in previous.get(benchmark, [])}
+        for r in results:
+            old = before.get(_case(r), None)
+            if(old is None):
+                continue
+            worse = [m for m in _lowerIsBetter if m in r and old.get(m) is not None and r[m] is not None and old[m] > 0 and r[m] > old[m]*(1 + tolerance)]
+            worse += [m for m in _higherIsBetter if m in r and old.get(m) is not None and r[m] is not None and r[m] < old[m]/(1 + tolerance)]
+            if(old.get('parity') is True and r.get('parity') is False):
+                worse.append('parity')
+            for metric in worse:
+                regressions.append({'benchmark': benchmark, 'case': dict(_case(r)), 'metric': metric, 'before': old[metric], 'after': r[metric]})
+    return regressions
+
+#%% run benchmarks
+if __name__ == '__main__':
+    # python -m magpie_ml.benchmark [results.jsonl]
+    resultsPath = sys.argv[1] if len(sys.argv) > 1 else 'benchmark.jsonl'
+    results = {}
+    results['footprint'] = [dict(result, process=name) for name, result in measureLoggerFootprint().items()]
+    for result in results['footprint']:
+        print(result['process'].ljust(15) + ' startup: ' + '{:.3f}'.format(result['startup']) + ' [s]   rss: ' + '{:.1f}'.format(result['rss']) + ' [MB]')
+    results['heatmap'] = benchmarkHeatmap()
+    for result in results['heatmap']:
+        print('heatmap B=' + str(result['B']).ljust(5) + ' ' + result['mode'].ljust(8) + ' draw: ' + '{:.3f}'.format(result['draw']) + ' [s]')
+    results['storage'] = benchmarkStorage()
+    for result in results['storage']:
+        print(result['api'].ljust(35) + ' ' + result['backend'].ljust(7) + ' events: ' + str(result['events']).ljust(9) + ' time: ' + '{:.3f}'.format(result['time']) + ' [s]')
+    results['durability'] = benchmarkDurability()
+    for result in results['durability']:
+        print(result['backend'].ljust(7) + ' ' + result['durability'].ljust(9) + ' batch: ' + str(result['batchSize']).ljust(5) + ' events/s: ' + '{:.0f}'.format(result['eventsPerSecond']).ljust(8) + ' p99: ' + '{:.1f}'.format(result['p99']*1e6) + ' [us]')
+    results['kernels'] = benchmarkKernels()
+    for result in results['kernels']:
+        print(result['kernel'].ljust(22) + ' ' + result['backend'].ljust(6) + ' events: ' + str(result['events']).ljust(9) + ' time: ' + '{:.4f}'.format(result['time']) + ' [s]   parity: ' + str(result['parity']))
+    results['parallel'] = benchmarkParallel()
+    for result in results['parallel']:
+        print(result['kernel'].ljust(22) + ' processes: ' + str(result['processes']).ljust(3) + ' events: ' + str(result['events']).ljust(9) + ' time: ' + '{:.4f}'.format(result['time']) + ' [s]   parity: ' + str(result['parity']))
+    results['analytics'] = benchmarkAnalytics()
+    for result in results['analytics']:
+        print(result['api'].ljust(45) + ' events: ' + str(result['events']).ljust(9) + ' buttons: ' + str(result['buttons']).ljust(4) + ' time: ' + '{:.3f}'.format(result['time']) + ' [s]   peak: ' + '{:.1f}'.format(result['peak']) + ' [MB]')
+    saveBenchmark(results, resultsPath)
+    for regression in compareBenchmark(resultsPath):
+        print('REGRESSION ' + str(regression))
+    # a kernel that differs from the serial numpy kernel fails the run
+    if(not all(result['parity'] for result in results['kernels'] + results['parallel'])):
+        sys.exit(1)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#%% Imports - corpus
+import numpy as np
+import codecs
+import concurrent.futures
+import os
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% CORPUS %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Counts of buttons and digraphs (transitions between buttons) needed to
+#   type a text corpus on a layout. The text is translated to buttons by
+#   a lookup table indexed by code points, chunk by chunk.
+class corpusCounter:
+    """A class to represent a counter of digraphs of text corpora.
+
+    The lookup table translates every code point to the index of a button
+    in "buttons", code points without a button get the code B (the last
+    count is the number of unknown characters). The table is built once
+    from the symbol-to-button map of the layout. The characters of a symbol are taken by their code
+    point, the whitespace characters use the named symbols ' ' -> 'space',
+    newline -> 'enter' and tab -> 'tab'. Carriage returns are skipped,
+    all other characters without a button break the sequence of
+    transitions (modifiers such as shift are not counted).
+
+    Attributes:
+        self.buttons
+            list(<str>) of buttons
+
+    Methods:
+        corpusCounter(symbolToButtonDict, buttons=[])
+        countText(text)
+        countFile(path, encoding='utf-8', chunkSize=1048576)
+        countFiles(paths, encoding='utf-8', chunkSize=1048576, processes=None)
+    """
+    #   named symbols of whitespace characters
+    _whitespace = {' ': 'space', '\n': 'enter', '\t': 'tab'}
+
+    def __init__(self, symbolToButtonDict, buttons=[]):
+        """Inits corpusCounter class.
+
+        Arguments:
+            symbolToButtonDict: dict(symbol1: button1, symbol2: button2, ...)
+                Obtained from layout.getSymbolToButtonDict()
+            buttons: list(<str>)
+                []: (default) all buttons of symbolToButtonDict
+
+        Raises:
+
+        Returns:
+        """
+        if(len(buttons)==0):
+            buttons = list(dict.fromkeys(symbolToButtonDict.values()))
+        self.buttons = list(buttons)
+        index = {b: i for i, b in enumerate(self.buttons)}
+        characters = {}
+        for symbol, button in symbolToButtonDict.items():
+            if(len(symbol) == 1):
+                characters[symbol] = button
+        for character, symbol in self._whitespace.items():
+            if(character not in characters and symbol in symbolToButtonDict):
+                characters[character] = symbolToButtonDict[symbol]
+        characters = {c: index[b] for c, b in characters.items() if b in index}
+        # characters without button have the code B, the last entry of 
+        # the table stands for all higher code points
+        size = max([ord(c) for c in characters] + [ord('\r')]) + 2
+        self._lut = np.full(size, len(self.buttons), dtype=np.int32)
+        for character, code in characters.items():
+            self._lut[ord(character)] = code
+
+    #%% translate code points to buttons
+    def _codes(self, text):
+        """Translate a text to button codes.
+
+        Arguments:
+            text: <str>
+
+        Returns:
+            <array(N)>
+                Button code of every character (B without button),
+                carriage returns are left out.
+        """
+        if('\r' in text):
+            text = text.replace('\r', '')
+        points = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        return np.take(self._lut, points, mode='clip')
+
+    def _accumulate(self, codes, previous, digraphs, counts):
+        """Add the transitions of a chunk of codes to the counts.
+
+        Arguments:
+            codes: <array(N)>
+                Button codes of the chunk.
+            previous: <int>
+                Last code of the previous chunk (B at the start).
+            digraphs: <array(B*B)>
+                Flat digraph counts, updated in place.
+            counts: <array(B+1)>
+                Counts of buttons (the last element counts the characters
+                without button), updated in place.
+
+        Returns:
+            <int>
+                Last code of the chunk.
+        """
+        if(len(codes) == 0):
+            return previous
+        B = len(self.buttons)
+        counts += np.bincount(codes, minlength=B + 1)
+        # transitions from and to the code B (no button) fall out of the B x B block
+        pairs = np.empty(len(codes), dtype=np.int32)
+        np.multiply(codes, B + 1, out=pairs)
+        pairs[0] += previous
+        pairs[1:] += codes[:-1]
+        digraphs += np.bincount(pairs, minlength=(B + 1)**2).reshape(B + 1, B + 1)[:B, :B].ravel()
+        return int(codes[-1])
+
+    #%% count a text
+    def countText(self, text):
+        """Count buttons and digraphs of a text.
+
+        Arguments:
+            text: <str>
+
+        Returns:
+            (digraphs, counts, unknown): (<array(B,B)>, <array(B)>, <int>)
+                Count of transitions, the element [Y, X] counts the presses
+                of buttons[Y] preceded by buttons[X] (as analytics matrices),
+                count of presses of every button and count of characters
+                without button.
+        """
+        B = len(self.buttons)
+        digraphs, counts = np.zeros(B*B, dtype=np.int64), np.zeros(B + 1, dtype=np.int64)
+        self._accumulate(self._codes(text), B, digraphs, counts)
+        return digraphs.reshape(B, B), counts[:-1], int(counts[-1])
+
+    #%% count a file
+    def countFile(self, path, encoding='utf-8', chunkSize=1048576):
+        """Count buttons and digraphs of a text file.
+
+        The file is read and decoded in chunks, so that the memory does
+        not depend on the size of the file. Malformed bytes are replaced
+        (and counted as characters without button).
+
+        Arguments:
+            path: <str>
+                Path to the text file.
+            encoding: <str>
+                'utf-8': (default) encoding of the file
+            chunkSize: <int>
+                1048576: (default) bytes read at once
+
+        Returns:
+            (digraphs, counts, unknown): see countText(...)
+        """
+        B = len(self.buttons)
+        digraphs, counts = np.zeros(B*B, dtype=np.int64), np.zeros(B + 1, dtype=np.int64)
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        previous = B
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunkSize)
+                text = decoder.decode(chunk, final=(len(chunk) == 0))
+                previous = self._accumulate(self._codes(text), previous, digraphs, counts)
+                if(len(chunk) == 0):
+                    break
+        return digraphs.reshape(B, B), counts[:-1], int(counts[-1])
+
+    #%% count files in parallel
+    def countFiles(self, paths, encoding='utf-8', chunkSize=1048576, processes=None):
+        """Count buttons and digraphs of text files in parallel.
+
+        Every file is counted by one process, the counts are summed
+        (the transitions between the files are not counted).
+
+        Arguments:
+            paths: list(<str>)
+                Paths to the text files.
+            encoding: <str>
+                'utf-8': (default) encoding of the files
+            chunkSize: <int>
+                1048576: (default) bytes read at once
+            processes: <int>
+                None: (default) number of CPUs
+                1: count in the current process
+
+        Returns:
+            (digraphs, counts, unknown): see countText(...)
+        """
+        B = len(self.buttons)
+        digraphs, counts, unknown = np.zeros((B, B), dtype=np.int64), np.zeros(B, dtype=np.int64), 0
+        if(processes is None):
+            processes = os.cpu_count() or 1
+        processes = min(processes, max(len(paths), 1))
+        if(processes <= 1):
+            results = (self.countFile(path, encoding, chunkSize) for path in paths)
+            for d, c, u in results:
+                digraphs += d
+                counts += c
+                unknown += u
+            return digraphs, counts, unknown
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            for d, c, u in executor.map(self.countFile, paths, [encoding]*len(paths), [chunkSize]*len(paths)):
+                digraphs += d
+                counts += c
+                unknown += u
+        return digraphs, counts, unknown
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+#%% Imports - durability
+import os
+import threading
+import zlib
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% DURABILITY %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Group commit of the text log. The rows are written in batches, every
+#   batch is recorded in the journal "<path>.commit" by a line
+#       <start>\t<end>\t<count>\t<crc32>
+#   start and end are the offsets of the batch in the log, count the
+#   number of rows and crc32 the checksum of the bytes of the batch. The
+#   first line of the journal is the stamp of the log
+#       #\t<device>\t<inode>
+#   a journal belongs to the log if the stamp matches the file and its
+#   first batch matches the checksum. The log itself keeps the format of
+#   the logger.
+
+#   levels of durability
+#       'buffered': the rows are buffered by python (no journal)
+#       'flush':    every batch is flushed to the operating system,
+#                   it survives a crash of the process
+#       'fsync':    every batch is flushed to the disk,
+#                   it survives a crash of the machine
+durabilityLevels = ('buffered', 'flush', 'fsync')
+
+def journalPath(path):
+    """Path to the journal of a log.
+
+    Arguments:
+        path: <str>
+
+    Returns:
+        <str>
+    """
+    return path + '.commit'
+
+def resetJournal(path):
+    """Remove the journal of a log (e.g. the log is started anew).
+
+    Arguments:
+        path: <str>
+
+    Returns:
+    """
+    if(os.path.exists(journalPath(path))):
+        os.remove(journalPath(path))
+
+def _stamp(f):
+    # stamp of the open log in the journal
+    status = os.fstat(f.fileno())
+    return ('#\t%d\t%d\n' % (status.st_dev, status.st_ino)).encode('ascii')
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class commitFile:
+    """A class to represent a text log written by group commit.
+
+    The rows are committed (flushed, or flushed and synchronized to the
+    disk) after "batchSize" rows, or at most "commitInterval" seconds
+    after the first row of the batch. The rows are written by the
+    listener thread and committed by a timer thread when the typing
+    pauses.
+
+    Attributes:
+        self.path
+            <str> path to the log
+        self.commits
+            <int> number of committed batches
+
+    Methods:
+        commitFile(path, mode='a', durability='flush', batchSize=256, commitInterval=0.05)
+        write(text)
+        commit()
+        close()
+    """
+    def __init__(self, path, mode='a', durability='flush', batchSize=256, commitInterval=0.05):
+        """Inits commitFile class, opens the log and its journal.
+
+        Arguments:
+            path: <str>
+                Path to the log.
+            mode: <str>
+                'a': (default) append to the log
+                'w': start a new log (and a new journal)
+            durability: <str>
+                'flush': (default) see durabilityLevels
+                'fsync': see durabilityLevels
+            batchSize: <int>
+                256: (default) rows of a batch
+            commitInterval: <float>
+                0.05: (default) the longest time [s] a row waits
+                    for its commit
+
+        Raises:
+            Exception: unknown durability
+
+        Returns:
+        """
+        if(durability not in ('flush', 'fsync')):
+            raise Exception("commitFile.__init__(..., durability, ...): unknown durability <"+str(durability)+">, use 'flush' or 'fsync'.")
+        self.path = path
+        self.commits = 0
+        self._fsync = durability == 'fsync'
+        self._batchSize = batchSize
+        self._commitInterval = commitInterval
+        self._lock = threading.Lock()
+        self._timer = None
+        self._file = open(path, mode+'b')
+        self._journal = open(journalPath(path), mode+'b')
+        if(self._journal.seek(0, os.SEEK_END) == 0):
+            # a new journal starts by the stamp of the log
+            self._journal.write(_stamp(self._file))
+            self._journal.flush()
+        self._offset = self._file.seek(0, os.SEEK_END)
+        self._start = self._offset
+        self._count = 0
+        self._crc = 0
+
+    #%% writing
+    def write(self, text):
+        """Write a row of the log.
+
+        Arguments:
+            text: <str>
+
+        Returns:
+            <int>
+                Number of written characters.
+        """
+        data = text.encode('utf-8')
+        with self._lock:
+            self._file.write(data)
+            self._offset += len(data)
+            self._crc = zlib.crc32(data, self._crc)
+            self._count += 1
+            if(self._count >= self._batchSize):
+                self._commit()
+            elif(self._timer is None):
+                self._timer = threading.Timer(self._commitInterval, self.commit)
+                self._timer.daemon = True
+                self._timer.start()
+        return len(text)
+
+    def _commit(self):
+        """Commit the batch (the lock is held)."""
+        if(self._timer is not None):
+            self._timer.cancel()
+            self._timer = None
+        if(self._count == 0 or self._file is None):
+            return
+        self._file.flush()
+        if(self._fsync):
+            os.fsync(self._file.fileno())
+        # the journal follows the data, a record never points past the data
+        self._journal.write(('%d\t%d\t%d\t%08x\n' % (self._start, self._offset, self._count, self._crc)).encode('ascii'))
+        self._journal.flush()
+        if(self._fsync):
+            os.fsync(self._journal.fileno())
+        self._start = self._offset
+        self._count = 0
+        self._crc = 0
+        self.commits += 1
+
+    def commit(self):
+        """Commit the rows written so far.
+
+        Returns:
+        """
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        """Commit the rows and close the log.
+
+        Returns:
+        """
+        with self._lock:
+            self._commit()
+            if(self._file is not None):
+                self._file.close()
+                self._journal.close()
+                self._file = None
+
+#%% recovery
+def _readJournal(path):
+    """Stamp and records (start, end, count, crc) of the journal, a torn record is left out."""
+    stamp, records = None, []
+    try:
+        with open(journalPath(path), 'rb') as f:
+            stamp = f.readline()
+            for line in f:
+                fields = line.split(b'\t')
+                if(len(fields) != 4 or not line.endswith(b'\n')):
+                    break
+                try:
+                    records.append((int(fields[0]), int(fields[1]), int(fields[2]), int(fields[3], 16)))
+                except ValueError:
+                    break
+    except OSError:
+        pass
+    return stamp, records
+
+def _verified(f, record, size):
+    # the batch of the record is in the log and matches its checksum
+    start, offset, count, crc = record
+    if(start > offset or offset > size):
+        return False
+    f.seek(start)
+    return zlib.crc32(f.read(offset - start)) == crc
+
+def recoverLog(path, tailSize=65536):
+    """Repair the end of a log after a crash of the logger.
+
+    Every batch of the journal is verified by its checksum, in the order
+    of writing (the journal holds the batches since the last recovery).
+    A journal which does not belong to the log (its stamp or its first
+    batch does not match, e.g. the log was written anew) is ignored.
+    If a later batch is corrupted, the log is truncated at the start of
+    the batch. If all batches are verified, the rows after the last
+    batch are kept up to the last complete line and the torn rest of the
+    log is truncated (a batch lost by a crash, beyond the end of the log,
+    is rejected as well). Without a journal (durability 'buffered') only
+    the incomplete last line is truncated. The journal is rewritten to
+    its last verified record.
+
+    Arguments:
+        path: <str>
+            Path to the log.
+        tailSize: <int>
+            65536: (default) bytes read at once while searching
+                the last complete line
+
+    Raises:
+
+    Returns:
+        dict{'size': <int>, 'committed': <int>, 'truncated': <int>, 'rejected': <int>}
+            Size of the recovered log, its committed size [bytes]
+            (0 without journal), the number of truncated bytes and
+            the number of journal records rejected (beyond the end
+            of the log, not matching the checksum, following
+            a rejected record, or of a journal of another log).
+    """
+    size = os.path.getsize(path)
+    stamp, records = _readJournal(path)
+    committed, verified, corrupted = 0, 0, False
+    with open(path, 'rb+') as f:
+        # the journal of another log is ignored (nothing proves a torn tail)
+        belongs = stamp == _stamp(f) and len(records) > 0 and _verified(f, records[0], size)
+        # the batches in the order of writing
+        for start, offset, count, crc in (records if belongs else []):
+            if(start < committed or start > offset):
+                # not a batch of this log
+                corrupted = True
+                break
+            if(offset > size):
+                # the batch was lost by a crash, its rows are torn
+                break
+            if(not _verified(f, (start, offset, count, crc), size)):
+                # corrupted batch, the log ends before it
+                corrupted = True
+                committed = start
+                break
+            committed = offset
+            verified += 1
+        rejected = len(records) - verified
+        # the last complete line after the committed end
+        end = committed if corrupted else size
+        while end > committed:
+            start = max(committed, end - tailSize)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if(newline >= 0):
+                end = start + newline + 1
+                break
+            end = start
+        truncated = size - end
+        if(truncated > 0):
+            f.truncate(end)
+    if(os.path.exists(journalPath(path))):
+        # keep the last verified record only
+        with open(path, 'rb') as log, open(journalPath(path), 'wb') as f:
+            f.write(_stamp(log))
+            if(verified > 0):
+                f.write(('%d\t%d\t%d\t%08x\n' % records[verified - 1]).encode('ascii'))
+    return {'size': end, 'committed': committed, 'truncated': truncated, 'rejected': rejected}
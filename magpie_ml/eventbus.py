@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+#%% Imports - eventbus
+import numpy as np
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% EVENT BUS %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   The logger publishes every logged event into a bounded ring buffer,
+#   the consumers read the events at their own pace. The listener never
+#   waits for a consumer, a consumer which falls behind by more than the
+#   capacity of the buffer loses the oldest events and counts them.
+class eventBus:
+    """A class to represent a bounded ring buffer of logged events.
+
+    There is a single producer (the logger listener) and any number
+    of consumers (subscriptions). Publishing is a slot assignment and
+    an increment of the sequence number, it never blocks, does not
+    use locks and does not depend on the consumers.
+
+    The published event is a tuple (time, button, press, counter),
+    where "press" is True for a key press and False for a key release
+    and "counter" is the counter of the button logged in the column
+    "Event".
+
+    Attributes:
+        self.capacity
+            <int> number of events kept in the buffer
+
+    Methods:
+        eventBus(capacity=65536)
+        publish(event)
+        subscribe(fromStart=False)
+        getSequence()
+    """
+    def __init__(self, capacity=65536):
+        """Inits eventBus class.
+
+        Arguments:
+            capacity: <int>
+                65536: (default) number of events kept in the buffer
+
+        Raises:
+            Exception: capacity is not positive
+
+        Returns:
+        """
+        if(capacity < 1):
+            raise Exception("eventBus.__init__(capacity): capacity must be positive, got <"+str(capacity)+">.")
+        self.capacity = int(capacity)
+        self._slots = [None]*self.capacity
+        # number of published events (sequence number of the next event)
+        self._sequence = 0
+
+    #%% producer
+    def publish(self, event):
+        """Publish an event.
+
+        The slot is written before the sequence number is increased,
+        so that a consumer never reads a slot which was not written yet.
+
+        Arguments:
+            event: (<float>, <str>, <bool>, <int>)
+                Event (time, button, press, counter).
+
+        Returns:
+        """
+        sequence = self._sequence
+        self._slots[sequence % self.capacity] = event
+        self._sequence = sequence + 1
+
+    #%% consumers
+    def subscribe(self, fromStart=False):
+        """Create a new subscription to the published events.
+
+        Arguments:
+            fromStart: <bool>
+                False: (default) receive the events published from now on
+                True: receive the events still kept in the buffer as well
+
+        Returns:
+            <subscription>
+        """
+        sequence = self._sequence
+        if(fromStart):
+            sequence = max(0, sequence - self.capacity)
+        return subscription(self, sequence)
+
+    def getSequence(self):
+        """Get the number of events published so far.
+
+        Returns:
+            <int>
+        """
+        return self._sequence
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class subscription:
+    """A class to represent a reader of an eventBus.
+
+    Attributes:
+        self.position
+            <int> sequence number of the next event to read
+        self.overflow
+            <int> number of events overwritten before they were read
+
+    Methods:
+        poll(maxEvents=None)
+        pending()
+    """
+    def __init__(self, bus, position):
+        """Inits subscription class, see eventBus.subscribe(...).
+
+        Arguments:
+            bus: <eventBus>
+            position: <int>
+                Sequence number of the first event to read.
+
+        Returns:
+        """
+        self._bus = bus
+        self.position = position
+        self.overflow = 0
+
+    #%% read the events
+    def poll(self, maxEvents=None):
+        """Read the events published since the last poll.
+
+        The events are copied first and checked afterwards: every event
+        which the producer could have overwritten during the copy is
+        dropped and counted in self.overflow.
+
+        Arguments:
+            maxEvents: <int>
+                None: (default) read all published events
+                <int>: read at most maxEvents events
+
+        Returns:
+            list((<float>, <str>, <bool>, <int>))
+                Events in the order of publishing.
+        """
+        bus = self._bus
+        capacity = bus.capacity
+        end = bus._sequence
+        start = self.position
+        # skip the events which were already overwritten
+        if(end - start > capacity):
+            self.overflow += end - capacity - start
+            start = end - capacity
+        if(maxEvents is not None):
+            end = min(end, start + maxEvents)
+        if(end <= start):
+            return []
+        first, last = start % capacity, (end - 1) % capacity + 1
+        if(first < last):
+            events = bus._slots[first:last]
+        else:
+            events = bus._slots[first:] + bus._slots[:last]
+        # the producer may have overwritten the oldest copied events meanwhile
+        lost = bus._sequence - capacity - start
+        if(lost > 0):
+            lost = min(lost, len(events))
+            self.overflow += lost
+            events = events[lost:]
+        self.position = end
+        return events
+
+    def pending(self):
+        """Get the number of published events not read yet.
+
+        Returns:
+            <int>
+        """
+        return self._bus._sequence - self.position
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% CONSUMERS %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Live statistics, updated incrementally by calling update() (e.g. from a
+#   matplotlib timer or any loop outside of the listener thread).
+class liveDwell:
+    """A class to represent running dwell times (press to release).
+
+    Attributes:
+        self.subscription
+            <subscription> of the event bus
+        self.count
+            <array(B)> number of finished key strokes of every button
+        self.mean
+            <array(B)> mean dwell time [s] of every button
+
+    Methods:
+        liveDwell(bus, buttons)
+        update(maxEvents=None)
+        getStatistics()
+    """
+    def __init__(self, bus, buttons):
+        """Inits liveDwell class.
+
+        Arguments:
+            bus: <eventBus>
+                Event bus fed by the logger.
+            buttons: list(<str>)
+                Buttons to follow, other buttons are ignored.
+
+        Returns:
+        """
+        self.subscription = bus.subscribe()
+        self._buttons = list(buttons)
+        self._index = {b: i for i, b in enumerate(self._buttons)}
+        self.count = np.zeros(len(self._buttons), dtype=np.int64)
+        self.mean = np.zeros(len(self._buttons))
+        self._m2 = np.zeros(len(self._buttons))
+        # time of the pending press of every button
+        self._pressed = {}
+
+    #%% consume the events
+    def update(self, maxEvents=None):
+        """Consume the published events.
+
+        Arguments:
+            maxEvents: <int>
+                None: (default) consume all published events
+
+        Returns:
+            <int>
+                Number of consumed events.
+        """
+        events = self.subscription.poll(maxEvents)
+        index, pressed = self._index, self._pressed
+        count, mean, m2 = self.count, self.mean, self._m2
+        for time, button, press, counter in events:
+            i = index.get(button, None)
+            if(i is None):
+                continue
+            if(press):
+                pressed[i] = (time, counter)
+                continue
+            # release of the pending press (a lost press is skipped)
+            start = pressed.pop(i, None)
+            if(start is None or start[1] != counter):
+                continue
+            # running mean and variance (Welford)
+            dwell = time - start[0]
+            count[i] += 1
+            delta = dwell - mean[i]
+            mean[i] += delta/count[i]
+            m2[i] += delta*(dwell - mean[i])
+        return len(events)
+
+    def getStatistics(self):
+        """Get the running dwell statistics.
+
+        Returns:
+            (mean, var, count): (<array(B)>, <array(B)>, <array(B)>)
+                Mean and variance (NaN below 2 key strokes) of the
+                dwell time [s] and count of key strokes of every button.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.where(self.count > 1, self._m2/(self.count - 1), np.nan)
+            mean = np.where(self.count > 0, self.mean, np.nan)
+        return mean, var, self.count.copy()
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class liveTransitions:
+    """A class to represent running transition matrices.
+
+    The matrices follow analytics.getTimeCorrelationOcccuranceMatrix(...):
+    the element [Y, X] holds the time between a press of button X and
+    the following press of button Y, the periods longer than timeLimit
+    are left out. The matrices can be drawn by
+    analytics.plotMatrixHeatmap(...) or layout.plotButtonRelations(...).
+
+    Attributes:
+        self.subscription
+            <subscription> of the event bus
+        self.count
+            <array(B,B)> number of transitions
+
+    Methods:
+        liveTransitions(bus, buttons, timeLimit)
+        update(maxEvents=None)
+        getMatrices()
+    """
+    def __init__(self, bus, buttons, timeLimit):
+        """Inits liveTransitions class.
+
+        Arguments:
+            bus: <eventBus>
+                Event bus fed by the logger.
+            buttons: list(<str>)
+                Buttons to follow, other buttons are ignored.
+            timeLimit: <float>
+                A time limit beyond which the transition is considered
+                outlier and left out.
+
+        Returns:
+        """
+        self.subscription = bus.subscribe()
+        self._buttons = list(buttons)
+        self._index = {b: i for i, b in enumerate(self._buttons)}
+        self._timeLimit = timeLimit
+        size = len(self._buttons)
+        self.count = np.zeros((size, size), dtype=np.int64)
+        self._mean = np.zeros((size, size))
+        self._m2 = np.zeros((size, size))
+        # last followed press (time, index)
+        self._previous = None
+
+    #%% consume the events
+    def update(self, maxEvents=None):
+        """Consume the published events.
+
+        Arguments:
+            maxEvents: <int>
+                None: (default) consume all published events
+
+        Returns:
+            <int>
+                Number of consumed events.
+        """
+        events = self.subscription.poll(maxEvents)
+        index, timeLimit, previous = self._index, self._timeLimit, self._previous
+        count, mean, m2 = self.count, self._mean, self._m2
+        for time, button, press, counter in events:
+            if(not press):
+                continue
+            y = index.get(button, None)
+            if(y is None):
+                continue
+            if(previous is not None):
+                period = time - previous[0]
+                x = previous[1]
+                if(period <= timeLimit):
+                    # running mean and variance (Welford)
+                    count[y, x] += 1
+                    delta = period - mean[y, x]
+                    mean[y, x] += delta/count[y, x]
+                    m2[y, x] += delta*(period - mean[y, x])
+            previous = (time, y)
+        self._previous = previous
+        return len(events)
+
+    def getMatrices(self):
+        """Get the running transition matrices.
+
+        Returns:
+            (mean, var, count): (<matrix>, <matrix>, <matrix>)
+                Mean and variance (NaN below 2 transitions) of the
+                transition time [s] and count of transitions.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.where(self.count > 1, self._m2/(self.count - 1), np.nan)
+            mean = np.where(self.count > 0, self._mean, np.nan)
+        return mean, var, self.count.astype(float)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#%% Imports - export
+import numpy as np
+import os
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError: # optional dependency (pip install magpie_ml[parquet])
+    pa = None
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% EXPORT %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Parquet dataset of the parsed log, for machine learning tools and for
+#   fast reading of a part of the log. The dataset is a directory
+#       <path>/events/session=<n>/*.parquet   events of every session
+#       <path>/strokes.parquet                paired key strokes
+#   The events are sorted by time and the key strokes by (button, timeIn),
+#   so that the statistics of the row groups skip most of the data
+#   of a query restricted to a time window or to a few buttons.
+
+def _requirePyarrow(function):
+    if(pa is None):
+        raise Exception("export."+function+"(..): the package pyarrow is required (pip install pyarrow).")
+
+#%% recognize a dataset
+def isParquetDataset(path):
+    """Check whether a path is a Parquet dataset written by exportParquet(...).
+
+    Arguments:
+        path: <str>
+
+    Returns:
+        <bool>
+    """
+    return os.path.isdir(os.path.join(path, 'events'))
+
+#%% write the dataset
+def exportParquet(log, path, rowGroupSize=65536, compression='zstd'):
+    """Write the events and the key strokes of a log to a Parquet dataset.
+
+    The events are cleaned and session corrected as parsed by analytics
+    (the time continues over the sessions), the buttons and the keys
+    are dictionary encoded. An existing dataset at "path" is replaced.
+
+    Arguments:
+        log: <analytics>
+            Parsed log.
+        path: <str>
+            Directory of the dataset.
+        rowGroupSize: <int>
+            65536: (default) the largest number of rows of a row group
+        compression: <str>
+            'zstd': (default) compression of the Parquet files
+
+    Raises:
+        Exception: pyarrow is not installed.
+
+    Returns:
+        dict{'events': <int>, 'strokes': <int>}
+            Number of written events and key strokes.
+    """
+    _requirePyarrow('exportParquet')
+    df = log._df
+    # events, sorted by time within every session
+    order = np.lexsort((df['Time'].values, df['Session'].values))
+    events = pa.table({'time':    pa.array(df['Time'].values[order], pa.float64()),
+                       'key':     pa.array(df['Key'].values[order], pa.string()).dictionary_encode(),
+                       'button':  pa.array(df['Button'].values[order], pa.string()).dictionary_encode(),
+                       'event':   pa.array(df['Event'].values[order], pa.int32()),
+                       'session': pa.array(df['Session'].values[order], pa.int32())})
+    fileFormat = ds.ParquetFileFormat()
+    ds.write_dataset(events, os.path.join(path, 'events'), format=fileFormat,
+                     partitioning=ds.partitioning(pa.schema([('session', pa.int32())]), flavor='hive'),
+                     file_options=fileFormat.make_write_options(compression=compression, use_dictionary=True, write_statistics=True),
+                     max_rows_per_group=rowGroupSize, min_rows_per_group=min(rowGroupSize, 4096),
+                     existing_data_behavior='delete_matching')
+    # key strokes, sorted by button name and time
+    buttons = sorted(df['Button'].unique())
+    table, offsets, unmatched = log.getPairedTiming(buttons)
+    strokes = pa.table({'button':  pa.DictionaryArray.from_arrays(pa.array(table['button'], pa.int32()), pa.array(buttons, pa.string())),
+                        'timeIn':  table['timeIn'],
+                        'timeOut': table['timeOut'],
+                        'timeDur': table['timeDur']})
+    pq.write_table(strokes, os.path.join(path, 'strokes.parquet'), row_group_size=rowGroupSize,
+                   compression=compression, use_dictionary=True, write_statistics=True)
+    return {'events': events.num_rows, 'strokes': strokes.num_rows}
+
+#%% read the dataset
+def dictionaryCodes(column, buttons):
+    """Translate a dictionary encoded column of buttons to button codes.
+
+    Only the dictionaries are translated, the values stay as indices.
+
+    Arguments:
+        column: <pyarrow.ChunkedArray>
+            Dictionary encoded column 'button'.
+        buttons: list(<str>)
+            Buttons of the codes.
+
+    Returns:
+        <array(N)>
+            Index of the button in "buttons" (-1 for other buttons).
+    """
+    index = {b: i for i, b in enumerate(buttons)}
+    codes = [np.zeros(0, dtype=np.int64)]
+    for chunk in column.chunks:
+        lut = np.array([index.get(b, -1) for b in chunk.dictionary.to_pylist()] + [-1], dtype=np.int64)
+        codes.append(lut[chunk.indices.to_numpy(zero_copy_only=False)])
+    return np.concatenate(codes)
+
+def _filter(startColumn, endColumn, window, buttons, presses=False):
+    """Build the filter of a time window, a set of buttons and presses."""
+    condition = (ds.field('event') > 0) if presses else None
+    if(window is not None):
+        byWindow = (ds.field(startColumn) >= float(window[0])) & (ds.field(endColumn) <= float(window[1]))
+        condition = byWindow if condition is None else condition & byWindow
+    if(buttons is not None):
+        byButton = ds.field('button').isin(list(buttons))
+        condition = byButton if condition is None else condition & byButton
+    return condition
+
+def readParquetEvents(path, window=None, buttons=None, columns=['time', 'key', 'button', 'event', 'session'], presses=False):
+    """Read the events of a Parquet dataset.
+
+    Only the requested columns are read and the filters are evaluated
+    on the statistics of the row groups first, the row groups outside
+    of the window (or without the buttons) are not read at all.
+
+    Arguments:
+        path: <str>
+            Directory of the dataset.
+        window: (<float>, <float>)
+            None: (default) all events
+            (start, end): events with start <= time <= end
+        buttons: list(<str>)
+            None: (default) all buttons
+            list: events of the buttons only
+        columns: list(<str>)
+            ['time', 'key', 'button', 'event', 'session']: (default)
+                columns to read
+        presses: <bool>
+            False: (default) presses and releases
+            True: presses only
+
+    Raises:
+        Exception: pyarrow is not installed.
+
+    Returns:
+        <pyarrow.Table>
+            Events sorted by (session, time).
+    """
+    _requirePyarrow('readParquetEvents')
+    dataset = ds.dataset(os.path.join(path, 'events'), format='parquet', partitioning='hive')
+    table = dataset.to_table(columns=list(columns), filter=_filter('time', 'time', window, buttons, presses))
+    sortKeys = [(c, 'ascending') for c in ('session', 'time') if c in columns]
+    return table.sort_by(sortKeys) if len(sortKeys) > 0 else table
+
+def readParquetStrokes(path, window=None, buttons=None, columns=['button', 'timeIn', 'timeOut', 'timeDur']):
+    """Read the paired key strokes of a Parquet dataset.
+
+    See readParquetEvents(...), the key strokes within the window are
+    pressed and released within the window.
+
+    Returns:
+        <pyarrow.Table>
+    """
+    _requirePyarrow('readParquetStrokes')
+    dataset = ds.dataset(os.path.join(path, 'strokes.parquet'), format='parquet')
+    return dataset.to_table(columns=list(columns), filter=_filter('timeIn', 'timeOut', window, buttons))
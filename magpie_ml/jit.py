@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#%% Imports - jit
+import numpy as np
+import numba
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% JIT %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Compiled (numba) loops of the kernels. The module is imported by kernels
+#   when numba is installed (pip install magpie_ml[jit]), the results are
+#   the results of the numpy kernels of the same name. The loops are
+#   compiled on the first call and cached on the disk.
+
+#   the largest table of key strokes of a session per event, beyond it
+#   (counters far above the number of events) the sorting kernel is used
+_tableRatio = 16
+
+#%% pair presses with releases
+@numba.njit(cache=True)
+def pairPressRelease(session, button, event, buttonCount):
+    """Pair the presses and releases of key strokes in a single pass.
+
+    See kernels.pairPressRelease(...). The key strokes of every session are
+    tracked in a table of the counters 0 ... max of every button. The last
+    press and the first release of every key stroke form the pair, as the
+    sorting kernel pairs them.
+
+    Arguments:
+        session: <array(N)> of int64
+            Session of every event, in ascending order.
+        button: <array(N)> of int64
+        event: <array(N)> of int64
+        buttonCount: <int>
+
+    Returns:
+        (press, release, unmatchedPress, unmatchedRelease)
+            Index of the press and of the release of every pair (ordered
+            by button, session and counter), None if the sessions are not
+            ascending or the table of a session would be too large.
+    """
+    n = len(button)
+    for i in range(1, n):
+        if session[i] < session[i - 1]:
+            return None
+    presses  = np.zeros(buttonCount, dtype=np.int64)
+    releases = np.zeros(buttonCount, dtype=np.int64)
+    # pairs in the order (session, button, counter)
+    pairPress   = np.empty(n // 2 + 1, dtype=np.int64)
+    pairRelease = np.empty(n // 2 + 1, dtype=np.int64)
+    pairButton  = np.empty(n // 2 + 1, dtype=np.int64)
+    pairCount = 0
+    base = np.zeros(buttonCount + 1, dtype=np.int64)
+    start = 0
+    while start < n:
+        # run of the session, every button has its counters 0 ... max
+        end = start
+        base[:] = 0
+        while end < n and session[end] == session[start]:
+            counter = event[end] if event[end] >= 0 else -event[end]
+            if counter + 1 > base[button[end] + 1]:
+                base[button[end] + 1] = counter + 1
+            end += 1
+        for b in range(buttonCount):
+            base[b + 1] += base[b]
+        size = base[buttonCount]
+        if size > _tableRatio * (end - start) + 4096:
+            return None
+        lastPress    = np.full(size, -1, dtype=np.int64)
+        firstRelease = np.full(size, -1, dtype=np.int64)
+        for i in range(start, end):
+            if event[i] < 0:
+                releases[button[i]] += 1
+                cell = base[button[i]] - event[i]
+                if firstRelease[cell] < 0:
+                    firstRelease[cell] = i
+            else:
+                presses[button[i]] += 1
+                lastPress[base[button[i]] + event[i]] = i
+        for b in range(buttonCount):
+            for cell in range(base[b], base[b + 1]):
+                if lastPress[cell] >= 0 and firstRelease[cell] >= 0:
+                    pairPress[pairCount]   = lastPress[cell]
+                    pairRelease[pairCount] = firstRelease[cell]
+                    pairButton[pairCount]  = b
+                    pairCount += 1
+        start = end
+    # group by button (stable, sessions stay in order)
+    offsets = np.zeros(buttonCount + 1, dtype=np.int64)
+    for p in range(pairCount):
+        offsets[pairButton[p] + 1] += 1
+    for b in range(buttonCount):
+        offsets[b + 1] += offsets[b]
+    position = offsets[:-1].copy()
+    press   = np.empty(pairCount, dtype=np.int64)
+    release = np.empty(pairCount, dtype=np.int64)
+    for p in range(pairCount):
+        b = pairButton[p]
+        press[position[b]]   = pairPress[p]
+        release[position[b]] = pairRelease[p]
+        position[b] += 1
+    paired = offsets[1:] - offsets[:-1]
+    return press, release, presses - paired, releases - paired
+
+#%% statistics of consecutive events
+@numba.njit(cache=True)
+def transitionStatistics(button, time, buttonCount, timeLimit, pairFirst):
+    """Mean, variance and count of the periods between consecutive events.
+
+    See kernels.transitionStatistics(...), the statistics are accumulated
+    in one pass (Welford's algorithm).
+
+    Returns:
+        (mean, var, count): (<array(B*B)>, <array(B*B)>, <array(B*B)>)
+    """
+    cellCount = buttonCount * buttonCount
+    count  = np.zeros(cellCount)
+    mean   = np.zeros(cellCount)
+    square = np.zeros(cellCount)
+    n = len(button)
+    for i in range(0 if pairFirst else 1, n):
+        previous = i - 1 if i > 0 else 0
+        period = time[i] - time[previous]
+        if period <= timeLimit:
+            cell = button[i] * buttonCount + button[previous]
+            count[cell] += 1.0
+            delta = period - mean[cell]
+            mean[cell] += delta / count[cell]
+            square[cell] += delta * (period - mean[cell])
+    var = np.empty(cellCount)
+    for cell in range(cellCount):
+        if count[cell] == 0.0:
+            mean[cell] = np.nan
+        var[cell] = square[cell] / (count[cell] - 1.0) if count[cell] > 1.0 else np.nan
+    return mean, var, count
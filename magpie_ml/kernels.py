@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+#%% Imports - kernels
+import numpy as np
+try:
+    from magpie_ml import jit as _jit
+except ImportError: # optional dependency (pip install magpie_ml[jit])
+    _jit = None
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% KERNELS %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Array kernels of the analytics. The kernels work on flat numpy arrays of
+#   the parsed log (buttons are integer codes), they know nothing about
+#   pandas or the log format. The sequential kernels (pairPressRelease,
+#   transitionStatistics) run compiled loops of the module jit when numba
+#   is installed.
+
+#   implementation of the sequential kernels, 'numba' or 'numpy'
+backend = 'numpy' if _jit is None else 'numba'
+
+def setBackend(name):
+    """Select the implementation of the sequential kernels.
+
+    Arguments:
+        name: <str>
+            'numba': compiled loops (numba is required)
+            'numpy': numpy kernels
+
+    Raises:
+        Exception: unknown backend or numba is not installed
+
+    Returns:
+    """
+    global backend
+    if(name not in ('numba', 'numpy')):
+        raise Exception("kernels.setBackend(name): unknown backend <"+str(name)+">, use 'numba' or 'numpy'.")
+    if(name == 'numba' and _jit is None):
+        raise Exception("kernels.setBackend(name): the package numba is required for backend 'numba' (pip install numba).")
+    backend = name
+
+#   row of a paired key stroke
+pairedDtype = np.dtype([('button', np.int32), ('timeIn', np.float64), ('timeOut', np.float64), ('timeDur', np.float64)])
+#   row of a chronological event
+chronologicalDtype = np.dtype([('button', np.int32), ('time', np.float64), ('count', np.int64)])
+
+#%% pair presses with releases
+def pairPressRelease(session, button, event, time, buttonCount):
+    """Pair the presses and releases of key strokes.
+
+    A key stroke is identified by (session, button, counter), since the
+    logger restarts the counters in every session. The events are sorted
+    by (button, session, counter, press before release) and every press
+    directly followed by the release of the same key stroke forms a pair.
+    The remaining events are unmatched (e.g. the release was not logged
+    because the logger stopped, or a counter was logged twice).
+
+    Arguments:
+        session: <array(N)>
+            Session of every event.
+        button: <array(N)>
+            Button code of every event (0 <= code < buttonCount).
+        event: <array(N)>
+            Logged "Event", +counter for press and -counter for release.
+        time: <array(N)>
+            Time of every event.
+        buttonCount: <int>
+            Number of button codes B.
+
+    Raises:
+
+    Returns:
+        table: <array(P)> of pairedDtype
+            Paired key strokes (button, timeIn, timeOut, timeDur)
+            grouped by button, chronological within a button.
+        offsets: <array(B+1)>
+            Key strokes of button b are table[offsets[b]:offsets[b+1]].
+        unmatchedPress: <array(B)>
+            Number of presses without a release of every button.
+        unmatchedRelease: <array(B)>
+            Number of releases without a press of every button.
+    """
+    session = np.asarray(session, dtype=np.int64)
+    button  = np.asarray(button, dtype=np.int64)
+    event   = np.asarray(event, dtype=np.int64)
+    time    = np.asarray(time, dtype=np.float64)
+    if(backend == 'numba'):
+        pairs = _pairPressReleaseJit(session, button, event, buttonCount)
+        if(pairs is not None):
+            press, release, unmatchedPress, unmatchedRelease = pairs
+            table = np.empty(len(press), dtype=pairedDtype)
+            table['button']  = button[press]
+            table['timeIn']  = time[press]
+            table['timeOut'] = time[release]
+            table['timeDur'] = table['timeOut'] - table['timeIn']
+            offsets = np.zeros(buttonCount + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(table['button'], minlength=buttonCount))
+            return table, offsets, unmatchedPress, unmatchedRelease
+    release = event < 0
+    counter = np.abs(event)
+    # one sorted pass (the last key is the primary one)
+    order = np.lexsort((release, counter, session, button))
+    button, session, counter, release, time = button[order], session[order], counter[order], release[order], time[order]
+    # press followed by the release of the same key stroke
+    pair = (~release[:-1]) & release[1:] & (button[:-1] == button[1:]) & (session[:-1] == session[1:]) & (counter[:-1] == counter[1:])
+    first = np.flatnonzero(pair)
+    table = np.empty(len(first), dtype=pairedDtype)
+    table['button']  = button[first]
+    table['timeIn']  = time[first]
+    table['timeOut'] = time[first + 1]
+    table['timeDur'] = table['timeOut'] - table['timeIn']
+    offsets = np.zeros(buttonCount + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(table['button'], minlength=buttonCount))
+    # events left out of the pairs
+    matched = np.zeros(len(button), dtype=bool)
+    matched[first] = True
+    matched[first + 1] = True
+    unmatchedPress   = np.bincount(button[~matched & ~release], minlength=buttonCount)
+    unmatchedRelease = np.bincount(button[~matched & release], minlength=buttonCount)
+    return table, offsets, unmatchedPress, unmatchedRelease
+
+def _pairPressReleaseJit(session, button, event, buttonCount):
+    # the compiled loop takes the sessions in ascending order
+    order = None
+    if(len(session) > 1 and np.any(session[1:] < session[:-1])):
+        order = np.argsort(session, kind='stable')
+        session, button, event = session[order], button[order], event[order]
+    pairs = _jit.pairPressRelease(session, button, event, buttonCount)
+    if(pairs is None or order is None):
+        return pairs
+    press, release, unmatchedPress, unmatchedRelease = pairs
+    return order[press], order[release], unmatchedPress, unmatchedRelease
+
+#%% statistics of values grouped into matrix cells
+def cellStatistics(cell, values, cellCount):
+    """Mean, variance and count of values grouped by matrix cell.
+
+    The variance is computed in two passes (around the mean of the cell)
+    to avoid the cancellation of sum of squares.
+
+    Arguments:
+        cell: <array(N)>
+            Flat index of the cell of every value.
+        values: <array(N)>
+            Values.
+        cellCount: <int>
+            Number of cells.
+
+    Raises:
+
+    Returns:
+        (mean, var, count): (<array(cellCount)>, <array(cellCount)>, <array(cellCount)>)
+            Mean (NaN for empty cells), variance (NaN below 2 values)
+            and count of values of every cell.
+    """
+    count = np.bincount(cell, minlength=cellCount).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(cell, weights=values, minlength=cellCount) / count
+        square = np.bincount(cell, weights=(values - mean[cell])**2, minlength=cellCount)
+        var = np.where(count > 1, square / (count - 1), np.nan)
+    return mean, var, count
+
+#%% merge of partial statistics
+def mergeStatistics(first, second):
+    """Merge statistics of two disjoint sets of values.
+
+    The sums of squares around the means are combined by the pairwise
+    update of Chan et al., so that the statistics of partitions of the
+    values can be computed separately (e.g. by several processes).
+
+    Arguments:
+        first: (mean, var, count)
+            Mean (NaN for empty cells), variance (NaN below 2 values)
+            and count of values of every cell, e.g. of cellStatistics(...).
+        second: (mean, var, count)
+            The same of the other values.
+
+    Raises:
+
+    Returns:
+        (mean, var, count)
+            Statistics of the values of both sets.
+    """
+    mean1, var1, count1 = first
+    mean2, var2, count2 = second
+    count = count1 + count2
+    both = (count1 > 0) & (count2 > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta = np.where(both, mean2 - mean1, 0.0)
+        mean = np.where(count1 > 0, mean1 + np.where(both, delta * count2 / count, 0.0), mean2)
+        square = (np.where(count1 > 1, var1 * (count1 - 1), 0.0) + np.where(count2 > 1, var2 * (count2 - 1), 0.0) 
+                  + np.where(both, delta**2 * count1 * count2 / count, 0.0))
+        var = np.where(count > 1, square / (count - 1), np.nan)
+    return mean, var, count
+
+#%% periods between consecutive events
+def transitionStatistics(button, time, buttonCount, timeLimit, pairFirst=False):
+    """Statistics of the periods between consecutive events.
+
+    Every event is paired with the preceding event, for the preceding
+    event X and the current event Y the period is stored in the element
+    [Y, X] of the matrices. The pairs with the period above timeLimit
+    are left out.
+
+    Arguments:
+        button: <array(N)>
+            Button code of every event (chronological).
+        time: <array(N)>
+            Time of every event.
+        buttonCount: <int>
+            Number of button codes B.
+        timeLimit: <float>
+            A time limit beyond which the pair is considered outlier
+            and left out.
+        pairFirst: <bool>
+            False: (default) the first event has no pair
+            True: the first event is paired with itself (period 0)
+
+    Raises:
+
+    Returns:
+        (mean, var, count): (<array(B,B)>, <array(B,B)>, <array(B,B)>)
+            Mean (NaN for empty cells), variance (NaN below 2 pairs)
+            and count of the periods.
+    """
+    button = np.asarray(button, dtype=np.int64)
+    time   = np.asarray(time, dtype=np.float64)
+    if(backend == 'numba'):
+        mean, var, count = _jit.transitionStatistics(button, time, buttonCount, float(timeLimit), pairFirst)
+    else:
+        if(pairFirst):
+            previous, current = np.concatenate((button[:1], button[:-1])), button
+            period = time - np.concatenate((time[:1], time[:-1]))
+        else:
+            previous, current, period = button[:-1], button[1:], np.diff(time)
+        keep = period <= timeLimit
+        mean, var, count = cellStatistics((current*buttonCount + previous)[keep], period[keep], buttonCount**2)
+    shape = (buttonCount, buttonCount)
+    return mean.reshape(shape), var.reshape(shape), count.reshape(shape)
+
+#%% latencies between consecutive key strokes
+def flightMatrices(button, timeIn, timeOut, buttonCount, timeLimit):
+    """Latency matrices between consecutive key strokes.
+
+    The key strokes are ordered by press time, every key stroke is
+    paired with the preceding one. For the preceding key stroke X and
+    the current key stroke Y the latencies are
+        'PP': press X   -> press Y
+        'PR': press X   -> release Y
+        'RP': release X -> press Y (flight time, negative for rollover)
+        'RR': release X -> release Y
+    and they are stored in the element [Y, X] of the matrices. The pairs
+    with PP latency above timeLimit are left out of all the matrices.
+    Presses without a release are not key strokes, 'PP' differs from
+    transitionStatistics(...) of all presses.
+
+    Arguments:
+        button: <array(N)>
+            Button code of every key stroke.
+        timeIn: <array(N)>
+            Press time of every key stroke.
+        timeOut: <array(N)>
+            Release time of every key stroke.
+        buttonCount: <int>
+            Number of button codes B.
+        timeLimit: <float>
+            A time limit of PP latency beyond which the pair is
+            considered outlier and left out.
+
+    Raises:
+
+    Returns:
+        dict{'PP', 'PR', 'RP', 'RR': (mean, var, count)}
+            Mean, variance and count matrices <array(B,B)> of every latency.
+    """
+    order = np.argsort(timeIn, kind='stable')
+    button, timeIn, timeOut = np.asarray(button)[order], np.asarray(timeIn)[order], np.asarray(timeOut)[order]
+    previous, current = slice(None, -1), slice(1, None)
+    latencies = {'PP': timeIn[current]  - timeIn[previous],
+                 'PR': timeOut[current] - timeIn[previous],
+                 'RP': timeIn[current]  - timeOut[previous],
+                 'RR': timeOut[current] - timeOut[previous]}
+    keep = latencies['PP'] <= timeLimit
+    cell = (button[current] * buttonCount + button[previous])[keep].astype(np.int64)
+    matrices = {}
+    for name, latency in latencies.items():
+        mean, var, count = cellStatistics(cell, latency[keep], buttonCount**2)
+        shape = (buttonCount, buttonCount)
+        matrices[name] = (mean.reshape(shape), var.reshape(shape), count.reshape(shape))
+    return matrices
+
+#%% number of keys held down over time
+def concurrencyTimeline(timeIn, timeOut):
+    """Number of keys held down over time (sweep line).
+
+    The presses (+1) and releases (-1) are sorted by time, a release
+    goes before a press at the same time, so that touching key strokes
+    do not overlap (a key stroke of zero duration is released after its
+    press). The cumulative sum is the number of keys down.
+
+    Arguments:
+        timeIn: <array(N)>
+            Press time of every key stroke.
+        timeOut: <array(N)>
+            Release time of every key stroke.
+
+    Raises:
+
+    Returns:
+        time: <array(2N)>
+            Time of every event.
+        keysDown: <array(2N)>
+            Number of keys held down after the event.
+        timeAtKeysDown: <array(K+1)>
+            Time [s] spent with k = 0, 1, ..., K keys held down
+            (between the first and the last event).
+    """
+    timeIn, timeOut = np.asarray(timeIn), np.maximum(timeOut, timeIn)
+    time  = np.concatenate((timeIn, timeOut))
+    delta = np.concatenate((np.ones(len(timeIn), dtype=np.int64), -np.ones(len(timeOut), dtype=np.int64)))
+    # releases, presses, releases of zero duration
+    rank  = np.concatenate((np.ones(len(timeIn), dtype=np.int64), np.where(timeOut > timeIn, 0, 2)))
+    order = np.lexsort((rank, time))
+    time, keysDown = time[order], np.cumsum(delta[order])
+    if(len(time) == 0):
+        return time, keysDown, np.zeros(1)
+    timeAtKeysDown = np.bincount(keysDown[:-1], weights=np.diff(time), minlength=keysDown.max() + 1)
+    return time, keysDown, timeAtKeysDown
+
+#%% overlaps of key strokes held down together
+def rolloverMatrices(button, timeIn, timeOut, buttonCount):
+    """Overlaps of the key strokes held down at the same time.
+
+    Every press of a key stroke Y is paired with every key stroke X held
+    down at that time (pressed before Y, released after the press of Y),
+    the open set of the sweep of concurrencyTimeline(...). E.g. shift
+    held over A, B and C overlaps all three. The overlap is the time
+    both keys are held down. In the order of presses, the key strokes
+    pressed while X is held down are the ones following X up to its
+    release, so all pairs are built at once.
+
+    Arguments:
+        button: <array(N)>
+            Button code of every key stroke.
+        timeIn: <array(N)>
+            Press time of every key stroke.
+        timeOut: <array(N)>
+            Release time of every key stroke.
+        buttonCount: <int>
+            Number of button codes B.
+
+    Raises:
+
+    Returns:
+        overlap: <array(B,B)>
+            Mean overlap [s] of Y pressed while X is held down
+            (NaN without overlap).
+        rollovers: <array(B,B)>
+            Number of presses of Y while X is held down.
+        strokes: <array(B)>
+            Number of key strokes of every button.
+        overlapping: <int>
+            Number of key strokes pressed while another key is held down.
+    """
+    order = np.argsort(timeIn, kind='stable')
+    button, timeIn, timeOut = np.asarray(button, dtype=np.int64)[order], np.asarray(timeIn)[order], np.asarray(timeOut)[order]
+    n = len(button)
+    # key strokes pressed while the i-th one is held down: i+1 ... end[i]-1
+    end = np.searchsorted(timeIn, timeOut, side='left')
+    held = np.maximum(end - np.arange(n) - 1, 0)
+    first = np.repeat(np.arange(n), held)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(held) - held, held)
+    overlap = np.minimum(timeOut[first], timeOut[second]) - timeIn[second]
+    keep = overlap > 0
+    cell = button[second][keep] * buttonCount + button[first][keep]
+    mean, var, rollovers = cellStatistics(cell, overlap[keep], buttonCount**2)
+    shape = (buttonCount, buttonCount)
+    strokes = np.bincount(button, minlength=buttonCount).astype(float)
+    overlapping = len(np.unique(second[keep]))
+    return mean.reshape(shape), rollovers.reshape(shape), strokes, overlapping
+
+#%% latency per distance
+def normalizeByDistance(mean, var, distance):
+    """Normalize latency matrices by the distance between buttons.
+
+    The latency of every pair of buttons is divided by their distance,
+    the pairs with zero distance (the same button) are NaN.
+
+    Arguments:
+        mean: <array(B,B)>
+            Mean latency [s].
+        var: <array(B,B)>
+            Variance of latency [s^2].
+        distance: <array(B,B)>
+            Distance between the buttons (e.g. layout.getDistanceMatrix(...)).
+
+    Raises:
+        Exception: The shapes do not match.
+
+    Returns:
+        (mean, var): (<array(B,B)>, <array(B,B)>)
+            Mean [s/distance] and variance [s^2/distance^2] of latency
+            per unit of distance.
+    """
+    distance = np.asarray(distance, dtype=float)
+    if(distance.shape != np.shape(mean)):
+        raise Exception("kernels.normalizeByDistance(..., distance): distance of shape "+str(distance.shape)+" does not match the matrix of shape "+str(np.shape(mean))+".")
+    distance = np.where(distance > 0, distance, np.nan)
+    return mean / distance, var / distance**2
@@ -7,7 +7,9 @@ Created on Thu Dec 31 19:35:19 2020
 #%% Imports - layout
 import matplotlib.patches as patches
 from mpl_toolkits.mplot3d import Axes3D  # noqa: F401 unused import
-from pandas.core.common import flatten
+from matplotlib.collections import PatchCollection
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+from magpie_ml.renderer import renderer2D, renderer3D
 import warnings
 import numpy as np
 
@@ -63,10 +65,16 @@ class layout:
         getSymbolList()
         getButtonToSymbolDict()
         getSymbolToButtonDict()
+        getFingerIndex(buttons=[])
+        getHandIndex(buttons=[])
+        getDistanceMatrix(buttons=[], metric='euclidean')
         setButtonValue(button, labels, value)
         getButtonValue(button, labels)
         plotKeyboard3D(axis, defaultLook=True, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], aspectRatioModifier=[1.0, 1.0, 1.0], fontSize=10)
         plotKeyboard2D(axis, defaultLook=True, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], fontSize=10)        
+        getRenderer2D(axis, buttons=[], defaultLook=True, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], fontSize=10, cmap='viridis', vmin=None, vmax=None, animated=False)
+        getRenderer3D(axis, buttons=[], defaultLook=True, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], aspectRatioModifier=[1.0, 1.0, 1.0], fontSize=10, cmap=None, vmin=None, vmax=None)
+        plotButtonRelations(axis, relations, buttons=[], threshold=None, topK=None, color='black', cmap=None, widthScale=1.0, alpha=0.25)
     """
     #%% init
     def __init__(self, keyboardType='external', qwerty=True, shift_l_long=True, enter_tall=True, language='englishUS', alpha=0.1, facecolor='blue', edgecolor='black'):
@@ -395,6 +403,9 @@ class layout:
         self.leftHandButtons   = self.finger1Buttons + self.finger2Buttons + self.finger3Buttons + self.finger4Buttons
         self.rightHandButtons  = self.finger7Buttons + self.finger8Buttons + self.finger9Buttons + self.finger10Buttons
 
+        # distance matrices computed so far, cleared on any change of geometry
+        self._distanceCache = {}
+
         #%% keyboard mapping dict
         self._M = {} 
         # symbol to button mapping
@@ -565,6 +576,7 @@ class layout:
             return -1
         else:
             self._K[button]  = {'symbol':symbols, 'graphics': {'x':x, 'y':y, 'z':z, 'dx':dx, 'dy':dy, 'dz':dz, 'edgecolor':edgecolor, 'facecolor':facecolor, 'alpha':alpha}, 'value': {}}
+            self._distanceCache = {}
             # redo mapping
             self._M = {} 
             # symbol to button mapping
@@ -591,7 +603,8 @@ class layout:
             Exception: Wrong button name.
         """     
         if(button in self._K.keys()):  
-            del(self.K[button])
+            del(self._K[button])
+            self._distanceCache = {}
             # redo mapping
             self._M = {} 
             # symbol to button mapping
@@ -636,7 +649,7 @@ class layout:
                 List of all buttons in the layout.
         """   
         # return a list of symbol currenly bound to buttons
-        return list(flatten([k for k in self._K]))    
+        return [k for k in self._K]    
     
     #%% Get list of all registered symbols  
     def getSymbolList(self):
@@ -654,7 +667,7 @@ class layout:
                 List of all symbols in the layout.
         """   
         # return a list of symbol currenly bound to buttons
-        return list(flatten([m for m in self._M]))
+        return [m for m in self._M]
     
     #%% Get dictionary that translate a button to a list of bound symbols
     ### retunrs
@@ -707,6 +720,101 @@ class layout:
             print(_doubleBind)
         return self._M
     
+    #%% Get finger of buttons
+    def getFingerIndex(self, buttons=[]):
+        """Get the finger typing every button.
+        
+        The fingers are numbered as the attributes self.finger1Buttons 
+        (left little finger) ... self.finger10Buttons (right little 
+        finger). The array is aligned to "buttons", so that it can index 
+        the button codes used by analytics (e.g. the column "button" 
+        of analytics.getPairedTiming(...)).
+        
+        Arguments:
+            buttons: list(<str>)
+                []: (default) all buttons of the layout
+                    
+        Returns:
+            <array(B)>
+                Finger number (1 ... 10) of every button, -1 if the button 
+                is not assigned to any finger.
+        """
+        if(len(buttons)==0):
+            buttons = self.getButtonList()
+        fingers = {1: self.finger1Buttons, 2: self.finger2Buttons, 3: self.finger3Buttons, 4: self.finger4Buttons, 
+                   7: self.finger7Buttons, 8: self.finger8Buttons, 9: self.finger9Buttons, 10: self.finger10Buttons}
+        buttonToFinger = {b: finger for finger, fingerButtons in fingers.items() for b in fingerButtons}
+        return np.array([buttonToFinger.get(b, -1) for b in buttons], dtype=int)
+    
+    #%% Get hand of buttons
+    def getHandIndex(self, buttons=[]):
+        """Get the hand typing every button.
+        
+        The array is aligned to "buttons" (see getFingerIndex(...)).
+        
+        Arguments:
+            buttons: list(<str>)
+                []: (default) all buttons of the layout
+                    
+        Returns:
+            <array(B)>
+                0 for self.leftHandButtons, 1 for self.rightHandButtons, 
+                -1 if the button is not assigned to any hand.
+        """
+        if(len(buttons)==0):
+            buttons = self.getButtonList()
+        buttonToHand = {b: 0 for b in self.leftHandButtons}
+        buttonToHand.update({b: 1 for b in self.rightHandButtons})
+        return np.array([buttonToHand.get(b, -1) for b in buttons], dtype=int)
+    
+    #%% Get distances between buttons
+    def getDistanceMatrix(self, buttons=[], metric='euclidean'):
+        """Get the distances between the centres of buttons.
+        
+        The distances are measured in the plane of the keyboard in units 
+        of the layout, where a standard key is 1 unit wide (key-width). 
+        The matrix is aligned to "buttons" (see getFingerIndex(...)) and 
+        it is cached until the geometry of the layout changes 
+        (createButton, deleteButton, setButtonValue of x, y, dx or dy).
+        
+        Arguments:
+            buttons: list(<str>)
+                []: (default) all buttons of the layout
+            metric: <str>
+                'euclidean': (default) straight distance
+                'manhattan': rows apart + columns apart
+                'row': rows apart (along x)
+                'column': columns apart (along y)
+                    
+        Raises:
+            Exception: Unknown metric.
+                    
+        Returns:
+            <array(B,B)>
+                Distance [key-width] between buttons[i] and buttons[j].
+        """
+        if(len(buttons)==0):
+            buttons = self.getButtonList()
+        key = (tuple(buttons), metric)
+        if(key in self._distanceCache):
+            return self._distanceCache[key]
+        centres = self._getButtonCentres(buttons)[:, :2]
+        delta = np.abs(centres[:, None, :] - centres[None, :, :])
+        if(metric == 'euclidean'):
+            distance = np.hypot(delta[..., 0], delta[..., 1])
+        elif(metric == 'manhattan'):
+            distance = delta[..., 0] + delta[..., 1]
+        elif(metric == 'row'):
+            distance = delta[..., 0]
+        elif(metric == 'column'):
+            distance = delta[..., 1]
+        else:
+            raise Exception("layout.getDistanceMatrix(..., metric): unknown metric <"+str(metric)+">, use 'euclidean', 'manhattan', 'row' or 'column'.")
+        # the cached matrix is shared, prevent changes in place
+        distance.setflags(write=False)
+        self._distanceCache[key] = distance
+        return distance
+    
     #%% Set value of button(s)
     def setButtonValue(self, button, labels, value): 
         """Change a value of a button.
@@ -729,6 +837,9 @@ class layout:
                 
         Returns:
         """   
+        # the geometry in the plane of the keyboard may change
+        if(labels[0] == 'graphics' and (len(labels) == 1 or labels[1] in ('x', 'y', 'dx', 'dy'))):
+            self._distanceCache = {}
         for b in button:
             if(len(labels)==1):
                 self._K[b][labels[0]] = value
@@ -808,50 +919,96 @@ class layout:
         Raises:
                 
         Returns:
-            bars: list(<axis.bar3d handles>)
-                handles to the bars representing the buttons
+            bars: list(<Poly3DCollection>)
+                handle to the single collection representing 
+                all the buttons (see getRenderer3D(...) to update it)
             texts: list(<axis.text handles>)
                 handles to the plotted text 
                     (depends on nameShow, bindShow, dzShow)
         """           
-        # abstract the "graphics" values and "names" from the internal structure _K
-        xs, ys, zs    = [self._K[k]['graphics']['x'] for k in self._K],  [self._K[k]['graphics']['y'] for k in self._K],  [self._K[k]['graphics']['z'] for k in self._K]
-        dxs, dys, dzs = [self._K[k]['graphics']['dx'] for k in self._K], [self._K[k]['graphics']['dy'] for k in self._K], [self._K[k]['graphics']['dz'] for k in self._K]
-        facecolors, edgecolors, alphas = [self._K[k]['graphics']['facecolor'] for k in self._K], [self._K[k]['graphics']['edgecolor'] for k in self._K], [self._K[k]['graphics']['alpha'] for k in self._K]
-        names = [k for k in self._K]
-        binds = [self._K[k]['symbol'] for k in self._K]
-        # handles to be returned
-        bars = []
-        texts = []
-        # plotting and texting
-        for x,y,z,dx,dy,dz,facecolor,edgecolor,alpha,name,bind in zip(xs,ys,zs,dxs,dys,dzs,facecolors,edgecolors,alphas,names,binds):
-            bars.append( axis.bar3d(x, y, z, dx, dy, dz, alpha=alpha/2, edgecolor=edgecolor, color=facecolor) )
-            if(nameShow):
-                if(bindShow):
-                    bindingStr = " "
-                    texts.append( axis.text(x+textOffset[0]+0.35 ,y+textOffset[1]+0.25,z+textOffset[2],name,       horizontalalignment='left', verticalalignment='bottom', rotation_mode='anchor', fontsize=fontSize, weight='bold' ) )
-                    bindingStr = bindingStr.join(bind)
-                    texts.append( axis.text(x+textOffset[0]+0.75,y+textOffset[1]+0.25,z+textOffset[2],bindingStr, horizontalalignment='left', verticalalignment='bottom', rotation_mode='anchor', fontsize=fontSize ) )
-                else:
-                    texts.append( axis.text(x+textOffset[0]+0.35 ,y+textOffset[1]+0.25,z+textOffset[2],name,       horizontalalignment='left', verticalalignment='bottom', rotation_mode='anchor', fontsize=fontSize, weight='bold'  ) )
-            if(dzShow):
-                texts.append( axis.text(x+textOffset[0]+0.75,y+textOffset[1]+0.25,z+textOffset[2],'{:.2f}'.format(dz), horizontalalignment='left', verticalalignment='bottom', rotation_mode='anchor', fontsize=fontSize ) )
+        renderer = self.getRenderer3D(axis, defaultLook=defaultLook, nameShow=nameShow, bindShow=bindShow, dzShow=dzShow, textOffset=textOffset, aspectRatioModifier=aspectRatioModifier, fontSize=fontSize)
+        # return
+        return [renderer.collection], renderer.texts
+    
+    #%% Default look of 3D plots
+    def _applyDefaultLook3D(self, axis, aspectRatioModifier=[1.0, 1.0, 1.0]):
+        """Apply predefined settings to a 3D plot of the keyboard layout.
+        
+        Arguments:
+            axis: <axis>
+                A 3D subplot axis.
+            aspectRatioModifier:
+                [1.0, 1.0, 1.0]: aspect ration modification 
+        """
+        axis.view_init(60, -30)
+        axis.set_xlim([0,6])
+        if(self._keyboardType=='external'):
+            axis.set_ylim([0,17.75])
+            axis.set_box_aspect([1*aspectRatioModifier[0],17.75/6*aspectRatioModifier[1],1*aspectRatioModifier[2]])
+        else:
+            axis.set_ylim([0,14.5])
+            axis.set_box_aspect([1*aspectRatioModifier[0],14.5/6*aspectRatioModifier[1],1*aspectRatioModifier[2]])
+        axis.grid(False)
+        axis.set_xticks([])
+        axis.set_yticks([])
+        axis.set_zticks([])
+    
+    #%% Live plot of layout in 3D
+    def getRenderer3D(self, axis, buttons=[], defaultLook=True, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], aspectRatioModifier=[1.0, 1.0, 1.0], fontSize=10, cmap=None, vmin=None, vmax=None):
+        """Produce a 3D plot of the keyboard layout that can be updated.
+        
+        All the buttons are drawn as a single collection, the heights 
+        of the buttons (and colors if cmap is given) can be changed 
+        by renderer3D.update(values) without rebuilding the plot.
+        
+        Arguments:
+            axis: <axis>
+                A 3D subplot axis.
+            buttons: list(<str>)
+                []: (default) all buttons of the layout
+            defaultLook: <bool>
+                True: (default) Applies predefined settings to create 
+                    a nice and easy to read plot
+                False: do not apply any changes to the axis
+            nameShow: <bool>
+                True: (default) plot the button names
+                False: button names are not plotted
+            bindShow: <bool>
+                True: plot bound symbols
+                False: (default) do not plot bound symbols
+            dzShow: <bool>
+                True: (default) plot the value ['graphics', 'dz'], 
+                    which is replaced by renderer3D.update(values)
+                False: value is not plotted
+            textOffset: list(<float>, <float>, <float>)
+                [0.0, 0.0, 0.0]: (default) offset to the plotted text 
+                    (depends on nameShow, bindShow, dzShow)
+            aspectRatioModifier:
+                [1.0, 1.0, 1.0]: aspect ration modification 
+            fontSize=: <float>
+                10: (default) font size of the text
+            cmap: <str> or <Colormap>
+                None: (default) updates change the heights only
+                <cmap>: updates change the colors as well
+            vmin, vmax: <float>
+                None: (default) the color map is scaled 
+                    to the values of every update
+                
+        Raises:
+                
+        Returns:
+            <renderer3D>
+                handle to the plot, see renderer3D.update(values)
+        """
+        if(len(buttons)==0):
+            buttons = self.getButtonList()
+        graphics = [self._K[b]['graphics'] for b in buttons]
+        symbols  = [self._K[b]['symbol'] for b in buttons]
+        renderer = renderer3D(axis, buttons, graphics, symbols, nameShow=nameShow, bindShow=bindShow, dzShow=dzShow, textOffset=textOffset, fontSize=fontSize, cmap=cmap, vmin=vmin, vmax=vmax)
         # apply default look
         if(defaultLook):
-            axis.view_init(60, -30)
-            axis.set_xlim([0,6])
-            if(self._keyboardType=='external'):
-                axis.set_ylim([0,17.75])
-                axis.set_box_aspect([1*aspectRatioModifier[0],17.75/6*aspectRatioModifier[1],1*aspectRatioModifier[2]])
-            else:
-                axis.set_ylim([0,14.5])
-                axis.set_box_aspect([1*aspectRatioModifier[0],14.5/6*aspectRatioModifier[1],1*aspectRatioModifier[2]])
-            axis.grid(False)
-            axis.set_xticks([])
-            axis.set_yticks([])
-            axis.set_zticks([])
-        # return
-        return bars, texts
+            self._applyDefaultLook3D(axis, aspectRatioModifier)
+        return renderer
     
     #%% Plot layout in 2D
     def plotKeyboard2D(self, axis, defaultLook=True, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], fontSize=10):
@@ -913,64 +1070,222 @@ class layout:
                 texts.append( axis.text(y+textOffset[1]+0.25, x+textOffset[0]+0.75, '{:.2f}'.format(dz), horizontalalignment='left', verticalalignment='bottom', rotation_mode='anchor', fontsize=fontSize ) )
         # apply default look
         if(defaultLook):
-            axis.set_ylim([0,6])
-            if(self._keyboardType=='external'):
-                axis.set_xlim([0,17.75])
-                axis.set_box_aspect(6/17.75)
-            else:
-                axis.set_xlim([0,14.5])
-                axis.set_box_aspect(6/14.5)
-            axis.grid(False)
-            axis.set_xticks([])
-            axis.set_yticks([])
-            # reverse the Y-axis
-            axis.invert_yaxis()
+            self._applyDefaultLook2D(axis)
         # return
         return bars, texts
     
-    #%% Plot layout in 2D
-    def plotButtonRelations(self, axis, relations):
-        """Produce a 2D plot of the keyboard layout.
+    #%% Default look of 2D plots
+    def _applyDefaultLook2D(self, axis):
+        """Apply predefined settings to a 2D plot of the keyboard layout.
+        
+        Arguments:
+            axis: <axis>
+                A subplot axis.
+        """
+        axis.set_ylim([0,6])
+        if(self._keyboardType=='external'):
+            axis.set_xlim([0,17.75])
+            axis.set_box_aspect(6/17.75)
+        else:
+            axis.set_xlim([0,14.5])
+            axis.set_box_aspect(6/14.5)
+        axis.grid(False)
+        axis.set_xticks([])
+        axis.set_yticks([])
+        # reverse the Y-axis
+        axis.invert_yaxis()
+    
+    #%% Live plot of layout in 2D
+    def getRenderer2D(self, axis, buttons=[], defaultLook=True, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], fontSize=10, cmap='viridis', vmin=None, vmax=None, animated=False):
+        """Produce a 2D plot of the keyboard layout that can be updated.
+        
+        Unlike plotKeyboard2D(...), all the buttons are drawn by a single 
+        collection and every kind of label by a single collection, 
+        therefore the plot is fast to draw and the values can be 
+        changed by renderer2D.update(values) without rebuilding 
+        the plot (e.g. a heatmap of a running logger). 
         
         Arguments:
             axis: <axis>
                 A subplot axis.
-            groups: <list(<list(<str>)>)>
-                A list of lists, where every list includes strings, 
-                referencing button names.
-            relations: <dict(<float>)>
-                A dictionary where the key is a tupple of button names
-                (button1, button2) and the float is the value of 
-                relation.
+            buttons: list(<str>)
+                []: (default) all buttons of the layout
             defaultLook: <bool>
                 True: (default) Applies predefined settings to create 
                     a nice and easy to read plot
-                False: plot bar-graph to the axis, do not apply 
-                    any changes to the axis
-            facecolor: <str> or <list(<int>)>
-                'blue': (default) inital value of button color
+                False: do not apply any changes to the axis
+            nameShow: <bool>
+                True: (default) plot the button names
+                False: button names are not plotted
+            bindShow: <bool>
+                True: plot bound symbols
+                False: (default) do not plot bound symbols
+            dzShow: <bool>
+                True: (default) plot the value ['graphics', 'dz'], 
+                    which is replaced by renderer2D.update(values)
+                False: value is not plotted
+            textOffset: list(<float>, <float>, <float>)
+                [0.0, 0.0, 0.0]: (default) offset to the plotted text 
+                    (depends on nameShow, bindShow, dzShow)
+            fontSize=: <float>
+                10: (default) font size of the text
+            cmap: <str> or <Colormap>
+                'viridis': (default) color map of the updated values
+            vmin, vmax: <float>
+                None: (default) the color map is scaled 
+                    to the values of every update
+            animated: <bool>
+                True: the plot is redrawn by renderer2D.blit() only 
+                    (matplotlib blitting)
+                False: (default) the plot is redrawn with the canvas
                 
         Raises:
                 
         Returns:
-            bars: list(<patches.Rectangle handles>)
-                handles to the patches (Rectangles) representing the buttons
-            texts: list(<axis.text handles>)
-                handles to the plotted text 
-                    (depends on nameShow, bindShow, dzShow)
-        """           
-        for key, value in relations.items():
-            buttonA = key[0]
-            buttonB = key[1]
-            if(not np.isnan(value[0])):
-                # get the coordinates
-                xA, yA = self._K[buttonA]['graphics']['x'] + (self._K[buttonA]['graphics']['dx']/2), self._K[buttonA]['graphics']['y'] + (self._K[buttonA]['graphics']['dy']/2)
-                xB, yB = self._K[buttonB]['graphics']['x'] + (self._K[buttonB]['graphics']['dx']/2), self._K[buttonB]['graphics']['y'] + (self._K[buttonB]['graphics']['dy']/2)
-                # coordinates depend on axis type (2D / 3D)
-                if  axis.name == "3d":
-                    warnings.warn('layout.plotButtonRelations(...) is currently not implemented for 3D plots.', UserWarning, stacklevel=1)
-                    return
-                else:
-                    axis.arrow(yA, xA, yB-yA, xB-xA,  width=value[0], facecolor=value[1], head_width=value[0]*3, shape='full', length_includes_head=True, alpha=0.25)
-                    
-                    
\ No newline at end of file
+            <renderer2D>
+                handle to the plot, see renderer2D.update(values) 
+                and renderer2D.blit()
+        """
+        if(len(buttons)==0):
+            buttons = self.getButtonList()
+        graphics = [self._K[b]['graphics'] for b in buttons]
+        symbols  = [self._K[b]['symbol'] for b in buttons]
+        renderer = renderer2D(axis, buttons, graphics, symbols, nameShow=nameShow, bindShow=bindShow, dzShow=dzShow, textOffset=textOffset, fontSize=fontSize, cmap=cmap, vmin=vmin, vmax=vmax, animated=animated)
+        # apply default look
+        if(defaultLook):
+            self._applyDefaultLook2D(axis)
+        return renderer
+    
+    #%% Centres of buttons
+    def _getButtonCentres(self, buttons):
+        """Get the centres of the buttons.
+        
+        Arguments:
+            buttons: list(<str>)
+                Valid button names.
+                
+        Returns:
+            <array(N,3)>
+                [x, y, z] of the centre of the button face, where z is 
+                the top of the button (z+dz).
+        """
+        graphics = [self._K[b]['graphics'] for b in buttons]
+        return np.array([[g['x']+g['dx']/2, g['y']+g['dy']/2, g['z']+g['dz']] for g in graphics], dtype=float).reshape(-1, 3)
+    
+    #%% Plot relations between buttons
+    def plotButtonRelations(self, axis, relations, buttons=[], threshold=None, topK=None, color='black', cmap=None, widthScale=1.0, alpha=0.25):
+        """Plot relations between buttons as arrows over the keyboard layout.
+        
+        The relations are either a dictionary of pairs of buttons or 
+        a matrix aligned to a list of buttons (e.g. a transition matrix 
+        from analytics.getTimeCorrelationOcccuranceMatrix(...)), where 
+        the value matrix[i, j] relates the button buttons[j] (preceding) 
+        to the button buttons[i] (pressed). All arrows are drawn 
+        as a single artist.
+        
+        Arguments:
+            axis: <axis>
+                A subplot axis (2D or 3D).
+            relations: <dict(<tuple>)> or <matrix> or <sparse matrix>
+                dict: the key is a tupple of button names 
+                    (button1, button2) and the value is a tupple 
+                    (width, color) of the arrow from button1 to button2,
+                    relations with NaN width are not plotted
+                matrix: B x B values aligned to "buttons", NaN and zero 
+                    values are not plotted (scipy.sparse matrices 
+                    are accepted as well)
+            buttons: list(<str>)
+                []: (default) all buttons of the layout 
+                    (used with a matrix only)
+            threshold: <float>
+                None: (default) plot all relations
+                <float>: plot relations with value above threshold
+            topK: <int>
+                None: (default) plot all relations
+                <int>: plot only K relations with the largest values
+            color: <str> or <list(<int>)>
+                'black': (default) color of the arrows (matrix only)
+            cmap: <str> or <Colormap>
+                None: (default) arrows use "color"
+                <cmap>: arrows are colored by their value (matrix only)
+            widthScale: <float>
+                1.0: (default) scale of the width of the arrows
+            alpha: <float>
+                0.25: (default) alpha channel of the arrows
+                
+        Raises:
+            Exception: The matrix does not match the list of buttons.
+                
+        Returns:
+            <artist>
+                handle to the arrows (PatchCollection or Quiver in 2D, 
+                Line3DCollection in 3D), None if nothing is plotted
+        """
+        # relations -> arrays of (preceding, pressed) indices and values
+        if(isinstance(relations, dict)):
+            buttons  = list(dict.fromkeys([b for pair in relations for b in pair]))
+            index    = {b: i for i, b in enumerate(buttons)}
+            pairs    = [(key, value) for key, value in relations.items() if not np.isnan(value[0])]
+            source   = np.array([index[key[0]] for key, value in pairs], dtype=int)
+            target   = np.array([index[key[1]] for key, value in pairs], dtype=int)
+            values   = np.array([value[0] for key, value in pairs], dtype=float)
+            colors   = [value[1] for key, value in pairs]
+        else:
+            if(len(buttons)==0):
+                buttons = self.getButtonList()
+            if(hasattr(relations, 'tocoo')):
+                coo = relations.tocoo()
+                shape, target, source, values = coo.shape, coo.row, coo.col, np.asarray(coo.data, dtype=float)
+            else:
+                matrix = np.asarray(relations, dtype=float)
+                shape = matrix.shape
+                target, source = np.nonzero(~np.isnan(matrix) & (matrix != 0))
+                values = matrix[target, source]
+            if(shape != (len(buttons), len(buttons))):
+                raise Exception("layout.plotButtonRelations(..., relations, buttons, ...): matrix of shape "+str(shape)+" does not match "+str(len(buttons))+" buttons.")
+            keep = ~np.isnan(values) & (values != 0)
+            source, target, values = source[keep], target[keep], values[keep]
+            colors = None
+        # filtering
+        keep = np.ones(len(values), dtype=bool)
+        if(threshold is not None):
+            keep &= values > threshold
+        source, target, values = source[keep], target[keep], values[keep]
+        if(colors is not None):
+            colors = [c for c, k in zip(colors, keep) if k]
+        if(topK is not None and topK < len(values)):
+            top = np.argpartition(-values, topK)[:topK]
+            source, target, values = source[top], target[top], values[top]
+            if(colors is not None):
+                colors = [colors[i] for i in top]
+        if(len(values)==0):
+            return None
+        # coordinates of all buttons at once
+        centres = self._getButtonCentres(buttons)
+        A, B = centres[source], centres[target]
+        # coordinates depend on axis type (2D / 3D)
+        if(axis.name == "3d"):
+            # width in points, relative to the largest value
+            widths = widthScale*(0.5 + 2.5*np.abs(values)/np.max(np.abs(values)))
+            arrows = Line3DCollection(np.stack((A, B), axis=1), linewidths=widths, alpha=alpha)
+            if(colors is not None):
+                arrows.set_color(colors)
+            elif(cmap is not None):
+                arrows.set_array(values)
+                arrows.set_cmap(cmap)
+            else:
+                arrows.set_color(color)
+            axis.add_collection3d(arrows)
+        elif(colors is not None):
+            # dictionary of relations: arrows with width in data units
+            widths = widthScale*np.abs(values)
+            shapes = [patches.FancyArrow(yA, xA, yB-yA, xB-xA, width=w, head_width=w*3, shape='full', length_includes_head=True) for (xA, yA, _), (xB, yB, _), w in zip(A, B, widths)]
+            arrows = PatchCollection(shapes, facecolors=colors, edgecolors=colors, alpha=alpha)
+            axis.add_collection(arrows, autolim=False)
+        else:
+            # matrix of relations: a single quiver
+            quiverArgs = (A[:, 1], A[:, 0], B[:, 1]-A[:, 1], B[:, 0]-A[:, 0])
+            if(cmap is not None):
+                quiverArgs += (values,)
+            arrows = axis.quiver(*quiverArgs, angles='xy', scale_units='xy', scale=1, width=0.003*widthScale, cmap=cmap, color=None if cmap is not None else color, alpha=alpha)
+        return arrows
\ No newline at end of file
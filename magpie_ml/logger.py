@@ -5,10 +5,10 @@ Created on Thu Dec 31 19:35:19 2020
 @author: Martin
 """
 #%% Imports - logger
-from pynput import keyboard
-import pandas as pd
-import numpy as np
-from pandas.core.common import flatten
+try:
+    from pynput import keyboard
+except ImportError: # pynput has no backend (e.g. a machine without X server)
+    keyboard = None
 import csv
 import datetime as dt
 import warnings
@@ -31,7 +31,7 @@ class logger:
     Methods
 
     """    
-    def __init__(self, symbolToButtonDict, path='loggedData.txt', doNotLogButtons=[], escapeButtons=['Esc'], debug=False):
+    def __init__(self, symbolToButtonDict, path='loggedData.txt', doNotLogButtons=[], escapeButtons=['Esc'], debug=False, listen=True, clock=None, eventBus=None, backend='text', batchSize=256, compression=None, flushInterval=1.0, segmentSize=67108864, durability='buffered', commitInterval=0.05):
         """Inits logger class with default parameters.
         
         This method checks, whether the logger can correctly assign a 
@@ -59,9 +59,59 @@ class logger:
             debug: <bool>
                 True: logger prints the key-presses into the console
                 False: no console output on key-press
+            listen: <bool>
+                True: (default) register the pynput keyboard listener
+                False: no listener, the events are fed by calling 
+                    on_press(key) and on_release(key) 
+                    (see replay.replay)
+            clock: <callable>
+                None: (default) time of the events is the time 
+                    elapsed since start()
+                <callable>: returns the time [s] of the current event
+            eventBus: <eventbus.eventBus>
+                None: (default) the events are only written to the log file
+                <eventBus>: every logged event is published as
+                    (time, button, press, counter) for live consumers
+            backend: <str>
+                'text': (default) the events are appended to a text file
+                'sqlite': the events are written to an SQLite database 
+                    at "path" (see storage.sqliteStore)
+            batchSize: <int>
+                256: (default) events written in one transaction 
+                    (backend 'sqlite') or in one group commit 
+                    (durability 'flush' and 'fsync')
+            compression: <str>
+                None: (default) plain text file at "path"
+                'gzip', 'zstd': the text is compressed into segments 
+                    "path".00000.gz, ... (see segments.segmentWriter), 
+                    every start opens a new segment (backend 'text' only)
+            flushInterval: <float>
+                1.0: (default) the longest time [s] a logged event waits 
+                    for its flush frame, a crash loses the last frame only
+                    (compressed log only)
+            segmentSize: <int>
+                67108864: (default) compressed size [bytes] of a segment 
+                    to start a new segment (compressed log only)
+            durability: <str>
+                'buffered': (default) the text log is buffered by python
+                'flush': group commit, every batch is flushed and recorded 
+                    in the journal "path".commit (see durability.commitFile), 
+                    it survives a crash of the process
+                'fsync': group commit, every batch is synchronized to the 
+                    disk, it survives a crash of the machine
+                The database uses synchronous mode NORMAL ('buffered', 
+                'flush') or FULL ('fsync'). A torn tail of an appended 
+                text log is truncated at start() (see durability.recoverLog).
+            commitInterval: <float>
+                0.05: (default) the longest time [s] an event waits for 
+                    its group commit (durability 'flush' and 'fsync')
                 
         Raises:
             Exception: mapping "symbolToButtonDict" is not unique
+            Exception: pynput listener is not available
+            Exception: unknown backend
+            Exception: compression of the sqlite backend
+            Exception: unknown durability, durability of a compressed log
             UserWarinig: wrong button name
                 
         Returns:
@@ -80,8 +130,7 @@ class logger:
                 else:
                     self._buttonToSymbolDict[b] = self._buttonToSymbolDict[b] + [s]              
         # check consistency
-        _Kcheck = [self._buttonToSymbolDict[b] for b in self._buttonToSymbolDict]
-        _Kcheck = list(flatten(_Kcheck))
+        _Kcheck = [s for b in self._buttonToSymbolDict for s in self._buttonToSymbolDict[b]]
         # inconsistency found
         if len(_Kcheck) > len(set(_Kcheck)):
             raise Exception("Provided "'symbolToButtonDict'" maps the same symbol to multiple buttons. The logger cannot properly log key-strokes, since it cannot determine where the symbol originates.")
@@ -112,8 +161,38 @@ class logger:
         self._debug = debug
         # currently active keys
         self.currentlyPressed = set()
+        # time of events
+        self._clock = clock
+        # live consumers of the events
+        self._eventBus = eventBus
+        # storage of the events
+        if(backend not in ('text', 'sqlite')):
+            raise Exception("logger.__init__(..., backend, ...): unknown backend <"+str(backend)+">, use 'text' or 'sqlite'.")
+        self._backend = backend
+        self._batchSize = batchSize
+        if(compression is not None and backend != 'text'):
+            raise Exception("logger.__init__(..., compression, ...): compression is supported by the backend 'text' only.")
+        self._compression = compression
+        self._flushInterval = flushInterval
+        self._segmentSize = segmentSize
+        # the backends are imported on use (the logger process stays small)
+        from magpie_ml.durability import durabilityLevels
+        if(durability not in durabilityLevels):
+            raise Exception("logger.__init__(..., durability, ...): unknown durability <"+str(durability)+">, use "+', '.join("'"+d+"'" for d in durabilityLevels)+".")
+        if(compression is not None and durability != 'buffered'):
+            raise Exception("logger.__init__(..., durability, ...): a compressed log is flushed by its flush frames (see flushInterval), use durability='buffered'.")
+        self._durability = durability
+        self._commitInterval = commitInterval
+        self.recovery = None
+        self._store = None
+        self.running = False
         # start non-blocking listener
-        self.listener = keyboard.Listener( on_press=self.on_press, on_release=self.on_release )    
+        if(listen):
+            if(keyboard is None):
+                raise Exception("logger.__init__(..., listen=True, ...): pynput keyboard listener is not available on this machine, use listen=False to feed the events without a listener.")
+            self.listener = keyboard.Listener( on_press=self.on_press, on_release=self.on_release )    
+        else:
+            self.listener = None
     
     #%% listener: on_release
     def on_press(self, key):
@@ -149,8 +228,7 @@ class logger:
         else:
             # check if the key is allowed to be logged
             if(button not in self._doNotLogButtons):
-                time = (dt.datetime.now()-self.startTime).total_seconds()
-                self._logKeyPress(keyStr, button, time)
+                self._logKeyPress(keyStr, button, self._getTime())
         
     #%% listener: on_release
     def on_release(self, key):
@@ -175,8 +253,7 @@ class logger:
             if not all(b in self.currentlyPressed for b in self._escapeButtons):
                 # log key(s)
                 if(button not in self._doNotLogButtons):
-                    time = (dt.datetime.now()-self.startTime).total_seconds()
-                    self._logKeyRelease(keyStr, button, time)
+                    self._logKeyRelease(keyStr, button, self._getTime())
             self.currentlyPressed.remove(button)
         except KeyError:
             pass    
@@ -199,13 +276,19 @@ class logger:
         # prepare values to write
         self._buttonCounter[button] += 1
         counter = self._buttonCounter[button]
-        # format strings
-        timeFormat = '{:.6f}'.format(time).ljust(15)
-        keyStrFormat = keyStr.ljust(15)
-        buttonFormat = button.ljust(15)
-        eventFormat = '+'+str(counter).zfill(7)
-        # write to CSV
-        self.log.writerow({'Time':timeFormat, 'Button':buttonFormat, 'Key':keyStrFormat, 'Event':eventFormat})
+        if(self._store is not None):
+            self._store.append(time, keyStr, button, counter)
+        else:
+            # format strings
+            timeFormat = '{:.6f}'.format(time).ljust(15)
+            keyStrFormat = keyStr.ljust(15)
+            buttonFormat = button.ljust(15)
+            eventFormat = '+'+str(counter).zfill(7)
+            # write to CSV
+            self.log.writerow({'Time':timeFormat, 'Button':buttonFormat, 'Key':keyStrFormat, 'Event':eventFormat})
+        # publish to live consumers (never blocks)
+        if(self._eventBus is not None):
+            self._eventBus.publish((time, button, True, counter))
     
     #%% write to log file: key release
     def _logKeyRelease(self, keyStr, button, time):
@@ -224,13 +307,19 @@ class logger:
         """
         # prepare values to write
         counter = self._buttonCounter[button]
-        # format strings
-        timeFormat = '{:.6f}'.format(time).ljust(15)
-        keyStrFormat = keyStr.ljust(15)
-        buttonFormat = button.ljust(15)
-        eventFormat = '-'+str(counter).zfill(7)
-        # write to CSV
-        self.log.writerow({'Time':timeFormat, 'Button':buttonFormat, 'Key':keyStrFormat, 'Event':eventFormat})
+        if(self._store is not None):
+            self._store.append(time, keyStr, button, -counter)
+        else:
+            # format strings
+            timeFormat = '{:.6f}'.format(time).ljust(15)
+            keyStrFormat = keyStr.ljust(15)
+            buttonFormat = button.ljust(15)
+            eventFormat = '-'+str(counter).zfill(7)
+            # write to CSV
+            self.log.writerow({'Time':timeFormat, 'Button':buttonFormat, 'Key':keyStrFormat, 'Event':eventFormat})
+        # publish to live consumers (never blocks)
+        if(self._eventBus is not None):
+            self._eventBus.publish((time, button, False, counter))
         
     #%% translate key to string
     def _key2str(self, key):
@@ -249,6 +338,53 @@ class logger:
             keyStr = str(key).replace('Key.','')
         return keyStr        
 
+    #%% time of event
+    def _getTime(self):
+        """Get the time of the current event.
+        
+        Arguments:
+            
+        Raises:
+                
+        Returns:
+            <float>
+                Time [s] since start() (or the time given by "clock").
+        """
+        if(self._clock is None):
+            return (dt.datetime.now()-self.startTime).total_seconds()
+        return self._clock()
+        
+    #%% check existing log file
+    def _sniffLogFile(self, logFields):
+        """Check whether the log file exists and holds logged data.
+        
+        Only the header and the first logged line are read, 
+        the rest of the file is not touched.
+        
+        Arguments:
+            logFields: tuple(<str>)
+                Expected names of the columns in the header.
+            
+        Raises:
+                
+        Returns:
+            <bool>
+                True: the file holds logged data and can be appended
+                False: the file is missing or it is not a log file
+        """
+        try:
+            with open(self._path, 'r') as f:
+                header = f.readline().rstrip('\n').split('\t')
+                firstLine = f.readline().rstrip('\n').split('\t')
+            if(tuple(header) != logFields or len(firstLine) != len(logFields)):
+                return False
+            # the values have to be convertible (Time: float, Event: int)
+            float(firstLine[0])
+            int(firstLine[3])
+            return True
+        except (OSError, ValueError, UnicodeDecodeError):
+            return False
+
     #%% start listener
     def start(self):
         """Start the key*logger listener
@@ -263,30 +399,46 @@ class logger:
                 
         Returns:
         """
-        # check if file exists
-        try:
-            df = pd.read_csv(self._path, nrows=1, delimiter='\t')
-            fileExists = isinstance(df['Time'][0].astype(float), float) \
-                        and isinstance(df['Key'][0], str) \
-                        and isinstance(df['Button'][0], str) \
-                        and isinstance(df['Event'][0].astype(int), np.int32)
-            del(df)
-        except: # catch all exceptions
-            fileExists = False
-            
-        # start a new file
-        logFields = ('Time', 'Key', 'Button', 'Event')
-        if(fileExists):
-            self.logFile = open(self._path, 'a')
+        if(self._backend == 'sqlite'):
+            # the database is created or continued by a new session
+            from magpie_ml.storage import sqliteStore
+            self._store = sqliteStore(self._path, batchSize=self._batchSize, synchronous='FULL' if self._durability == 'fsync' else 'NORMAL')
+            self._store.startSession()
+            self.logFile = None
+        elif(self._compression is not None):
+            # every start is a new segment (and a new session) of the compressed log
+            from magpie_ml.segments import segmentWriter
+            logFields = ('Time', 'Key', 'Button', 'Event')
+            self.logFile = segmentWriter(self._path, self._compression, self._flushInterval, self._segmentSize)
+            self.log = csv.DictWriter(self.logFile, fieldnames=logFields, delimiter='\t', lineterminator = '\n', quoting = csv.QUOTE_NONE, quotechar=None, escapechar='\t')
+            self.log.writeheader()
         else:
-            self.logFile = open(self._path, 'w')
-        self.log = csv.DictWriter(self.logFile, fieldnames=logFields, delimiter='\t', lineterminator = '\n', quoting = csv.QUOTE_NONE, quotechar='',escapechar='\t')
-        self.log.writeheader()
+            from magpie_ml.durability import commitFile, recoverLog, resetJournal
+            # check if file exists
+            logFields = ('Time', 'Key', 'Button', 'Event')
+            fileExists = self._sniffLogFile(logFields)
+                
+            # repair the torn tail of a crashed logger
+            if(fileExists):
+                self.recovery = recoverLog(self._path)
+            else:
+                # a new log does not keep the journal of a former log
+                resetJournal(self._path)
+            # start a new file
+            mode = 'a' if fileExists else 'w'
+            if(self._durability == 'buffered'):
+                self.logFile = open(self._path, mode)
+            else:
+                self.logFile = commitFile(self._path, mode, self._durability, self._batchSize, self._commitInterval)
+            self.log = csv.DictWriter(self.logFile, fieldnames=logFields, delimiter='\t', lineterminator = '\n', quoting = csv.QUOTE_NONE, quotechar=None, escapechar='\t')
+            self.log.writeheader()
+        self.running = True
         
         # get the time when the app started
         self.startTime = dt.datetime.now()
         # start listener
-        self.listener.start()
+        if(self.listener is not None):
+            self.listener.start()
         # show that the logger has started
         print('-- MagPie-ML logger has started, key stroke data are stored in file ./'+self._path+' --')
         
@@ -305,8 +457,14 @@ class logger:
         Returns:
         """
         # stop the listener
-        self.listener.stop()
+        if(self.listener is not None):
+            self.listener.stop()
         # close the file
-        self.logFile.close()
+        if(self._store is not None):
+            self._store.close()
+            self._store = None
+        else:
+            self.logFile.close()
+        self.running = False
         # show that the logger has stopped
         print('-- MagPie-ML logger has stopped, key stroke data are stored in file ./'+self._path+' --')
\ No newline at end of file
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+#%% Imports - optimizer
+import numpy as np
+import math
+from magpie_ml.corpus import corpusCounter
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% OPTIMIZER %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Typing cost of a mapping of symbols to buttons and its optimization.
+#   The symbols bound to a button of the current layout (e.g. 'a', 'A' of
+#   the button 'A') are moved together, a mapping is a permutation of
+#   the buttons: the symbols of the button buttons[i] are typed on the
+#   button buttons[P[i]].
+
+#%% digraph counts of a text
+def digraphCounts(text, symbolToButtonDict, buttons):
+    """Count the transitions between buttons needed to type a text.
+
+    The characters of the text are translated to buttons of the current
+    layout (see corpus.corpusCounter, which counts large files as well).
+
+    Arguments:
+        text: <str>
+            Text (corpus) to type.
+        symbolToButtonDict: dict(symbol1: button1, symbol2: button2, ...)
+            Obtained from layout.getSymbolToButtonDict()
+        buttons: list(<str>)
+            Buttons of the matrix.
+
+    Raises:
+
+    Returns:
+        <array(B,B)>
+            Count of transitions, the element [Y, X] counts the presses
+            of buttons[Y] preceded by buttons[X] (as analytics matrices).
+    """
+    return corpusCounter(symbolToButtonDict, buttons).countText(text)[0].astype(float)
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class optimizer:
+    """A class to represent the typing cost of mappings of symbols to buttons.
+
+    The cost of a permutation P is the time to type the digraphs G
+    with the measured latencies L
+        cost(P) = sum_{Y,X} G[Y, X] * L[P[Y], P[X]]
+    (a quadratic assignment problem). Swapping the buttons of two
+    groups of symbols changes only the terms of the 2 rows and columns,
+    the change of the cost is evaluated in O(B).
+
+    Attributes:
+        self.buttons
+            list(<str>) of buttons
+        self.latency
+            <array(B,B)> latencies used by the cost (NaN filled)
+
+    Methods:
+        optimizer(latency, digraphs, buttons, distance=None, count=None)
+        getPermutation(mapping={})
+        getMapping(permutation)
+        evaluate(mapping={})
+        swapDelta(permutation, u, v)
+        anneal(steps=1000000, mapping={}, fixed=[], temperature=None, finalTemperature=None, seed=None)
+    """
+    def __init__(self, latency, digraphs, buttons, distance=None, count=None):
+        """Inits optimizer class.
+
+        The latencies of pairs of buttons never typed by the user are NaN,
+        they are estimated by a straight line fit of the latency to the
+        distance between the buttons (Fitts-like), or by the mean latency
+        if the distance is not given.
+
+        Arguments:
+            latency: <array(B,B)>
+                Mean latency [s], the element [Y, X] is the time to press
+                buttons[Y] after buttons[X] (e.g. the mean matrix of
+                analytics.getTimeCorrelationOcccuranceMatrix(...)).
+            digraphs: <array(B,B)>
+                Counts of transitions of a text (see digraphCounts(...)).
+            buttons: list(<str>)
+                Buttons of the matrices.
+            distance: <array(B,B)>
+                None: (default) missing latencies are the mean latency
+                <array>: distances between buttons (e.g.
+                    layout.getDistanceMatrix(buttons)) to estimate
+                    missing latencies
+            count: <array(B,B)>
+                None: (default) all measured latencies have equal weight
+                <array>: number of measurements of every latency
+                    (weights of the fit)
+
+        Raises:
+            Exception: Matrices do not match the buttons.
+            Exception: No latency is measured.
+
+        Returns:
+        """
+        B = len(buttons)
+        latency = np.array(latency, dtype=float)
+        digraphs = np.array(digraphs, dtype=float)
+        for name, matrix in (('latency', latency), ('digraphs', digraphs), ('distance', distance), ('count', count)):
+            if(matrix is not None and np.shape(matrix) != (B, B)):
+                raise Exception("optimizer.__init__(..): matrix <"+name+"> of shape "+str(np.shape(matrix))+" does not match "+str(B)+" buttons.")
+        measured = ~np.isnan(latency)
+        if(not measured.any()):
+            raise Exception("optimizer.__init__(latency, ..): no latency is measured.")
+        weight = np.ones((B, B)) if count is None else np.asarray(count, dtype=float)
+        if(distance is not None):
+            # weighted straight line latency = a + b*distance
+            d, t, w = np.asarray(distance, dtype=float)[measured], latency[measured], weight[measured]
+            A = np.stack((np.ones_like(d), d), axis=1) * np.sqrt(w)[:, None]
+            a, b = np.linalg.lstsq(A, t*np.sqrt(w), rcond=None)[0]
+            latency[~measured] = a + b*np.asarray(distance, dtype=float)[~measured]
+        else:
+            latency[~measured] = np.average(latency[measured], weights=weight[measured])
+        self.buttons = list(buttons)
+        self.latency = latency
+        self._digraphs = digraphs
+        # columns of the matrices as contiguous rows (fast swap deltas)
+        self._latencyT = np.ascontiguousarray(latency.T)
+        self._digraphsT = np.ascontiguousarray(digraphs.T)
+
+    #%% mapping <-> permutation
+    def getPermutation(self, mapping={}):
+        """Translate a mapping of buttons to a permutation.
+
+        Arguments:
+            mapping: dict(<str>: <str>)
+                {}: (default) the current layout (identity)
+                dict: the symbols of the button key are typed on the
+                    button value, the buttons left out are not moved
+                    (e.g. {'K': 'N', 'N': 'K'} swaps 2 buttons)
+
+        Raises:
+            Exception: The mapping is not a permutation of the buttons.
+
+        Returns:
+            <array(B)>
+                P[i] is the index of the button typing the symbols of
+                buttons[i].
+        """
+        index = {b: i for i, b in enumerate(self.buttons)}
+        permutation = np.arange(len(self.buttons))
+        try:
+            for source, target in mapping.items():
+                permutation[index[source]] = index[target]
+        except KeyError as key:
+            raise Exception("optimizer.getPermutation(mapping): button "+str(key)+" is not in the buttons.")
+        if(len(np.unique(permutation)) != len(permutation)):
+            raise Exception("optimizer.getPermutation(mapping): the mapping moves several buttons to the same button.")
+        return permutation
+
+    def getMapping(self, permutation):
+        """Translate a permutation to a mapping of the moved buttons.
+
+        Arguments:
+            permutation: <array(B)>
+
+        Returns:
+            dict(<str>: <str>)
+                See getPermutation(...).
+        """
+        return {self.buttons[i]: self.buttons[p] for i, p in enumerate(permutation) if i != p}
+
+    #%% cost
+    def evaluate(self, mapping={}):
+        """Time to type the digraphs with a mapping.
+
+        Arguments:
+            mapping: dict(<str>: <str>) or <array(B)>
+                {}: (default) the current layout
+                dict: see getPermutation(...)
+                <array>: permutation
+
+        Returns:
+            <float>
+                Total time [s] of the transitions.
+        """
+        permutation = mapping if isinstance(mapping, np.ndarray) else self.getPermutation(mapping)
+        return float(np.sum(self._digraphs * self.latency[np.ix_(permutation, permutation)]))
+
+    def swapDelta(self, permutation, u, v):
+        """Change of the cost by swapping the buttons of the symbols u and v.
+
+        Only the rows and columns u and v of the digraphs change their
+        latency, the change is evaluated in O(B).
+
+        Arguments:
+            permutation: <array(B)>
+            u, v: <int>
+                Indices of the buttons (u != v).
+
+        Returns:
+            <float>
+                cost(swapped) - cost(permutation)
+        """
+        G, GT, L, LT = self._digraphs, self._digraphsT, self.latency, self._latencyT
+        pu, pv = permutation[u], permutation[v]
+        # presses of u and v after any k, and presses of any k after u and v
+        rowU, rowV = L[pu][permutation], L[pv][permutation]
+        colU, colV = LT[pu][permutation], LT[pv][permutation]
+        delta = np.dot(G[u] - G[v], rowV - rowU) + np.dot(GT[u] - GT[v], colV - colU)
+        # terms with k in {u, v} were counted wrong above, replace them exactly
+        Luu, Luv, Lvu, Lvv = L[pu, pu], L[pu, pv], L[pv, pu], L[pv, pv]
+        Guu, Guv, Gvu, Gvv = G[u, u], G[u, v], G[v, u], G[v, v]
+        delta -= (Guu - Gvu)*(Lvu - Luu) + (Guv - Gvv)*(Lvv - Luv) + (Guu - Guv)*(Luv - Luu) + (Gvu - Gvv)*(Lvv - Lvu)
+        delta += Guu*(Lvv - Luu) + Gvv*(Luu - Lvv) + Guv*(Lvu - Luv) + Gvu*(Luv - Lvu)
+        return float(delta)
+
+    #%% optimization
+    def anneal(self, steps=1000000, mapping={}, fixed=[], temperature=None, finalTemperature=None, seed=None):
+        """Search a faster mapping by simulated annealing of swaps.
+
+        Every step proposes a swap of 2 random buttons, the swap is
+        accepted if it lowers the cost, or with probability
+        exp(-delta/T) otherwise. The temperature T decreases
+        geometrically from "temperature" to "finalTemperature".
+
+        Arguments:
+            steps: <int>
+                1000000: (default) number of proposed swaps
+            mapping: dict(<str>: <str>)
+                {}: (default) start from the current layout
+            fixed: list(<str>)
+                []: (default) buttons which are never moved
+            temperature: <float>
+                None: (default) the mean |delta| of random swaps
+            finalTemperature: <float>
+                None: (default) temperature/1000
+            seed: <int>
+                None: (default) random seed
+
+        Raises:
+            Exception: Less than 2 buttons can be moved.
+
+        Returns:
+            (mapping, cost): (dict(<str>: <str>), <float>)
+                The best mapping found and its cost [s].
+        """
+        rng = np.random.default_rng(seed)
+        permutation = self.getPermutation(mapping)
+        fixed = set(fixed)
+        movable = np.array([i for i, b in enumerate(self.buttons) if b not in fixed])
+        if(len(movable) < 2):
+            raise Exception("optimizer.anneal(..., fixed, ...): less than 2 buttons can be moved.")
+        # random pairs of buttons
+        pairs = rng.integers(0, len(movable), size=(steps, 2))
+        pairs[:, 1] = (pairs[:, 0] + 1 + rng.integers(0, len(movable)-1, size=steps)) % len(movable)
+        pairs = movable[pairs]
+        if(temperature is None):
+            sample = pairs[:min(steps, 200)]
+            temperature = np.mean([abs(self.swapDelta(permutation, u, v)) for u, v in sample]) if len(sample) else 1.0
+            temperature = max(temperature, 1e-12)
+        if(finalTemperature is None):
+            finalTemperature = temperature/1000
+        cooling = (finalTemperature/temperature)**(1.0/max(steps - 1, 1))
+        threshold = rng.random(steps)
+        cost = self.evaluate(permutation)
+        bestCost, best = cost, permutation.copy()
+        T = temperature
+        swapDelta = self.swapDelta
+        for step, (u, v) in enumerate(pairs.tolist()):
+            delta = swapDelta(permutation, u, v)
+            if(delta < 0 or threshold[step] < math.exp(-delta/T)):
+                permutation[u], permutation[v] = permutation[v], permutation[u]
+                cost += delta
+                if(cost < bestCost):
+                    bestCost, best = cost, permutation.copy()
+            T *= cooling
+        # exact cost of the best mapping (no accumulated rounding)
+        return self.getMapping(best), self.evaluate(best)
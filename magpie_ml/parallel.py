@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#%% Imports - parallel
+import numpy as np
+import concurrent.futures
+import os
+from magpie_ml import kernels
+try:
+    from multiprocessing import shared_memory
+except ImportError: # python < 3.8, the kernels run serially
+    shared_memory = None
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% PARALLEL %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Kernels of a single large log computed by a pool of processes. The
+#   arrays of the events are placed in shared memory once, every process
+#   computes the kernel of a partition of the events and the partial
+#   results are merged exactly:
+#       pairPressRelease        partitions of whole sessions (a key stroke
+#                               never spans two sessions), or of buttons
+#                               if the sessions are too few
+#       transitionStatistics    partitions of consecutive rows, every
+#                               partition carries the last event of the
+#                               preceding one, the statistics are merged
+#                               by kernels.mergeStatistics
+
+#   the smallest partition [events], smaller logs are computed serially
+minimumPartition = 262144
+
+def _processes(processes, events):
+    # number of partitions of the events
+    if(shared_memory is None):
+        return 1
+    if(processes is None):
+        processes = os.cpu_count() or 1
+    return max(1, min(processes, events // minimumPartition))
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class sharedArrays:
+    """A class to represent arrays in one block of shared memory.
+
+    The block is created by the parent process, the processes of the pool
+    attach to it by its name and layout (see attachArrays(...)).
+
+    Attributes:
+        self.name
+            <str> name of the block
+        self.layout
+            list((<str>, <str>, <int>, <int>)) name, dtype, length and
+            offset of every array
+
+    Methods:
+        sharedArrays(arrays)
+        close()
+    """
+    def __init__(self, arrays):
+        """Inits sharedArrays class, copies the arrays to shared memory.
+
+        Arguments:
+            arrays: dict(<str>: <array(N)>)
+                One-dimensional arrays.
+
+        Returns:
+        """
+        arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+        self.layout = []
+        offset = 0
+        for name, a in arrays.items():
+            self.layout.append((name, a.dtype.str, len(a), offset))
+            offset += (a.nbytes + 63) // 64 * 64
+        self._memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.name = self._memory.name
+        for name, a in arrays.items():
+            _view(self._memory, self.layout, name)[:] = a
+
+    def close(self):
+        """Release the block of shared memory.
+
+        Returns:
+        """
+        if(self._memory is not None):
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+def _view(memory, layout, name):
+    for arrayName, dtype, length, offset in layout:
+        if(arrayName == name):
+            return np.ndarray((length,), dtype=np.dtype(dtype), buffer=memory.buf, offset=offset)
+    raise Exception("parallel._view(..., name): unknown array <"+str(name)+">.")
+
+def attachArrays(name, layout):
+    """Attach to the arrays of sharedArrays in a process of the pool.
+
+    Arguments:
+        name: <str>
+            sharedArrays.name
+        layout: list
+            sharedArrays.layout
+
+    Returns:
+        (memory, arrays): (<SharedMemory>, dict(<str>: <array(N)>))
+            The block (to be closed after use) and views of the arrays.
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, {arrayName: _view(memory, layout, arrayName) for arrayName, dtype, length, offset in layout}
+
+#%% pair presses with releases
+def _pairRows(arrays, start, end, buttons, buttonCount):
+    # key strokes of the rows start:end (of the buttons only)
+    rows = slice(start, end)
+    session, button, event, time = arrays['session'][rows], arrays['button'][rows], arrays['event'][rows], arrays['time'][rows]
+    if(buttons is not None):
+        selected = np.zeros(buttonCount, dtype=bool)
+        selected[buttons] = True
+        keep = selected[button]
+        session, button, event, time = session[keep], button[keep], event[keep], time[keep]
+    return kernels.pairPressRelease(session, button, event, time, buttonCount)
+
+def _pairPartition(name, layout, start, end, buttons, buttonCount):
+    memory, arrays = attachArrays(name, layout)
+    try:
+        result = _pairRows(arrays, start, end, buttons, buttonCount)
+    finally:
+        # the views are released before the block is closed
+        arrays = None
+        memory.close()
+    return result
+
+def _balance(weights, parts):
+    # greedy split of items into parts of similar total weight
+    groups, totals = [[] for _ in range(parts)], np.zeros(parts)
+    for item in np.argsort(weights, kind='stable')[::-1]:
+        part = int(np.argmin(totals))
+        groups[part].append(int(item))
+        totals[part] += weights[item]
+    return [sorted(g) for g in groups if len(g) > 0]
+
+def pairPressRelease(session, button, event, time, buttonCount, processes=None):
+    """Pair the presses and releases of key strokes in parallel.
+
+    See kernels.pairPressRelease(...), the result is the same. The events
+    are split into partitions of whole sessions of similar size, or into
+    partitions of buttons if the sessions are too few (too different in
+    size, or not in ascending order) for the processes.
+
+    Arguments:
+        session, button, event, time, buttonCount:
+            See kernels.pairPressRelease(...).
+        processes: <int>
+            None: (default) number of CPUs
+            1: pair in the current process
+
+    Returns:
+        (table, offsets, unmatchedPress, unmatchedRelease)
+            See kernels.pairPressRelease(...).
+    """
+    session = np.asarray(session, dtype=np.int64)
+    processes = _processes(processes, len(session))
+    if(processes <= 1):
+        return kernels.pairPressRelease(session, button, event, time, buttonCount)
+    # whole sessions, the session starts next to equal row ranges
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(session)) + 1))
+    cuts = starts[np.clip(np.searchsorted(starts, np.arange(1, processes) * len(session) / processes), 0, len(starts) - 1)]
+    bounds = np.unique(np.concatenate(([0], cuts, [len(session)])))
+    if(not np.any(session[1:] < session[:-1]) and len(bounds) - 1 == processes and np.diff(bounds).max() <= 1.5 * len(session) / processes):
+        partitions = [(bounds[i], bounds[i+1], None) for i in range(len(bounds) - 1)]
+    else:
+        # fewer (or unbalanced, or unsorted) sessions
+        weights = np.bincount(np.asarray(button, dtype=np.int64), minlength=buttonCount)
+        partitions = [(0, len(session), np.array(b, dtype=np.int64)) for b in _balance(weights, processes)]
+    shared = sharedArrays({'session': session, 'button': np.asarray(button, dtype=np.int64),
+                           'event': np.asarray(event, dtype=np.int64), 'time': np.asarray(time, dtype=np.float64)})
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=len(partitions)) as executor:
+            futures = [executor.submit(_pairPartition, shared.name, shared.layout, int(start), int(end), buttons, buttonCount) for start, end, buttons in partitions]
+            results = [future.result() for future in futures]
+    finally:
+        shared.close()
+    # key strokes grouped by button, partitions in the order of sessions
+    parts = []
+    for b in range(buttonCount):
+        for table, offsets, unmatchedPress, unmatchedRelease in results:
+            parts.append(table[offsets[b]:offsets[b+1]])
+    table = np.concatenate([np.empty(0, dtype=kernels.pairedDtype)] + parts)
+    offsets = np.zeros(buttonCount + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(table['button'], minlength=buttonCount))
+    return table, offsets, sum(r[2] for r in results), sum(r[3] for r in results)
+
+#%% periods between consecutive events
+def _transitionPartition(name, layout, start, end, buttonCount, timeLimit, pairFirst):
+    # statistics of the rows start:end paired with their preceding rows
+    memory, arrays = attachArrays(name, layout)
+    try:
+        rows = slice(max(start - 1, 0), end)
+        result = kernels.transitionStatistics(arrays['button'][rows], arrays['time'][rows], buttonCount, timeLimit, pairFirst and start == 0)
+    finally:
+        # the views are released before the block is closed
+        arrays = None
+        memory.close()
+    return result
+
+def transitionStatistics(button, time, buttonCount, timeLimit, pairFirst=False, processes=None):
+    """Statistics of the periods between consecutive events in parallel.
+
+    See kernels.transitionStatistics(...). The events are split into
+    ranges of consecutive rows, the first event of every range is paired
+    with the last event of the preceding range, the partial statistics
+    are merged by kernels.mergeStatistics(...) (the same result up to
+    the rounding of floats).
+
+    Arguments:
+        button, time, buttonCount, timeLimit, pairFirst:
+            See kernels.transitionStatistics(...).
+        processes: <int>
+            None: (default) number of CPUs
+            1: compute in the current process
+
+    Returns:
+        (mean, var, count): (<array(B,B)>, <array(B,B)>, <array(B,B)>)
+    """
+    processes = _processes(processes, len(button))
+    if(processes <= 1):
+        return kernels.transitionStatistics(button, time, buttonCount, timeLimit, pairFirst)
+    bounds = np.linspace(0, len(button), processes + 1).astype(np.int64)
+    shared = sharedArrays({'button': np.asarray(button, dtype=np.int64), 'time': np.asarray(time, dtype=np.float64)})
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(_transitionPartition, shared.name, shared.layout, int(bounds[i]), int(bounds[i+1]), buttonCount, timeLimit, pairFirst) for i in range(processes)]
+            results = [future.result() for future in futures]
+    finally:
+        shared.close()
+    statistics = results[0]
+    for partial in results[1:]:
+        statistics = kernels.mergeStatistics(statistics, partial)
+    return statistics
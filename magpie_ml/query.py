@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#%% Imports - query
+import numpy as np
+import pandas as pd
+from magpie_ml.export import readParquetEvents, dictionaryCodes
+from magpie_ml.kernels import cellStatistics, flightMatrices
+from magpie_ml import parallel
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% QUERY %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Lazy query of several statistics of a log. The statistics are collected
+#   by the builder and computed together by execute(): the events of the
+#   window and the buttons are selected (read from a database or a Parquet
+#   dataset) once, the key strokes are paired once and the presses are
+#   selected once for all the requested statistics.
+
+class analyticsQuery:
+    """A class to represent a lazy query of statistics of a log.
+
+    The query is built by analytics.query(), e.g.
+        results = log.query().window(t0, t1).buttons(buttons).dwell().transitions(1.5).execute()
+    the results are the same as of the methods of analytics opened with
+    the window, restricted to the buttons.
+
+    Attributes:
+
+    Methods:
+        analyticsQuery(log)
+        window(start, end)
+        buttons(buttons)
+        dwell()
+        transitions(timeLimit)
+        flights(timeLimit)
+        counts()
+        execute()
+    """
+    def __init__(self, log):
+        """Inits analyticsQuery class, an empty query of all events.
+
+        Arguments:
+            log: <analytics>
+                Parsed log (text log, database or Parquet dataset).
+
+        Returns:
+        """
+        self._log = log
+        self._window = None
+        self._buttons = None
+        self._statistics = {}
+
+    #%% selection of events
+    def window(self, start, end):
+        """Select the events with start <= time <= end.
+
+        Arguments:
+            start: <float>
+            end: <float>
+
+        Returns:
+            <analyticsQuery>
+        """
+        self._window = (float(start), float(end))
+        return self
+
+    def buttons(self, buttons):
+        """Select the events of the buttons.
+
+        Arguments:
+            buttons: list(<str>)
+                Buttons of the results (the default buttons of
+                the analytics otherwise).
+
+        Returns:
+            <analyticsQuery>
+        """
+        self._buttons = list(buttons)
+        return self
+
+    #%% requested statistics
+    def dwell(self):
+        """Request the dwell statistics (see analytics.getDwellStatistics).
+
+        Returns:
+            <analyticsQuery>
+        """
+        self._statistics['dwell'] = ()
+        return self
+
+    def transitions(self, timeLimit):
+        """Request the transition statistics (see analytics.getTransitionStatistics).
+
+        Arguments:
+            timeLimit: <float>
+
+        Returns:
+            <analyticsQuery>
+        """
+        self._statistics['transitions'] = (timeLimit,)
+        return self
+
+    def flights(self, timeLimit):
+        """Request the latency matrices (see analytics.getFlightMatrices).
+
+        Arguments:
+            timeLimit: <float>
+
+        Returns:
+            <analyticsQuery>
+        """
+        self._statistics['flights'] = (timeLimit,)
+        return self
+
+    def counts(self):
+        """Request the number of presses and releases of every button.
+
+        Returns:
+            <analyticsQuery>
+        """
+        self._statistics['counts'] = ()
+        return self
+
+    #%% execution
+    def _events(self, buttons):
+        """Session, button code, event and time of the selected events.
+
+        The events are read once, in chronological order, a database
+        or a Parquet dataset returns the selected events only.
+        """
+        log = self._log
+        window = self._window
+        if(log._window is not None):
+            window = log._window if window is None else (max(window[0], log._window[0]), min(window[1], log._window[1]))
+        if(log._store is not None and '_df' not in log.__dict__):
+            rows = log._store.readEvents(window, log._queryButtons(buttons)).fetchall()
+            index = {b: i for i, b in enumerate(buttons)}
+            session = np.array([r[0] for r in rows], dtype=np.int64)
+            codes   = np.array([index[r[3]] for r in rows], dtype=np.int64)
+            event   = np.array([r[4] for r in rows], dtype=np.int64)
+            time    = np.array([r[1] for r in rows], dtype=np.float64)
+            return session, codes, event, time
+        if(log._parquet is not None and '_df' not in log.__dict__):
+            table = readParquetEvents(log._parquet, window, log._queryButtons(buttons), columns=['time', 'button', 'event', 'session'])
+            return (table['session'].to_numpy().astype(np.int64), dictionaryCodes(table['button'], buttons),
+                    table['event'].to_numpy().astype(np.int64), table['time'].to_numpy())
+        df = log._df
+        codes = pd.Categorical(df['Button'], categories=buttons).codes
+        rows = codes >= 0
+        time = df['Time'].values
+        if(window is not None):
+            rows &= (time >= window[0]) & (time <= window[1])
+        return (df['Session'].values[rows], codes[rows].astype(np.int64),
+                df['Event'].values[rows], time[rows])
+
+    def execute(self):
+        """Compute the requested statistics in one pass over the events.
+
+        Raises:
+            Exception: No statistic is requested.
+
+        Returns:
+            dict{'dwell': (<array(B)>, <array(B)>, <array(B)>),
+                 'transitions': (<matrix>, <matrix>, <matrix>),
+                 'flights': dict{'PP', 'PR', 'RP', 'RR': (<matrix>, <matrix>, <matrix>)},
+                 'counts': dict{'press': <array(B)>, 'release': <array(B)>}}
+                The requested statistics only.
+        """
+        if(len(self._statistics) == 0):
+            raise Exception("analyticsQuery.execute(): no statistic is requested, use dwell(), transitions(..), flights(..) or counts().")
+        buttons = self._log._buttons if self._buttons is None else self._buttons
+        B = len(buttons)
+        session, codes, event, time = self._events(buttons)
+        results = {}
+        # key strokes
+        if('dwell' in self._statistics or 'flights' in self._statistics):
+            table, offsets, unmatchedPress, unmatchedRelease = parallel.pairPressRelease(session, codes, event, time, B, self._log._processes)
+            if('dwell' in self._statistics):
+                results['dwell'] = cellStatistics(table['button'], table['timeDur'], B)
+            if('flights' in self._statistics):
+                results['flights'] = flightMatrices(table['button'], table['timeIn'], table['timeOut'], B, *self._statistics['flights'])
+        # presses
+        pressed = event > 0
+        if('transitions' in self._statistics):
+            results['transitions'] = parallel.transitionStatistics(codes[pressed], time[pressed], B, *self._statistics['transitions'], processes=self._log._processes)
+        if('counts' in self._statistics):
+            results['counts'] = {'press':   np.bincount(codes[pressed], minlength=B),
+                                 'release': np.bincount(codes[event < 0], minlength=B)}
+        return results
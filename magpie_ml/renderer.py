@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+#%% Imports - renderer
+import matplotlib.colors as colors
+import matplotlib.patches as patches
+import matplotlib.pyplot as plt
+from matplotlib.collections import PatchCollection, PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D, IdentityTransform
+from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+import numpy as np
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% RENDERER %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Batched drawing of the keyboard layout. All the buttons are drawn by
+#   a single collection (and in 2D all the labels of one kind by a single
+#   collection of glyph paths), so that the plot can be updated
+#   without rebuilding the artists.
+
+#   glyph paths of the already rendered strings {(string, weight, centered): Path}
+_textPathCache = {}
+_textPathCacheSize = 4096
+
+#%% glyph path of a string
+def _textPath(string, weight='normal', centered=False):
+    """Get the glyph path of a string with font size 1.
+
+    Arguments:
+        string: <str>
+            Text to be converted into a path.
+        weight: <str>
+            'normal': (default) font weight
+        centered: <bool>
+            False: (default) the origin is the left end of the baseline
+            True: the origin is the centre of the glyphs
+
+    Returns:
+        <Path>
+            Path of the glyphs.
+    """
+    path = _textPathCache.get((string, weight, centered), None)
+    if(path is None):
+        if(len(_textPathCache) >= _textPathCacheSize):
+            _textPathCache.clear()
+        path = TextPath((0, 0), string, size=1, prop=FontProperties(weight=weight))
+        if(centered and len(path.vertices) > 0):
+            extents = path.get_extents()
+            path = Affine2D().translate(-(extents.x0+extents.x1)/2, -(extents.y0+extents.y1)/2).transform_path(path)
+        _textPathCache[(string, weight, centered)] = path
+    return path
+
+#%% collection of texts
+def textCollection(axis, positions, strings, fontSize=10, weight='normal', color='black', centered=False, animated=False):
+    """Draw many texts as a single artist.
+
+    Every text is drawn as a glyph path. The position is given in data
+    coordinates while the glyphs keep their size in points, which is
+    the behavior of axis.text(..., horizontalalignment='left',
+    verticalalignment='baseline') or, if centered, of
+    axis.text(..., horizontalalignment='center', verticalalignment='center').
+
+    Arguments:
+        axis: <axis>
+            A 2D subplot axis.
+        positions: <array(N,2)>
+            Positions of the texts in data coordinates.
+        strings: list(<str>)
+            N texts to be drawn.
+        fontSize: <float>
+            10: (default) font size of the text
+        weight: <str>
+            'normal': (default) font weight
+        color: <str> or <list(<int>)>
+            'black': (default) color of the text
+        centered: <bool>
+            False: (default) texts start at the positions
+            True: texts are centred at the positions
+        animated: <bool>
+            False: (default) the collection is drawn by the canvas
+            True: the collection is excluded from the canvas draw
+                (used for blitting)
+
+    Returns:
+        <PathCollection>
+            Handle to the texts.
+    """
+    collection = PathCollection([_textPath(s, weight, centered) for s in strings],
+                                sizes=np.full(len(strings), float(fontSize)**2),
+                                offsets=np.asarray(positions, dtype=float).reshape(-1, 2),
+                                offset_transform=axis.transData, transform=IdentityTransform(),
+                                facecolors=color, edgecolors='none', animated=animated)
+    axis.add_collection(collection, autolim=False)
+    return collection
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% RENDERER 2D %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class renderer2D:
+    """A class to represent a live 2D plot of the keyboard layout.
+
+    The buttons are drawn as a single PatchCollection, the button names,
+    bound symbols and values are drawn as one PathCollection each.
+    Changing the values only changes the face colors and the value
+    labels, so that the plot can be refreshed at interactive frame
+    rates (e.g. a heatmap of a running logger).
+
+    Attributes:
+        self.buttons
+            list(<str>) of plotted buttons, the order of the values
+        self.collection
+            <PatchCollection> of the buttons
+        self.texts
+            list(<PathCollection>) of the labels
+                (depends on nameShow, bindShow, dzShow)
+
+    Methods:
+        renderer2D(axis, buttons, graphics, symbols, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], fontSize=10, cmap='viridis', vmin=None, vmax=None, valueFormat='{:.2f}', animated=False)
+        update(values)
+        blit()
+        getArtists()
+    """
+    def __init__(self, axis, buttons, graphics, symbols, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], fontSize=10, cmap='viridis', vmin=None, vmax=None, valueFormat='{:.2f}', animated=False):
+        """Inits renderer2D and draws the buttons.
+
+        Arguments:
+            axis: <axis>
+                A 2D subplot axis.
+            buttons: list(<str>)
+                Names of the plotted buttons.
+            graphics: list(dict)
+                Graphics of the buttons (layout._K[<button>]['graphics']).
+            symbols: list(list(<str>))
+                Symbols bound to the buttons.
+            nameShow: <bool>
+                True: (default) plot the button names
+                False: button names are not plotted
+            bindShow: <bool>
+                True: plot bound symbols
+                False: (default) do not plot bound symbols
+            dzShow: <bool>
+                True: (default) plot the value of the button
+                False: value is not plotted
+            textOffset: list(<float>, <float>, <float>)
+                [0.0, 0.0, 0.0]: (default) offset to the plotted text
+            fontSize: <float>
+                10: (default) font size of the text
+            cmap: <str> or <Colormap>
+                'viridis': (default) color map of the values
+            vmin, vmax: <float>
+                None: (default) the color map is scaled to the values
+                    of every update
+            valueFormat: <str>
+                '{:.2f}': (default) format of the plotted values
+            animated: <bool>
+                False: (default) the plot is redrawn with the canvas
+                True: the artists are drawn by blit() only
+
+        Raises:
+
+        Returns:
+        """
+        self._axis = axis
+        self.buttons = list(buttons)
+        self._index = {b: i for i, b in enumerate(self.buttons)}
+        self._cmap = plt.get_cmap(cmap)
+        self._vmin, self._vmax = vmin, vmax
+        self._valueFormat = valueFormat
+        self._fontSize = fontSize
+        self._animated = animated
+        self._background = None
+        # abstract the "graphics" values into arrays
+        xs, ys   = np.array([g['x'] for g in graphics], dtype=float),  np.array([g['y'] for g in graphics], dtype=float)
+        dxs, dys = np.array([g['dx'] for g in graphics], dtype=float), np.array([g['dy'] for g in graphics], dtype=float)
+        self._values = np.array([g['dz'] for g in graphics], dtype=float)
+        # the colors keep the alpha channel of every button
+        self._alphas = np.array([g['alpha'] for g in graphics], dtype=float)
+        self._facecolors = np.array([colors.to_rgba(g['facecolor'], a) for g, a in zip(graphics, self._alphas)])
+        edgecolors = np.array([colors.to_rgba(g['edgecolor'], a) for g, a in zip(graphics, self._alphas)])
+        # buttons
+        rectangles = [patches.Rectangle((y, x), dy, dx) for x, y, dx, dy in zip(xs, ys, dxs, dys)]
+        self.collection = PatchCollection(rectangles, facecolors=self._facecolors, edgecolors=edgecolors, linewidths=1, animated=animated)
+        axis.add_collection(self.collection, autolim=False)
+        # labels
+        self.texts = []
+        self._valueTexts = None
+        namePositions  = np.column_stack((ys+textOffset[1]+0.25, xs+textOffset[0]+0.35))
+        valuePositions = np.column_stack((ys+textOffset[1]+0.25, xs+textOffset[0]+0.75))
+        if(nameShow):
+            self.texts.append( textCollection(axis, namePositions, self.buttons, fontSize, weight='bold', animated=animated) )
+            if(bindShow):
+                self.texts.append( textCollection(axis, valuePositions, [" ".join(s) for s in symbols], fontSize, animated=animated) )
+        if(dzShow):
+            self._valueTexts = textCollection(axis, valuePositions, [valueFormat.format(v) for v in self._values], fontSize, animated=animated)
+            self.texts.append(self._valueTexts)
+        # keep the background for blitting up to date
+        if(animated):
+            self._drawEvent = axis.figure.canvas.mpl_connect('draw_event', self._onDraw)
+
+    #%% all artists
+    def getArtists(self):
+        """Get all artists drawn by the renderer.
+
+        Returns:
+            list(<Collection>)
+                The buttons followed by the labels
+                (e.g. to be returned from a FuncAnimation callback).
+        """
+        return [self.collection] + self.texts
+
+    #%% update the values
+    def update(self, values):
+        """Change the values of the buttons.
+
+        Only the face colors and the value labels are changed,
+        the artists are not re-created. Buttons with NaN value
+        keep their original face color.
+
+        Arguments:
+            values: dict{<button>: <float>} or <array(N)>
+                New values, either by button name or aligned
+                with self.buttons. Buttons missing in the dictionary
+                keep their current value.
+
+        Raises:
+            Exception: The array does not match the number of buttons.
+
+        Returns:
+            list(<Collection>)
+                The changed artists.
+        """
+        if(isinstance(values, dict)):
+            for button, value in values.items():
+                idx = self._index.get(button, None)
+                if(idx is not None):
+                    self._values[idx] = value
+        else:
+            values = np.asarray(values, dtype=float)
+            if(values.shape != self._values.shape):
+                raise Exception("renderer2D.update(values): expected "+str(len(self._values))+" values, got "+str(values.size)+".")
+            self._values[:] = values
+        # colors
+        finite = np.isfinite(self._values)
+        facecolors = self._facecolors.copy()
+        if(finite.any()):
+            vmin = np.min(self._values[finite]) if self._vmin is None else self._vmin
+            vmax = np.max(self._values[finite]) if self._vmax is None else self._vmax
+            facecolors[finite, :] = self._cmap(colors.Normalize(vmin, vmax)(self._values[finite]))
+            facecolors[finite, 3] = self._alphas[finite]
+        self.collection.set_facecolor(facecolors)
+        changed = [self.collection]
+        # value labels
+        if(self._valueTexts is not None):
+            self._valueTexts.set_paths([_textPath(self._valueFormat.format(v)) for v in self._values])
+            changed.append(self._valueTexts)
+        return changed
+
+    #%% blitting
+    def _onDraw(self, event):
+        """Keep the background and draw the animated artists after a full canvas draw."""
+        canvas = self._axis.figure.canvas
+        self._background = canvas.copy_from_bbox(self._axis.bbox)
+        for artist in self.getArtists():
+            self._axis.draw_artist(artist)
+
+    def blit(self):
+        """Redraw the renderer artists only (requires animated=True).
+
+        The background of the axis is restored and only the
+        buttons and labels are drawn over it.
+
+        Raises:
+            Exception: The renderer was created with animated=False.
+
+        Returns:
+        """
+        if(not self._animated):
+            raise Exception("renderer2D.blit(): blitting requires the renderer to be created with animated=True.")
+        canvas = self._axis.figure.canvas
+        if(self._background is None):
+            # the first full draw stores the background
+            canvas.draw()
+        canvas.restore_region(self._background)
+        for artist in self.getArtists():
+            self._axis.draw_artist(artist)
+        canvas.blit(self._axis.bbox)
+        canvas.flush_events()
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% RENDERER 3D %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   faces of a unit cube (same order and orientation as axis.bar3d)
+_cuboid = np.array([
+    ((0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 0, 0)),   # -z
+    ((0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)),   # +z
+    ((0, 0, 0), (1, 0, 0), (1, 0, 1), (0, 0, 1)),   # -y
+    ((0, 1, 0), (0, 1, 1), (1, 1, 1), (1, 1, 0)),   # +y
+    ((0, 0, 0), (0, 0, 1), (0, 1, 1), (0, 1, 0)),   # -x
+    ((1, 0, 0), (1, 1, 0), (1, 1, 1), (1, 0, 1)),   # +x
+], dtype=float)
+#   outward normals of the faces
+_cuboidNormals = np.array([(0, 0, -1), (0, 0, 1), (0, -1, 0), (0, 1, 0), (-1, 0, 0), (1, 0, 0)], dtype=float)
+
+#%% shading of the cube faces
+def _cuboidShade(lightsource=None):
+    """Get the brightness of the cube faces (the shading of axis.bar3d).
+
+    Arguments:
+        lightsource: <LightSource>
+            None: (default) the light source of axis.bar3d
+
+    Returns:
+        <array(6)>
+            Multiplier of the RGB channels of every face.
+    """
+    if(lightsource is None):
+        lightsource = colors.LightSource(azdeg=225, altdeg=19.4712)
+    shade = _cuboidNormals @ lightsource.direction
+    # dot product [-1, 1] to brightness [0.3, 1]
+    return 0.3 + 0.7*(shade + 1)/2
+
+class renderer3D:
+    """A class to represent a 3D plot of the keyboard layout.
+
+    All the buttons are drawn as a single Poly3DCollection (6 faces
+    per button) with the face colors shaded as by axis.bar3d. Changing
+    the values (heights of the buttons) only moves the top vertices
+    of the collection, the artists are not re-created.
+
+    Attributes:
+        self.buttons
+            list(<str>) of plotted buttons, the order of the values
+        self.collection
+            <Poly3DCollection> of the buttons
+        self.texts
+            list(<axis.text handles>) of the labels
+                (depends on nameShow, bindShow, dzShow)
+
+    Methods:
+        renderer3D(axis, buttons, graphics, symbols, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], fontSize=10, cmap=None, vmin=None, vmax=None, valueFormat='{:.2f}')
+        update(values)
+    """
+    def __init__(self, axis, buttons, graphics, symbols, nameShow=True, bindShow=False, dzShow=True, textOffset=[0.0, 0.0, 0.0], fontSize=10, cmap=None, vmin=None, vmax=None, valueFormat='{:.2f}'):
+        """Inits renderer3D and draws the buttons.
+
+        Arguments:
+            axis: <axis>
+                A 3D subplot axis.
+            buttons: list(<str>)
+                Names of the plotted buttons.
+            graphics: list(dict)
+                Graphics of the buttons (layout._K[<button>]['graphics']).
+            symbols: list(list(<str>))
+                Symbols bound to the buttons.
+            nameShow: <bool>
+                True: (default) plot the button names
+                False: button names are not plotted
+            bindShow: <bool>
+                True: plot bound symbols
+                False: (default) do not plot bound symbols
+            dzShow: <bool>
+                True: (default) plot the height of the button
+                False: value is not plotted
+            textOffset: list(<float>, <float>, <float>)
+                [0.0, 0.0, 0.0]: (default) offset to the plotted text
+            fontSize: <float>
+                10: (default) font size of the text
+            cmap: <str> or <Colormap>
+                None: (default) update(values) changes the heights only
+                <cmap>: update(values) changes the face colors as well
+            vmin, vmax: <float>
+                None: (default) the color map is scaled to the values
+                    of every update
+            valueFormat: <str>
+                '{:.2f}': (default) format of the plotted values
+
+        Raises:
+
+        Returns:
+        """
+        self._axis = axis
+        self.buttons = list(buttons)
+        self._index = {b: i for i, b in enumerate(self.buttons)}
+        self._cmap = None if cmap is None else plt.get_cmap(cmap)
+        self._vmin, self._vmax = vmin, vmax
+        self._valueFormat = valueFormat
+        # abstract the "graphics" values into arrays, [button, coordinate]
+        self._base = np.array([[g['x'], g['y'], g['z']] for g in graphics], dtype=float).reshape(-1, 3)
+        self._size = np.array([[g['dx'], g['dy'], g['dz']] for g in graphics], dtype=float).reshape(-1, 3)
+        # the prisms are drawn half transparent (as the original bar3d plot)
+        self._alphas = np.array([g['alpha'] for g in graphics], dtype=float)/2
+        self._facecolors = np.array([colors.to_rgba(g['facecolor'], a) for g, a in zip(graphics, self._alphas)]).reshape(-1, 4)
+        edgecolors = np.array([colors.to_rgba(g['edgecolor'], a) for g, a in zip(graphics, self._alphas)]).reshape(-1, 4)
+        self._shade = _cuboidShade()
+        # vertices indexed by [button, face, vertex, coordinate]
+        self._verts = self._base[:, None, None, :] + _cuboid[None, :, :, :]*self._size[:, None, None, :]
+        self.collection = Poly3DCollection(self._verts.reshape(-1, 4, 3), facecolors=self._shadeColors(self._facecolors),
+                                           edgecolors=np.repeat(edgecolors, 6, axis=0), linewidths=1)
+        axis.add_collection3d(self.collection)
+        self._autoscale()
+        # labels
+        self.texts = []
+        self._valueTexts = []
+        for (x, y, z), name, bind, dz in zip(self._base, self.buttons, symbols, self._size[:, 2]):
+            if(nameShow):
+                self.texts.append( axis.text(x+textOffset[0]+0.35, y+textOffset[1]+0.25, z+textOffset[2], name, horizontalalignment='left', verticalalignment='bottom', rotation_mode='anchor', fontsize=fontSize, weight='bold' ) )
+                if(bindShow):
+                    self.texts.append( axis.text(x+textOffset[0]+0.75, y+textOffset[1]+0.25, z+textOffset[2], " ".join(bind), horizontalalignment='left', verticalalignment='bottom', rotation_mode='anchor', fontsize=fontSize ) )
+            if(dzShow):
+                self._valueTexts.append( axis.text(x+textOffset[0]+0.75, y+textOffset[1]+0.25, z+textOffset[2], valueFormat.format(dz), horizontalalignment='left', verticalalignment='bottom', rotation_mode='anchor', fontsize=fontSize ) )
+                self.texts.append(self._valueTexts[-1])
+
+    #%% face colors
+    def _shadeColors(self, buttonColors):
+        """Expand the button colors to shaded face colors.
+
+        Arguments:
+            buttonColors: <array(N,4)>
+                RGBA color of every button.
+
+        Returns:
+            <array(6*N,4)>
+                RGBA color of every face.
+        """
+        faceColors = np.repeat(buttonColors[:, None, :], 6, axis=1)
+        faceColors[:, :, :3] *= self._shade[None, :, None]
+        return faceColors.reshape(-1, 4)
+
+    #%% axis limits
+    def _autoscale(self):
+        """Extend the axis limits to the plotted buttons."""
+        if(len(self._verts) == 0):
+            return
+        low  = self._verts.reshape(-1, 3).min(axis=0)
+        high = self._verts.reshape(-1, 3).max(axis=0)
+        self._axis.auto_scale_xyz((low[0], high[0]), (low[1], high[1]), (low[2], high[2]), True)
+
+    #%% update the values
+    def update(self, values):
+        """Change the heights (dz) of the buttons.
+
+        Only the vertices (and the face colors if the renderer has
+        a color map) of the existing collection are changed.
+        Buttons with NaN value are drawn flat.
+
+        Arguments:
+            values: dict{<button>: <float>} or <array(N)>
+                New heights, either by button name or aligned
+                with self.buttons. Buttons missing in the dictionary
+                keep their current height.
+
+        Raises:
+            Exception: The array does not match the number of buttons.
+
+        Returns:
+            list(<artist>)
+                The changed artists.
+        """
+        dz = self._size[:, 2]
+        if(isinstance(values, dict)):
+            for button, value in values.items():
+                idx = self._index.get(button, None)
+                if(idx is not None):
+                    dz[idx] = value
+        else:
+            values = np.asarray(values, dtype=float)
+            if(values.shape != dz.shape):
+                raise Exception("renderer3D.update(values): expected "+str(len(dz))+" values, got "+str(values.size)+".")
+            dz[:] = values
+        # move the vertices in place
+        self._verts[..., 2] = self._base[:, None, None, 2] + _cuboid[None, :, :, 2]*np.nan_to_num(dz)[:, None, None]
+        self.collection.set_verts(self._verts.reshape(-1, 4, 3))
+        changed = [self.collection]
+        # colors
+        finite = np.isfinite(dz)
+        if(self._cmap is not None and finite.any()):
+            vmin = np.min(dz[finite]) if self._vmin is None else self._vmin
+            vmax = np.max(dz[finite]) if self._vmax is None else self._vmax
+            facecolors = self._facecolors.copy()
+            facecolors[finite, :] = self._cmap(colors.Normalize(vmin, vmax)(dz[finite]))
+            facecolors[finite, 3] = self._alphas[finite]
+            self.collection.set_facecolor(self._shadeColors(facecolors))
+        # value labels
+        for text, value in zip(self._valueTexts, dz):
+            text.set_text(self._valueFormat.format(value))
+        changed += self._valueTexts
+        self._autoscale()
+        return changed
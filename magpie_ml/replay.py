@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+#%% Imports - replay
+import time
+from magpie_ml.logger import logger
+from magpie_ml.segments import openLog, logSize
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% REPLAY %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Replay of recorded (or synthetic) events into the logger callbacks,
+#   without the operating system listener, so that the logger can be
+#   tested and measured on a headless machine.
+
+#%% stand-in for a pynput key
+class replayKey:
+    """A class to represent a key reported by the listener.
+
+    A single character key has the attribute "char" (as
+    pynput.keyboard.KeyCode), other keys are printed as 'Key.<name>'
+    (as pynput.keyboard.Key), which is how logger._key2str(...)
+    recognizes them.
+
+    Attributes:
+        self.vk
+            Virtual key code (None if unknown).
+        self.char
+            Character of the key (single character keys only).
+    """
+    def __init__(self, keyStr, vk=None):
+        """Inits replayKey from the logged key name.
+
+        Arguments:
+            keyStr: <str>
+                Key as logged in the column "Key" (e.g. 'a', 'shift').
+            vk: <int>
+                None: (default) virtual key code
+        """
+        self.vk = vk
+        self._name = keyStr
+        if(len(keyStr) == 1):
+            self.char = keyStr
+
+    def __str__(self):
+        return 'Key.' + self._name
+
+    def __repr__(self):
+        return '<replayKey ' + self._name + '>'
+
+#%% events of a log file
+def readEvents(path):
+    """Read the events of a log file.
+
+    The sessions are concatenated, the time of every appended session
+    continues from the last event of the previous session.
+
+    Arguments:
+        path: <str>
+            Path to the log file (or to the compressed log).
+
+    Raises:
+
+    Returns:
+        generator((<float>, <str>, <bool>))
+            Events (time, key, press).
+    """
+    offset, last = 0.0, 0.0
+    with openLog(path) as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if(len(fields) != 4):
+                continue
+            if(fields[0] == 'Time'):
+                offset = last
+                continue
+            last = float(fields[0]) + offset
+            yield (last, fields[1].strip(), fields[3].startswith('+'))
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class replay:
+    """A class to represent a replay of events into a logger.
+
+    The replay creates a logger without a listener and calls its
+    on_press(key) and on_release(key) callbacks with replayKey objects.
+    The events are fed either in real time (the logger logs the real
+    time of the callbacks) or at maximum speed (the logger logs the
+    recorded time of the events). Every callback is timed, so that the
+    write path of the logger can be benchmarked.
+
+    Attributes:
+        self.logger
+            <logger> fed by the replay
+
+    Methods:
+        replay(symbolToButtonDict, path='replayedData.txt', **loggerArguments)
+        run(events, realTime=False, speed=1.0)
+    """
+    def __init__(self, symbolToButtonDict, path='replayedData.txt', **loggerArguments):
+        """Inits replay and its logger.
+
+        Arguments:
+            symbolToButtonDict: dict(symbol1: button1, symbol2: button2, ...)
+                Obtained from layout.getSymbolToButtonDict()
+            path : <str>
+                'replayedData.txt': (default) path to file
+                    to log the replayed key strokes
+            loggerArguments:
+                Other arguments of the logger (e.g. doNotLogButtons).
+
+        Raises:
+
+        Returns:
+        """
+        self._now = 0.0
+        self.logger = logger(symbolToButtonDict, path=path, listen=False, clock=self._clock, **loggerArguments)
+
+    #%% time seen by the logger
+    def _clock(self):
+        return self._now
+
+    #%% run the replay
+    def run(self, events, realTime=False, speed=1.0):
+        """Feed the events into the logger.
+
+        The logger is started before the first event and stopped after
+        the last event (unless an escape combination stops it earlier).
+
+        Arguments:
+            events: iterable((<float>, <str>, <bool>))
+                Events (time, key, press) sorted by time, e.g. from
+                readEvents(path) or synthetic.generator.events(...).
+            realTime: <bool>
+                False: (default) the events are fed at maximum speed
+                    and logged with their recorded time
+                True: the events are fed at their recorded time
+                    and logged with the real time
+            speed: <float>
+                1.0: (default) speed-up of the real time replay
+
+        Raises:
+
+        Returns:
+            dict{'events': <int>, 'seconds': <float>, 'eventsPerSecond': <float>,
+                 'latency': dict{'p50', 'p90', 'p99', 'p999', 'max'}, 'bytesWritten': <int>}
+                Throughput, latency [s] of the callbacks and growth
+                of the log file [bytes] (including closing the file).
+        """
+        latencies = []
+        keys = {}
+        path = self.logger._path
+        bytesStart = logSize(path)
+        self.logger.start()
+        start = time.perf_counter()
+        firstTime = None
+        for eventTime, keyStr, press in events:
+            key = keys.get(keyStr, None)
+            if(key is None):
+                key = keys[keyStr] = replayKey(keyStr)
+            if(firstTime is None):
+                firstTime = eventTime
+            if(realTime):
+                # wait for the event
+                delay = (eventTime - firstTime)/speed - (time.perf_counter() - start)
+                if(delay > 0):
+                    time.sleep(delay)
+                self._now = time.perf_counter() - start
+            else:
+                self._now = eventTime
+            callbackStart = time.perf_counter()
+            if(press):
+                self.logger.on_press(key)
+            else:
+                self.logger.on_release(key)
+            latencies.append(time.perf_counter() - callbackStart)
+            # escape combination stopped the logger
+            if(not self.logger.running):
+                break
+        if(self.logger.running):
+            self.logger.stop()
+        seconds = time.perf_counter() - start
+        bytesEnd = logSize(path)
+        # latency percentiles
+        latencies.sort()
+        def percentile(q):
+            if(len(latencies) == 0):
+                return float('nan')
+            return latencies[min(len(latencies)-1, int(q*len(latencies)))]
+        return {'events': len(latencies),
+                'seconds': seconds,
+                'eventsPerSecond': len(latencies)/seconds if seconds > 0 else float('nan'),
+                'latency': {'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99), 'p999': percentile(0.999), 'max': percentile(1.0)},
+                'bytesWritten': bytesEnd - bytesStart}
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+#%% Imports - segments
+import io
+import os
+import re
+import threading
+import warnings
+import zlib
+try:
+    import zstandard
+except ImportError: # optional dependency (pip install magpie_ml[zstd])
+    zstandard = None
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% SEGMENTS %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Compressed text log of the logger. The log "path" is stored in segments
+#       <path>.00000.gz, <path>.00001.gz, ...   (or .zst)
+#   the concatenated text of the segments is the text log. The module
+#   depends on the standard library only (zstandard for 'zstd').
+
+#   file extension of the compressions
+_extensions = {'gzip': '.gz', 'zstd': '.zst'}
+#   errors of corrupted streams
+_corruption = (zlib.error,) if zstandard is None else (zlib.error, zstandard.ZstdError)
+
+def _requireCodec(compression, function):
+    if(compression not in _extensions):
+        raise Exception("segments."+function+"(..., compression, ...): unknown compression <"+str(compression)+">, use 'gzip' or 'zstd'.")
+    if(compression == 'zstd' and zstandard is None):
+        raise Exception("segments."+function+"(..): the package zstandard is required for compression 'zstd' (pip install zstandard).")
+
+#%% segments of a log
+def listSegments(path):
+    """List the segments of a compressed log.
+
+    Arguments:
+        path: <str>
+            Path to the log (without the segment suffix).
+
+    Returns:
+        list(<str>)
+            Paths to the segments in the order of writing.
+    """
+    directory = os.path.dirname(path)
+    pattern = re.compile(re.escape(os.path.basename(path)) + r'\.(\d+)\.(gz|zst)$')
+    try:
+        names = os.listdir(directory or '.')
+    except OSError:
+        return []
+    found = sorted((int(m.group(1)), name) for m, name in ((pattern.match(name), name) for name in names) if m)
+    return [os.path.join(directory, name) for index, name in found]
+
+def isSegmentedLog(path):
+    """Check whether a log is stored in compressed segments.
+
+    Arguments:
+        path: <str>
+
+    Returns:
+        <bool>
+    """
+    return not os.path.isfile(path) and len(listSegments(path)) > 0
+
+def logSize(path):
+    """Size of a log on the disk.
+
+    Arguments:
+        path: <str>
+
+    Returns:
+        <int>
+            Size [bytes] of the text log, or of all its segments.
+    """
+    if(os.path.isfile(path)):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(segment) for segment in listSegments(path))
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class segmentWriter:
+    """A class to represent the writer of a compressed log.
+
+    Every segment is one compressed stream. The stream is flushed
+    (a flush frame: sync flush of deflate, block flush of zstd) at most
+    "flushInterval" seconds after a row was written, the text before a
+    flush frame can be decompressed without the rest of the stream, so
+    that a crash loses the rows of the last frame only. The compression
+    history is kept over the flush frames. A new segment is started at
+    a flush frame when the segment outgrows "segmentSize", every start
+    of the writer starts a new segment as well.
+
+    The writer is a text file for csv.writer, the rows are written by the
+    listener thread and flushed by a timer thread.
+
+    Attributes:
+        self.path
+            <str> path to the log
+        self.segment
+            <str> path to the current segment
+
+    Methods:
+        segmentWriter(path, compression='gzip', flushInterval=1.0, segmentSize=67108864, level=None)
+        write(text)
+        flush()
+        close()
+    """
+    def __init__(self, path, compression='gzip', flushInterval=1.0, segmentSize=67108864, level=None):
+        """Inits segmentWriter class, opens a new segment.
+
+        Arguments:
+            path: <str>
+                Path to the log (without the segment suffix).
+            compression: <str>
+                'gzip': (default) deflate, standard library
+                'zstd': zstandard (pip install zstandard)
+            flushInterval: <float>
+                1.0: (default) the longest time [s] a row waits
+                    for its flush frame
+            segmentSize: <int>
+                67108864: (default) compressed size [bytes] of a segment
+                    to start a new segment
+            level: <int>
+                None: (default) level 6 of gzip, level 3 of zstd
+
+        Raises:
+            Exception: unknown compression or zstandard is not installed
+
+        Returns:
+        """
+        _requireCodec(compression, 'segmentWriter')
+        self.path = path
+        self._compression = compression
+        self._flushInterval = flushInterval
+        self._segmentSize = segmentSize
+        self._level = level
+        self._lock = threading.Lock()
+        self._timer = None
+        segments = listSegments(path)
+        self._index = int(re.search(r'\.(\d+)\.(gz|zst)$', segments[-1]).group(1)) + 1 if segments else 0
+        self._open()
+
+    def _open(self):
+        """Open the next segment."""
+        self.segment = self.path + '.%05d' % self._index + _extensions[self._compression]
+        self._file = open(self.segment, 'wb')
+        if(self._compression == 'gzip'):
+            self._compressor = zlib.compressobj(6 if self._level is None else self._level, zlib.DEFLATED, 31)
+            self._frame = zlib.Z_SYNC_FLUSH
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=3 if self._level is None else self._level).compressobj()
+            self._frame = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+    def _finish(self):
+        """End the stream of the current segment and close it."""
+        self._file.write(self._compressor.flush())
+        self._file.close()
+        self._file = None
+
+    #%% writing
+    def write(self, text):
+        """Write text (rows of the log).
+
+        Arguments:
+            text: <str>
+
+        Returns:
+            <int>
+                Number of written characters.
+        """
+        with self._lock:
+            self._file.write(self._compressor.compress(text.encode('utf-8')))
+            if(self._timer is None):
+                self._timer = threading.Timer(self._flushInterval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return len(text)
+
+    def flush(self):
+        """Write a flush frame and start a new segment if needed.
+
+        Returns:
+        """
+        with self._lock:
+            if(self._timer is not None):
+                self._timer.cancel()
+                self._timer = None
+            if(self._file is None):
+                return
+            self._file.write(self._compressor.flush(self._frame))
+            self._file.flush()
+            if(self._file.tell() >= self._segmentSize):
+                self._finish()
+                self._index += 1
+                self._open()
+
+    def close(self):
+        """End the stream and close the segment.
+
+        Returns:
+        """
+        with self._lock:
+            if(self._timer is not None):
+                self._timer.cancel()
+                self._timer = None
+            if(self._file is not None):
+                self._finish()
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class _segmentStream(io.RawIOBase):
+    """Decompressed bytes of segments, read chunk by chunk.
+
+    Only complete lines are passed on: the incomplete last line of
+    a segment (the crash of the logger in the middle of a frame) and
+    the corrupted rest of a segment are dropped with a warning.
+    """
+    def __init__(self, segments, chunkSize):
+        self._segments = list(segments)
+        self._chunkSize = chunkSize
+        self._next = 0
+        self._file = None
+        self._buffer = memoryview(b'')
+        self._tail = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self._buffer) == 0:
+            if(not self._fill()):
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        if(self._file is not None):
+            self._file.close()
+            self._file = None
+        super().close()
+
+    def _decompressor(self, segment):
+        if(segment.endswith('.zst')):
+            _requireCodec('zstd', 'openLog')
+            return zstandard.ZstdDecompressor().decompressobj()
+        return zlib.decompressobj(31)
+
+    def _decompress(self, chunk, segment):
+        # the segment may hold several streams (e.g. concatenated files)
+        data = []
+        while len(chunk) > 0:
+            data.append(self._stream.decompress(chunk))
+            if(not self._stream.eof):
+                break
+            chunk = self._stream.unused_data
+            self._stream = self._decompressor(segment)
+        return b''.join(data)
+
+    def _endSegment(self, reason):
+        segment = self._segments[self._next - 1]
+        if(len(self._tail) > 0 or reason is not None):
+            warnings.warn('Segment "'+segment+'": '+(reason or 'incomplete last line')+', '+str(len(self._tail))+' bytes of the last line are dropped.', UserWarning, stacklevel=2)
+        self._file.close()
+        self._file = None
+        self._tail = b''
+
+    def _fill(self):
+        """Decompress the next chunk, False at the end of the last segment."""
+        while True:
+            if(self._file is None):
+                if(self._next >= len(self._segments)):
+                    return False
+                segment = self._segments[self._next]
+                self._next += 1
+                self._file = open(segment, 'rb')
+                self._stream = self._decompressor(segment)
+            segment = self._segments[self._next - 1]
+            chunk = self._file.read(self._chunkSize)
+            if(len(chunk) == 0):
+                self._endSegment(None)
+                continue
+            try:
+                data = self._tail + self._decompress(chunk, segment)
+            except _corruption as error:
+                self._endSegment('corrupted stream ('+str(error)+')')
+                continue
+            cut = data.rfind(b'\n') + 1
+            self._tail = data[cut:]
+            if(cut > 0):
+                self._buffer = memoryview(data)[:cut]
+                return True
+
+#%% read a log
+def openLog(path, chunkSize=1048576):
+    """Open a text log or a compressed log for reading.
+
+    The segments are decompressed chunk by chunk while reading, the
+    text of the log is never held in memory at once.
+
+    Arguments:
+        path: <str>
+            Path to the log (the text file or the segments of path).
+        chunkSize: <int>
+            1048576: (default) compressed bytes read at once
+
+    Raises:
+        Exception: zstandard is needed and not installed
+
+    Returns:
+        <file>
+            Text file of the (concatenated) log.
+    """
+    if(not isSegmentedLog(path)):
+        return open(path, 'r')
+    return io.TextIOWrapper(io.BufferedReader(_segmentStream(listSegments(path), chunkSize)), encoding='utf-8', newline='\n')
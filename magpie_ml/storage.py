@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+#%% Imports - storage
+import sqlite3
+import datetime as dt
+import time as _time
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% STORAGE %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   SQLite storage of the logged events. The module depends on the standard
+#   library only, so that the logger process stays small.
+
+#   schema of the database
+_schema = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id      INTEGER PRIMARY KEY,
+    start   TEXT NOT NULL,
+    timeOffset REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    session INTEGER NOT NULL REFERENCES sessions(id),
+    time    REAL NOT NULL,
+    key     TEXT NOT NULL,
+    button  TEXT NOT NULL,
+    event   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_session_time ON events(session, time);
+CREATE INDEX IF NOT EXISTS events_button_time  ON events(button, time);
+"""
+
+#%% recognize a database file
+def isSqliteFile(path):
+    """Check whether a file is an SQLite database.
+
+    Arguments:
+        path: <str>
+            Path to the file.
+
+    Returns:
+        <bool>
+    """
+    try:
+        with open(path, 'rb') as f:
+            return f.read(16) == b'SQLite format 3\x00'
+    except OSError:
+        return False
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class sqliteStore:
+    """A class to represent an SQLite database of logged events.
+
+    Every start of the logger opens a new session. The table "events"
+    holds the time of the events on a single time line of all sessions
+    (as analytics rebases the appended sessions of a text log): every
+    session starts 60 [s] after the last event of the previous session,
+    the time since the start of the session is time - sessions.timeOffset.
+    The column "event" is +counter for press and -counter for release.
+
+    The events are written in batched transactions in WAL mode, so that
+    the readers do not block the logger and a crash loses at most one
+    batch.
+
+    Attributes:
+        self.path
+            <str> path to the database
+        self.session
+            <int> current session (None before startSession())
+
+    Methods:
+        sqliteStore(path, batchSize=256, batchInterval=1.0, synchronous='NORMAL')
+        startSession()
+        append(time, key, button, event)
+        flush()
+        close()
+        importText(textPath)
+        readEvents(window=None, buttons=None)
+        getTimeRange()
+        queryDwell(buttons, window=None)
+        queryTransitions(buttons, timeLimit, window=None)
+    """
+    #   pause between the sessions [s]
+    _sessionGap = 60.0
+
+    def __init__(self, path, batchSize=256, batchInterval=1.0, synchronous='NORMAL'):
+        """Inits sqliteStore class, creates the database if needed.
+
+        Arguments:
+            path: <str>
+                Path to the database.
+            batchSize: <int>
+                256: (default) number of events written in one transaction
+            batchInterval: <float>
+                1.0: (default) the longest time [s] an event waits
+                    for its transaction
+            synchronous: <str>
+                'NORMAL': (default) a transaction survives a crash 
+                    of the process
+                'FULL': a transaction survives a crash of the machine
+                'OFF': no synchronization
+
+        Raises:
+            Exception: unknown synchronous mode
+
+        Returns:
+        """
+        self.path = path
+        self.session = None
+        self._batchSize = batchSize
+        self._batchInterval = batchInterval
+        self._batch = []
+        self._lastFlush = _time.monotonic()
+        self._offset = 0.0
+        # the logger writes from the listener thread
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        if(synchronous not in ('OFF', 'NORMAL', 'FULL')):
+            raise Exception("sqliteStore.__init__(..., synchronous): unknown mode <"+str(synchronous)+">, use 'OFF', 'NORMAL' or 'FULL'.")
+        self._connection.execute('PRAGMA synchronous='+synchronous)
+        self._connection.executescript(_schema)
+
+    #%% writing
+    def startSession(self):
+        """Open a new session.
+
+        Returns:
+            <int>
+                Id of the session.
+        """
+        self.flush()
+        row = self._connection.execute('SELECT MAX(time) FROM events').fetchone()
+        previous = self._connection.execute('SELECT MAX(timeOffset) FROM sessions').fetchone()
+        if(row[0] is not None):
+            self._offset = row[0] + self._sessionGap
+        elif(previous[0] is not None):
+            # previous sessions without events
+            self._offset = previous[0]
+        else:
+            self._offset = 0.0
+        with self._connection:
+            cursor = self._connection.execute('INSERT INTO sessions (start, timeOffset) VALUES (?, ?)', (dt.datetime.now().isoformat(), self._offset))
+        self.session = cursor.lastrowid
+        return self.session
+
+    def append(self, time, key, button, event):
+        """Append an event of the current session.
+
+        The event is written with the next batch.
+
+        Arguments:
+            time: <float>
+                Time [s] since the start of the session.
+            key: <str>
+                Logged key.
+            button: <str>
+                Button of the key.
+            event: <int>
+                +counter for press, -counter for release.
+
+        Returns:
+        """
+        self._batch.append((self.session, self._offset + time, key, button, event))
+        if(len(self._batch) >= self._batchSize or _time.monotonic() - self._lastFlush >= self._batchInterval):
+            self.flush()
+
+    def flush(self):
+        """Write the pending events in one transaction.
+
+        Returns:
+        """
+        if(len(self._batch) > 0):
+            with self._connection:
+                self._connection.executemany('INSERT INTO events (session, time, key, button, event) VALUES (?, ?, ?, ?, ?)', self._batch)
+            self._batch = []
+        self._lastFlush = _time.monotonic()
+
+    def close(self):
+        """Write the pending events and close the database.
+
+        Returns:
+        """
+        self.flush()
+        self._connection.close()
+
+    #%% text logs
+    def importText(self, textPath):
+        """Import a text log of the logger, every session as a new session.
+
+        Arguments:
+            textPath: <str>
+                Path to the text log (plain or compressed).
+
+        Raises:
+            Exception: The file is not a log of the logger.
+
+        Returns:
+            <int>
+                Number of imported events.
+        """
+        from magpie_ml.segments import openLog
+        count = 0
+        batchSize, self._batchSize = self._batchSize, 100000
+        with openLog(textPath) as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if(len(fields) != 4):
+                    continue
+                if(fields[0] == 'Time'):
+                    self.startSession()
+                    continue
+                if(self.session is None):
+                    raise Exception("sqliteStore.importText(textPath): <"+textPath+"> does not start by the header of the logger.")
+                self.append(float(fields[0]), fields[1].strip(), fields[2].strip(), int(fields[3]))
+                count += 1
+        self.flush()
+        self._batchSize = batchSize
+        return count
+
+    #%% reading
+    def _where(self, window, buttons, alias=''):
+        """Build the WHERE clause of a time window and a set of buttons.
+
+        Returns:
+            (<str>, list)
+                Condition (starting by ' AND ') and its parameters.
+        """
+        condition, parameters = '', []
+        if(window is not None):
+            condition += ' AND '+alias+'time BETWEEN ? AND ?'
+            parameters += [float(window[0]), float(window[1])]
+        if(buttons is not None):
+            condition += ' AND '+alias+'button IN ('+','.join('?'*len(buttons))+')'
+            parameters += list(buttons)
+        return condition, parameters
+
+    def readEvents(self, window=None, buttons=None):
+        """Read the events in chronological order.
+
+        Arguments:
+            window: (<float>, <float>)
+                None: (default) all events
+                (start, end): events with start <= time <= end
+            buttons: list(<str>)
+                None: (default) all buttons
+                list: events of the buttons only
+
+        Returns:
+            <sqlite3.Cursor>
+                Rows (session, time, key, button, event), the cursor
+                can be read in chunks (fetchmany).
+        """
+        condition, parameters = self._where(window, buttons)
+        return self._connection.execute('SELECT session, time, key, button, event FROM events WHERE 1'+condition+' ORDER BY session, time, rowid', parameters)
+
+    def getTimeRange(self):
+        """Get the time of the first and the last event.
+
+        Returns:
+            (<float>, <float>)
+                (None, None) if there is no event.
+        """
+        return tuple(self._connection.execute('SELECT MIN(time), MAX(time) FROM events').fetchone())
+
+    def queryDwell(self, buttons, window=None):
+        """Dwell time (press to release) of buttons computed by the database.
+
+        A press is paired with the next event of the same button in the
+        same session, if it is its release.
+
+        Arguments:
+            buttons: list(<str>)
+            window: (<float>, <float>)
+                None: (default) all events
+                (start, end): presses with start <= time <= end
+
+        Returns:
+            dict(<str>: (<float>, <float>, <int>))
+                Mean, variance (NaN below 2 key strokes) and count of the
+                dwell time [s] of every button with a key stroke.
+        """
+        condition, parameters = self._where(window, buttons)
+        rows = self._connection.execute(
+            'SELECT button, COUNT(*), AVG(dwell), AVG(dwell*dwell) FROM ('
+            ' SELECT button, event, LEAD(event) OVER w AS nextEvent, LEAD(time) OVER w - time AS dwell'
+            ' FROM events WHERE 1'+condition+
+            ' WINDOW w AS (PARTITION BY button, session ORDER BY time, rowid))'
+            ' WHERE event > 0 AND nextEvent = -event GROUP BY button', parameters)
+        return {button: (mean, _variance(mean, square, count), count) for button, count, mean, square in rows}
+
+    def queryTransitions(self, buttons, timeLimit, window=None):
+        """Press-to-press latency of consecutive presses computed by the database.
+
+        Arguments:
+            buttons: list(<str>)
+                Buttons followed (other buttons are left out).
+            timeLimit: <float>
+                A time limit beyond which the transition is considered
+                outlier and left out.
+            window: (<float>, <float>)
+                None: (default) all events
+                (start, end): presses with start <= time <= end
+
+        Returns:
+            dict((<str>, <str>): (<float>, <float>, <int>))
+                Mean, variance (NaN below 2 transitions) and count of the
+                latency [s] of every pair (pressed button, preceding button).
+        """
+        condition, parameters = self._where(window, buttons)
+        rows = self._connection.execute(
+            'SELECT button, previous, COUNT(*), AVG(latency), AVG(latency*latency) FROM ('
+            ' SELECT button, LAG(button) OVER w AS previous, time - LAG(time) OVER w AS latency'
+            ' FROM events WHERE event > 0'+condition+
+            ' WINDOW w AS (ORDER BY session, time, rowid))'
+            ' WHERE latency <= ? GROUP BY button, previous', parameters + [float(timeLimit)])
+        return {(button, previous): (mean, _variance(mean, square, count), count) for button, previous, count, mean, square in rows}
+
+#%% sample variance from moments
+def _variance(mean, square, count):
+    if(count < 2):
+        return float('nan')
+    return max(square - mean*mean, 0.0) * count / (count - 1)
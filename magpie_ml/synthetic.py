@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#%% Imports - synthetic
+import numpy as np
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% GENERATOR %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   This class writes synthetic key-stroke logs in the format of the logger,
+#   so that the analytics can be tested and measured on logs of any size.
+class generator:
+    """A class to represent a generator of synthetic key-stroke logs.
+
+    The generated log has the exact format of the logger: a header
+    line starts every session, the time restarts in every session,
+    the button counters restart in every session and a release
+    carries the counter of its press. The typing is modelled by
+    log-normal dwell (press-to-release) and flight (press-to-press)
+    times with occasional pauses, the buttons are drawn independently
+    with Zipf-like frequencies.
+
+    Attributes:
+        self.buttons
+            list(<str>) of generated buttons
+
+    Methods:
+        generator(symbolToButtonDict, buttons=[], weights=None, dwellMedian=0.095, dwellSigma=0.3, flightMedian=0.15, flightSigma=0.5, pauseProbability=0.01, pauseMean=2.0, seed=None)
+        write(path, keystrokes, sessions=1, append=False, chunkSize=1000000)
+        events(keystrokes, chunkSize=100000)
+    """
+    #   minimal time between a release and the next press of the same button
+    _minGap = 0.005
+    #   minimal flight time, keeps releases of one chunk before the next chunk
+    _minFlight = 0.01
+    #   minimal dwell time
+    _minDwell = 0.01
+
+    def __init__(self, symbolToButtonDict, buttons=[], weights=None, dwellMedian=0.095, dwellSigma=0.3, flightMedian=0.15, flightSigma=0.5, pauseProbability=0.01, pauseMean=2.0, seed=None):
+        """Inits generator class.
+
+        Arguments:
+            symbolToButtonDict: dict(symbol1: button1, symbol2: button2, ...)
+                Obtained from layout.getSymbolToButtonDict(), the logged
+                "Key" of a button is one of its symbols.
+            buttons: list(<str>)
+                []: (default) all buttons of symbolToButtonDict
+            weights: list(<float>)
+                None: (default) Zipf-like frequencies in the order
+                    of "buttons"
+                list: relative frequency of every button
+            dwellMedian: <float>
+                0.095: (default) median time [s] a button is held
+            dwellSigma: <float>
+                0.3: (default) sigma of log(dwell time)
+            flightMedian: <float>
+                0.15: (default) median time [s] between presses
+            flightSigma: <float>
+                0.5: (default) sigma of log(flight time)
+            pauseProbability: <float>
+                0.01: (default) probability of a pause before a press
+            pauseMean: <float>
+                2.0: (default) mean length [s] of a pause (exponential)
+            seed: <int>
+                None: (default) random seed
+
+        Raises:
+            Exception: Unknown button or wrong number of weights.
+
+        Returns:
+        """
+        # symbols of every button
+        buttonToSymbols = {}
+        for symbol, button in symbolToButtonDict.items():
+            buttonToSymbols.setdefault(button, []).append(symbol)
+        if(len(buttons)==0):
+            buttons = list(buttonToSymbols)
+        for button in buttons:
+            if(button not in buttonToSymbols):
+                raise Exception("generator.__init__(..., buttons, ...): button <"+str(button)+"> has no symbol in symbolToButtonDict.")
+        self.buttons = list(buttons)
+        # padded columns of the log, one symbol per button
+        self._keys         = [buttonToSymbols[b][0] for b in self.buttons]
+        self._keyColumn    = [k.ljust(15) for k in self._keys]
+        self._buttonColumn = [b.ljust(15) for b in self.buttons]
+        # button frequencies
+        if(weights is None):
+            weights = 1.0/np.arange(1, len(self.buttons)+1)
+        weights = np.asarray(weights, dtype=float)
+        if(len(weights) != len(self.buttons)):
+            raise Exception("generator.__init__(..., weights, ...): expected "+str(len(self.buttons))+" weights, got "+str(len(weights))+".")
+        self._p = weights/weights.sum()
+        # timing model
+        self._dwell  = (np.log(dwellMedian), dwellSigma)
+        self._flight = (np.log(flightMedian), flightSigma)
+        self._pauseProbability = pauseProbability
+        self._pauseMean = pauseMean
+        self._rng = np.random.default_rng(seed)
+
+    #%% keystrokes of one chunk
+    def _chunk(self, n, startTime, counters):
+        """Generate n keystrokes starting after startTime.
+
+        Arguments:
+            n: <int>
+                Number of keystrokes.
+            startTime: <float>
+                Time of the last press of the previous chunk.
+            counters: <array(B)>
+                Button counters of the session, updated in place.
+
+        Returns:
+            (time, button, event): (<array(2n)>, <array(2n)>, <array(2n)>)
+                Events sorted by time, "event" is +counter for press
+                and -counter for release.
+        """
+        rng = self._rng
+        button = rng.choice(len(self.buttons), size=n, p=self._p)
+        flight = np.maximum(rng.lognormal(*self._flight, size=n), self._minFlight)
+        pause  = rng.random(n) < self._pauseProbability
+        flight[pause] += rng.exponential(self._pauseMean, size=np.count_nonzero(pause))
+        press  = startTime + np.cumsum(flight)
+        dwell  = np.maximum(rng.lognormal(*self._dwell, size=n), self._minDwell)
+        # a button is released before it is pressed again
+        order = np.lexsort((np.arange(n), button))
+        sameNext = np.zeros(n, dtype=bool)
+        sameNext[order[:-1]] = button[order[:-1]] == button[order[1:]]
+        nextPress = np.full(n, np.inf)
+        nextPress[order[:-1]] = press[order[1:]]
+        # ... and the last press of every button is released before the next chunk
+        nextPress[~sameNext] = press[-1] + self._minFlight
+        dwell = np.minimum(dwell, np.maximum(nextPress - press - self._minGap, self._minDwell/2))
+        release = press + dwell
+        # counters continue within the session
+        groupStart = np.r_[0, np.flatnonzero(np.diff(button[order])) + 1]
+        groupSize  = np.diff(np.r_[groupStart, n])
+        rank = np.arange(n) - np.repeat(groupStart, groupSize)
+        counter = np.empty(n, dtype=np.int64)
+        counter[order] = counters[button[order]] + rank + 1
+        np.add.at(counters, button, 1)
+        # merge presses and releases
+        time   = np.concatenate((press, release))
+        events = np.concatenate((counter, -counter))
+        order  = np.argsort(time, kind='stable')
+        return time[order], np.concatenate((button, button))[order], events[order]
+
+    #%% write the log
+    def write(self, path, keystrokes, sessions=1, append=False, chunkSize=1000000):
+        """Write a synthetic log file.
+
+        Every keystroke produces 2 logged events (press and release).
+        The keystrokes are split evenly into sessions, every session
+        starts with a header line (as logger.start() does).
+
+        Arguments:
+            path: <str>
+                Path to the log file.
+            keystrokes: <int>
+                Number of keystrokes to generate.
+            sessions: <int>
+                1: (default) number of appended sessions
+            append: <bool>
+                False: (default) overwrite the file
+                True: append the sessions to an existing file
+            chunkSize: <int>
+                1000000: (default) keystrokes generated at once
+                    (limits the memory)
+
+        Raises:
+
+        Returns:
+            dict{'events': <int>, 'sessions': <int>}
+                Number of logged events and sessions.
+        """
+        header = 'Time\tKey\tButton\tEvent\n'
+        keyColumn, buttonColumn = self._keyColumn, self._buttonColumn
+        perSession = np.full(sessions, keystrokes//sessions)
+        perSession[:keystrokes % sessions] += 1
+        events = 0
+        with open(path, 'a' if append else 'w') as f:
+            for n in perSession:
+                f.write(header)
+                counters = np.zeros(len(self.buttons), dtype=np.int64)
+                # the logger starts the time at zero
+                lastPress = 0.0
+                for start in range(0, n, chunkSize):
+                    time, button, event = self._chunk(min(chunkSize, n-start), lastPress, counters)
+                    lastPress = time[event > 0][-1]
+                    f.write(''.join(['{:<15.6f}\t{}\t{}\t{}{:07d}\n'.format(t, keyColumn[b], buttonColumn[b], '+' if e > 0 else '-', abs(e))
+                                     for t, b, e in zip(time.tolist(), button.tolist(), event.tolist())]))
+                    events += len(time)
+        return {'events': events, 'sessions': sessions}
+
+    #%% stream of events
+    def events(self, keystrokes, chunkSize=100000):
+        """Generate a stream of events of a single session.
+
+        The stream holds the same events as a session written 
+        by write(...), as seen by the logger (e.g. for replay.replay).
+
+        Arguments:
+            keystrokes: <int>
+                Number of keystrokes to generate.
+            chunkSize: <int>
+                100000: (default) keystrokes generated at once
+
+        Raises:
+
+        Returns:
+            generator((<float>, <str>, <bool>))
+                Events (time, key, press) sorted by time.
+        """
+        counters = np.zeros(len(self.buttons), dtype=np.int64)
+        lastPress = 0.0
+        for start in range(0, keystrokes, chunkSize):
+            time, button, event = self._chunk(min(chunkSize, keystrokes-start), lastPress, counters)
+            lastPress = time[event > 0][-1]
+            for t, b, e in zip(time.tolist(), button.tolist(), event.tolist()):
+                yield (t, self._keys[b], e > 0)
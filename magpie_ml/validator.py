@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+#%% Imports - validator
+import numpy as np
+import pandas as pd
+import csv
+import io
+import sys
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% VALIDATOR %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Validation and repair of the text log of the logger. The log is scanned
+#   in chunks, the memory holds a chunk and the open key strokes of the
+#   current session (one per button). The anomalies are
+#       'torn'            line without 4 fields, unreadable time or event
+#       'missingHeader'   events before the first header
+#       'duplicateHeader' header directly after a header (empty session)
+#       'timeBackwards'   time lower than the time of the previous event
+#                         of the session (e.g. a clock change)
+#       'orphanPress'     press without its release (e.g. auto-repeat,
+#                         the logger stopped while the key was down)
+#       'orphanRelease'   release without its press
+#   A chunk is checked at once by the C parser of pandas and numpy, the
+#   chunks with an anomaly or a header are scanned line by line.
+
+#   header of the log
+_header = b'Time\tKey\tButton\tEvent'
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+class _scanner:
+    """State of the scan of a log (the position and the current session).
+
+    Every anomaly is a tuple (offset, line, kind, detail) of the byte
+    offset and the number (from 1) of the line, the kind and a
+    description.
+    """
+    def __init__(self):
+        self.offset, self.number = 0, 0
+        self.session, self.lastTime, self.shift, self.previousHeader = -1, None, 0.0, False
+        # open press of every button: button -> (counter, offset, line number)
+        self.openPress = {}
+
+    def _startSession(self):
+        anomalies = self.end()
+        self.session, self.lastTime, self.shift = self.session + 1, None, 0.0
+        return anomalies
+
+    def end(self):
+        """Close the session, its open presses are orphans."""
+        orphans = [(o, n, 'orphanPress', 'press of '+button.decode('utf-8', 'replace')+' +'+str(counter)+' is not released')
+                   for button, (counter, o, n) in self.openPress.items()]
+        self.openPress.clear()
+        return sorted(orphans)
+
+    #%% one line
+    def line(self, line):
+        """Scan a line.
+
+        Arguments:
+            line: <bytes>
+                Line including its end of line.
+
+        Returns:
+            (kind, time, anomalies)
+                Kind of the line ('header', 'event', 'torn', 'tornHeader'
+                (a torn line followed by a header), 'duplicateHeader'), the
+                rebased time of an event (None otherwise) and the anomalies
+                found at the line.
+        """
+        offset, number = self.offset, self.number + 1
+        self.offset, self.number = offset + len(line), number
+        anomalies = []
+        text = line.rstrip(b'\r\n')
+        fields = text.split(b'\t')
+        kind, time = 'event', None
+        if(text == _header):
+            if(self.previousHeader):
+                kind = 'duplicateHeader'
+                anomalies.append((offset, number, 'duplicateHeader', 'session without events'))
+            else:
+                kind = 'header'
+                anomalies += self._startSession()
+        elif(text.endswith(_header)):
+            # a header appended to a torn line starts a session
+            kind = 'tornHeader'
+            anomalies.append((offset, number, 'torn', 'torn line followed by a header'))
+            anomalies += self._startSession()
+        elif(len(fields) != 4 or not line.endswith(b'\n')):
+            kind = 'torn'
+            anomalies.append((offset, number, 'torn', 'line of '+str(len(fields))+' fields'+('' if line.endswith(b'\n') else ' without end of line')))
+        else:
+            try:
+                time, event = float(fields[0]), int(fields[3])
+                if(event == 0 or time != time):
+                    raise ValueError
+            except ValueError:
+                kind = 'torn'
+                anomalies.append((offset, number, 'torn', 'unreadable time or event'))
+        if(kind == 'event'):
+            if(self.session < 0):
+                anomalies.append((offset, number, 'missingHeader', 'event before the first header'))
+                self.session = 0
+            time += self.shift
+            if(self.lastTime is not None and time < self.lastTime):
+                anomalies.append((offset, number, 'timeBackwards', 'time goes back by '+'{:.6f}'.format(self.lastTime - time)+' [s]'))
+                self.shift += self.lastTime - time
+                time = self.lastTime
+            self.lastTime = time
+            button = fields[2].strip()
+            if(event > 0):
+                if(button in self.openPress):
+                    counter, o, n = self.openPress[button]
+                    anomalies.append((o, n, 'orphanPress', 'press of '+button.decode('utf-8', 'replace')+' +'+str(counter)+' is pressed again'))
+                self.openPress[button] = (event, offset, number)
+            elif(self.openPress.get(button, (None,))[0] == -event):
+                del self.openPress[button]
+            else:
+                anomalies.append((offset, number, 'orphanRelease', 'release of '+button.decode('utf-8', 'replace')+' '+str(event)+' without its press'))
+        self.previousHeader = kind in ('header', 'tornHeader', 'duplicateHeader')
+        return kind, time, anomalies
+
+    #%% a chunk of valid events
+    def chunk(self, chunk):
+        """Scan a chunk of complete lines at once, if all are valid events.
+
+        The chunk is valid if it holds events of the current session only,
+        in ascending time, with every release directly following the
+        press of its key stroke. Otherwise the state is not changed and
+        the chunk has to be scanned line by line.
+
+        Arguments:
+            chunk: <bytes>
+                Lines ending by an end of line.
+
+        Returns:
+            <bool>
+                True: the chunk is valid and scanned
+        """
+        if(self.session < 0 or self.shift != 0 or b'Time' in chunk or b'\r' in chunk):
+            return False
+        lines = chunk.count(b'\n')
+        try:
+            df = pd.read_csv(io.BytesIO(chunk), sep='\t', header=None, names=['Time', 'Key', 'Button', 'Event'], index_col=False,
+                             usecols=['Time', 'Button', 'Event'], dtype={'Time': float, 'Button': 'category', 'Event': np.int64},
+                             quoting=csv.QUOTE_NONE, skip_blank_lines=False, na_filter=False, engine='c')
+        except (ValueError, pd.errors.ParserError):
+            return False
+        if(len(df) != lines):
+            return False
+        time, event = df['Time'].values, df['Event'].values
+        if(np.isnan(time).any() or (event == 0).any() or (np.diff(time) < 0).any()
+           or (self.lastTime is not None and time[0] < self.lastTime)):
+            return False
+        # button codes of the stripped names
+        names = df['Button'].cat.categories
+        remap, buttons = pd.factorize(np.array([name.strip().encode('utf-8') for name in names], dtype=object))
+        codes = remap[df['Button'].cat.codes.values]
+        # events of every button: press, release of the press, press, ...
+        order = np.argsort(codes, kind='stable')
+        code, value = codes[order], event[order]
+        first = np.ones(len(code), dtype=bool)
+        first[1:] = code[1:] != code[:-1]
+        press = value > 0
+        previous = np.roll(value, 1)
+        follows = ~first
+        if(not (press[follows] == (previous[follows] < 0)).all() or not (value[follows & ~press] == -previous[follows & ~press]).all()):
+            return False
+        for index in np.flatnonzero(first):
+            # the first event continues the key stroke open before the chunk
+            state = self.openPress.get(buttons[code[index]], None)
+            if((state is None) != press[index] or (state is not None and state[0] != -value[index])):
+                return False
+        # the chunk is valid, keep the key strokes open after the chunk
+        starts = np.zeros(lines, dtype=np.int64)
+        starts[1:] = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10)[:-1] + 1
+        last = np.ones(len(code), dtype=bool)
+        last[:-1] = code[1:] != code[:-1]
+        for index in np.flatnonzero(last):
+            button = buttons[code[index]]
+            if(press[index]):
+                line = int(order[index])
+                self.openPress[button] = (int(value[index]), self.offset + int(starts[line]), self.number + line + 1)
+            else:
+                self.openPress.pop(button, None)
+        self.lastTime = float(time[-1])
+        self.offset += len(chunk)
+        self.number += lines
+        self.previousHeader = False
+        return True
+
+    #%% a chunk of lines
+    def scan(self, chunk, minimumSize=65536):
+        """Scan a chunk of lines.
+
+        The chunk is checked at once, a chunk with an anomaly is split
+        in halves down to "minimumSize" bytes, which are scanned line
+        by line.
+
+        Arguments:
+            chunk: <bytes>
+                Lines (the last line may be torn).
+            minimumSize: <int>
+                65536: (default) bytes scanned line by line
+
+        Returns:
+            generator((line, kind, time, anomalies))
+                Lines of the chunk scanned line by line (see line(...)),
+                the valid parts are scanned at once and yielded as
+                (part, 'chunk', number of lines, []).
+        """
+        number = self.number
+        if(chunk.endswith(b'\n') and self.chunk(chunk)):
+            yield chunk, 'chunk', self.number - number, []
+        elif(len(chunk) > minimumSize):
+            middle = chunk.find(b'\n', len(chunk)//2) + 1
+            if(0 < middle < len(chunk)):
+                yield from self.scan(chunk[:middle], minimumSize)
+                yield from self.scan(chunk[middle:], minimumSize)
+                return
+            for line in chunk.splitlines(keepends=True):
+                yield (line,) + self.line(line)
+        else:
+            for line in chunk.splitlines(keepends=True):
+                yield (line,) + self.line(line)
+
+#%% chunks of a log
+def _chunks(f, chunkSize):
+    """Chunks of complete lines (the last chunk may end by a torn line)."""
+    rest = b''
+    while True:
+        data = f.read(chunkSize)
+        if(len(data) == 0):
+            if(len(rest) > 0):
+                yield rest
+            return
+        data = rest + data
+        cut = data.rfind(b'\n') + 1
+        rest = data[cut:]
+        if(cut > 0):
+            yield data[:cut]
+
+#%% validate
+def validateLog(path, maxAnomalies=100000, chunkSize=4194304):
+    """Validate a log of the logger.
+
+    The log is read once, chunk by chunk, in bounded memory.
+
+    Arguments:
+        path: <str>
+            Path to the text log.
+        maxAnomalies: <int>
+            100000: (default) number of anomalies kept in the report
+                (all anomalies are counted)
+        chunkSize: <int>
+            4194304: (default) bytes read at once
+
+    Raises:
+
+    Returns:
+        dict{'lines': <int>, 'sessions': <int>, 'events': <int>, 'bytes': <int>,
+             'counts': dict(<str>: <int>), 'anomalies': list((offset, line, kind, detail))}
+            Number of lines, sessions and valid events, size of the log,
+            count of every kind of anomaly and the anomalies (byte offset
+            and number of the line, kind, description) ordered by offset.
+    """
+    report = {'lines': 0, 'sessions': 0, 'events': 0, 'bytes': 0, 'counts': {}, 'anomalies': []}
+    counts, anomalies = report['counts'], report['anomalies']
+    def add(found):
+        for anomaly in found:
+            counts[anomaly[2]] = counts.get(anomaly[2], 0) + 1
+            if(len(anomalies) < maxAnomalies):
+                anomalies.append(anomaly)
+    scanner = _scanner()
+    with open(path, 'rb') as f:
+        for chunk in _chunks(f, chunkSize):
+            for line, kind, time, found in scanner.scan(chunk):
+                if(kind == 'chunk'):
+                    report['events'] += time
+                    continue
+                report['events'] += kind == 'event'
+                report['sessions'] += kind in ('header', 'tornHeader')
+                add(found)
+    add(scanner.end())
+    report['lines'], report['bytes'] = scanner.number, scanner.offset
+    # a missing header starts the first session
+    report['sessions'] += 'missingHeader' in counts
+    anomalies.sort()
+    return report
+
+#%% repair
+def repairLog(path, repairedPath, orphans='keep', chunkSize=4194304):
+    """Write a repaired copy of a log of the logger.
+
+    Torn lines, duplicate headers and sessions without events are
+    dropped, a missing header is added, the time of a session going
+    back (clock change) is rebased, so that it continues from the
+    previous event. The orphan presses and releases are kept (the
+    analytics does not pair them) or dropped, they are listed in the
+    report in both cases. The valid lines are copied byte by byte.
+
+    Arguments:
+        path: <str>
+            Path to the text log.
+        repairedPath: <str>
+            Path to the repaired copy.
+        orphans: <str>
+            'keep': (default) keep the orphan events
+            'drop': drop the orphan events
+        chunkSize: <int>
+            4194304: (default) bytes read at once
+
+    Raises:
+        Exception: unknown "orphans" or repairedPath is the path
+
+    Returns:
+        dict: the report of validateLog(path) with 'written' and 'dropped'
+            number of lines.
+    """
+    if(orphans not in ('keep', 'drop')):
+        raise Exception("validator.repairLog(..., orphans): unknown value <"+str(orphans)+">, use 'keep' or 'drop'.")
+    if(repairedPath == path):
+        raise Exception("validator.repairLog(path, repairedPath, ..): the repaired copy cannot overwrite the log.")
+    # the orphan presses are known after their session, the log is read twice
+    report = validateLog(path, maxAnomalies=sys.maxsize, chunkSize=chunkSize)
+    dropped = set()
+    if(orphans == 'drop'):
+        dropped = {anomaly[0] for anomaly in report['anomalies'] if anomaly[2] in ('orphanPress', 'orphanRelease')}
+    droppedSorted = np.array(sorted(dropped), dtype=np.int64)
+    counts = {'written': 0, 'copied': 0}
+    # the header is written with the first event of the session (no empty sessions)
+    header = {'pending': True, 'copied': False}
+    scanner = _scanner()
+    with open(path, 'rb') as f, open(repairedPath, 'wb') as out:
+        def emit(data, lines):
+            if(header['pending']):
+                out.write(_header + b'\n')
+                counts['written'] += 1
+                counts['copied'] += header['copied']
+                header['pending'] = False
+            out.write(data)
+            counts['written'] += lines
+            counts['copied'] += lines
+        for chunk in _chunks(f, chunkSize):
+            for line, kind, time, found in scanner.scan(chunk):
+                if(kind == 'chunk'):
+                    # valid events, copied unless an orphan is dropped
+                    start = scanner.offset - len(line)
+                    if(np.searchsorted(droppedSorted, start) == np.searchsorted(droppedSorted, scanner.offset)):
+                        emit(line, time)
+                        continue
+                    for event in line.splitlines(keepends=True):
+                        if(start not in dropped):
+                            emit(event, 1)
+                        start += len(event)
+                elif(kind in ('header', 'tornHeader')):
+                    header['pending'], header['copied'] = True, kind == 'header'
+                elif(kind == 'event' and scanner.offset - len(line) not in dropped):
+                    fields = line.rstrip(b'\r\n').split(b'\t')
+                    if(float(fields[0]) != time):
+                        # rebased time, formatted as by the logger
+                        fields[0] = '{:.6f}'.format(time).ljust(15).encode('ascii')
+                        line = b'\t'.join(fields) + b'\n'
+                    emit(line, 1)
+    report['written'] = counts['written']
+    report['dropped'] = report['lines'] - counts['copied']
+    return report
+
+#%% command line
+if __name__ == '__main__':
+    # python -m magpie_ml.validator log.txt [repaired.txt]
+    if(len(sys.argv) < 2):
+        print('usage: python -m magpie_ml.validator log.txt [repaired.txt]')
+        sys.exit(2)
+    if(len(sys.argv) > 2):
+        result = repairLog(sys.argv[1], sys.argv[2])
+    else:
+        result = validateLog(sys.argv[1])
+    for offset, number, kind, detail in result['anomalies'][:1000]:
+        print(('byte ' + str(offset)).ljust(18) + ('line ' + str(number)).ljust(14) + kind.ljust(16) + detail)
+    print(str(result['lines']) + ' lines, ' + str(result['sessions']) + ' sessions, ' + str(result['events']) + ' events, anomalies: ' + str(result['counts']))
+    if('written' in result):
+        print(str(result['written']) + ' lines written, ' + str(result['dropped']) + ' lines dropped')
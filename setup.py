@@ -18,5 +18,10 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
+    extras_require={
+        "parquet": ["pyarrow"],
+        "zstd": ["zstandard"],
+        "jit": ["numba"],
+    },
 )
\ No newline at end of file
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#%% Imports - test_durability
+import os
+import pytest
+from magpie_ml.durability import commitFile, recoverLog, journalPath
+from magpie_ml.layout import layout
+from magpie_ml.replay import replay
+from magpie_ml.synthetic import generator
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% DURABILITY %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Recovery of the text log after a crash of the logger: a torn tail is
+#   truncated, a corrupted batch truncates the log at its start and the
+#   journal of another log never truncates anything.
+
+def writeLog(path, rows=1000, batchSize=100, mode='w'):
+    """Rows written by group commit, every batch is committed."""
+    f = commitFile(path, mode, 'flush', batchSize, 10.0)
+    for i in range(rows):
+        f.write('%d\tk\tK\t%d\n' % (i, i + 1))
+    f.close()
+    return os.path.getsize(path)
+
+@pytest.fixture
+def keyboard():
+    keyboard = layout()
+    symbolToButton = keyboard.getSymbolToButtonDict()
+    buttons = [b for b in keyboard.getButtonList() if b in set(symbolToButton.values()) and b != 'Esc']
+    events = [list(generator(symbolToButton, buttons, seed=seed).events(500)) for seed in (0, 1)]
+    return symbolToButton, events
+
+#%% recovery of the log
+def test_recoverLog_clean(tmp_path):
+    path = str(tmp_path / 'log.txt')
+    size = writeLog(path)
+    assert recoverLog(path) == {'size': size, 'committed': size, 'truncated': 0, 'rejected': 0}
+
+def test_recoverLog_tornTail(tmp_path):
+    path = str(tmp_path / 'log.txt')
+    size = writeLog(path)
+    with open(path, 'ab') as f:
+        f.write(b'1000\tk\tK\t1001\n1001\tk\tK')
+    recovery = recoverLog(path)
+    # the complete row after the last batch is kept, the torn one is not
+    assert recovery == {'size': size + 14, 'committed': size, 'truncated': 8, 'rejected': 0}
+    assert os.path.getsize(path) == size + 14
+
+def test_recoverLog_corruptedBatch(tmp_path):
+    path = str(tmp_path / 'log.txt')
+    size = writeLog(path)
+    with open(path, 'rb+') as f:
+        f.seek(size - 20)
+        byte = f.read(1)
+        f.seek(size - 20)
+        f.write(bytes([byte[0] ^ 1]))
+    recovery = recoverLog(path)
+    assert recovery['rejected'] == 1 and recovery['size'] == recovery['committed'] < size
+    with open(path, 'rb') as f:
+        assert f.read().count(b'\n') == 900
+    # the recovered log is appended and recovered again
+    writeLog(path, rows=250, mode='a')
+    assert recoverLog(path)['truncated'] == 0
+
+def test_recoverLog_journalOfRewrittenLog(tmp_path):
+    # the log is written anew (same file), its journal is left behind
+    path = str(tmp_path / 'log.txt')
+    writeLog(path)
+    with open(path, 'w') as f:
+        f.write(''.join('%d\tx\tX\t%d\n' % (i, i + 1) for i in range(500)))
+    size = os.path.getsize(path)
+    recovery = recoverLog(path)
+    assert recovery['truncated'] == 0 and recovery['size'] == size
+    assert os.path.getsize(path) == size
+
+def test_recoverLog_journalOfAnotherLog(tmp_path):
+    path = str(tmp_path / 'log.txt')
+    writeLog(path)
+    os.replace(journalPath(path), journalPath(str(tmp_path / 'other.txt')))
+    writeLog(str(tmp_path / 'other.txt'), rows=10)
+    os.replace(journalPath(str(tmp_path / 'other.txt')), journalPath(path))
+    size = os.path.getsize(path)
+    assert recoverLog(path)['size'] == size
+
+#%% logger sessions
+def test_logger_bufferedLogAfterJournaledLog(tmp_path, keyboard):
+    # a journaled session, the log is removed, a buffered session and a new start
+    symbolToButton, events = keyboard
+    path = str(tmp_path / 'log.txt')
+    replay(symbolToButton, path=path, durability='flush').run(events[0])
+    os.remove(path)
+    replay(symbolToButton, path=path).run(events[1])
+    size = os.path.getsize(path)
+    session = replay(symbolToButton, path=path)
+    session.logger.start()
+    session.logger.stop()
+    assert session.logger.recovery['truncated'] == 0
+    assert os.path.getsize(path) >= size
+
+def test_logger_journaledSessions(tmp_path, keyboard):
+    symbolToButton, events = keyboard
+    path = str(tmp_path / 'log.txt')
+    for durability in ('flush', 'buffered', 'fsync'):
+        replay(symbolToButton, path=path, durability=durability).run(events[0])
+    size = os.path.getsize(path)
+    session = replay(symbolToButton, path=path, durability='flush')
+    session.logger.start()
+    assert session.logger.recovery == {'size': size, 'committed': session.logger.recovery['committed'], 'truncated': 0, 'rejected': 0}
+    session.logger.stop()
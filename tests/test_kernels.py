@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#%% Imports - test_kernels
+import numpy as np
+import pytest
+from magpie_ml import kernels, parallel
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%% KERNELS %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#   Parity of the compiled (numba) and numpy kernels, and of the partitioned
+#   kernels of the module parallel with the serial kernels. The compiled
+#   kernels are skipped without numba (pip install magpie_ml[jit]).
+
+#%% random logs
+def randomLog(seed, events=6000, buttonCount=12, sessions=3, orphans=0.05, interleave=False, counterScale=1):
+    """Session, button, event and time of a random log.
+
+    The counters restart in every session. A fraction "orphans" of the
+    events is dropped (presses or releases without a pair) and the same
+    fraction is logged twice (a counter seen twice).
+    """
+    rng = np.random.default_rng(seed)
+    parts = []
+    for s in range(sessions):
+        n = events // (2*sessions)
+        button = rng.integers(0, buttonCount, n)
+        press = np.cumsum(rng.exponential(0.1, n))
+        release = press + rng.exponential(0.08, n)
+        counter = np.zeros(n, dtype=np.int64)
+        for b in range(buttonCount):
+            counter[button == b] = np.arange(1, np.count_nonzero(button == b) + 1)
+        counter *= counterScale
+        rows = (np.full(2*n, s), np.concatenate((button, button)), np.concatenate((counter, -counter)), np.concatenate((press, release)))
+        kept = np.flatnonzero(rng.random(2*n) >= orphans)
+        twice = np.flatnonzero(rng.random(2*n) < orphans)
+        index = np.sort(np.concatenate((kept, twice)), kind='stable')
+        order = index[np.argsort(rows[3][index], kind='stable')]
+        parts.append(tuple(r[order] for r in rows))
+    session, button, event, time = (np.concatenate(c) for c in zip(*parts))
+    if(interleave):
+        # sessions are not in ascending order
+        order = np.argsort(time, kind='stable')
+        session, button, event, time = session[order], button[order], event[order], time[order]
+    return session, button, event, time
+
+logs = {'sessions':   dict(),
+        'one':        dict(sessions=1),
+        'orphans':    dict(orphans=0.3),
+        'interleave': dict(interleave=True),
+        'many':       dict(sessions=40, buttonCount=5)}
+
+def assertSamePairs(a, b):
+    tableA, offsetsA, pressA, releaseA = a
+    tableB, offsetsB, pressB, releaseB = b
+    for name in kernels.pairedDtype.names:
+        np.testing.assert_array_equal(tableA[name], tableB[name])
+    np.testing.assert_array_equal(offsetsA, offsetsB)
+    np.testing.assert_array_equal(pressA, pressB)
+    np.testing.assert_array_equal(releaseA, releaseB)
+
+def assertSameStatistics(a, b):
+    np.testing.assert_array_equal(a[2], b[2])
+    np.testing.assert_allclose(a[0], b[0], rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(a[1], b[1], rtol=1e-7, atol=1e-12)
+
+@pytest.fixture
+def backends():
+    """Results of a call with the numpy and with the numba backend."""
+    pytest.importorskip('numba')
+    if(kernels._jit is None):
+        pytest.skip('the compiled kernels are not available')
+    backend = kernels.backend
+    def run(function):
+        results = []
+        for name in ('numpy', 'numba'):
+            kernels.setBackend(name)
+            results.append(function())
+        return results
+    yield run
+    kernels.setBackend(backend)
+
+@pytest.fixture
+def smallPartitions(monkeypatch):
+    monkeypatch.setattr(parallel, 'minimumPartition', 256)
+
+#%% compiled vs numpy kernels
+@pytest.mark.parametrize('log', logs)
+def test_pairPressRelease_backends(backends, log):
+    session, button, event, time = randomLog(1, **logs[log])
+    numpyResult, numbaResult = backends(lambda: kernels.pairPressRelease(session, button, event, time, 12))
+    assertSamePairs(numpyResult, numbaResult)
+    assert len(numpyResult[0]) > 0
+
+def test_pairPressRelease_fallback(backends):
+    # counters far above the number of events, the compiled loop gives up
+    session, button, event, time = randomLog(2, counterScale=10**9)
+    assert kernels._jit.pairPressRelease(session, button.astype(np.int64), event, 12) is None
+    numpyResult, numbaResult = backends(lambda: kernels.pairPressRelease(session, button, event, time, 12))
+    assertSamePairs(numpyResult, numbaResult)
+
+@pytest.mark.parametrize('pairFirst', [False, True])
+@pytest.mark.parametrize('timeLimit', [0.15, np.inf])
+def test_transitionStatistics_backends(backends, pairFirst, timeLimit):
+    session, button, event, time = randomLog(3)
+    pressed = event > 0
+    numpyResult, numbaResult = backends(lambda: kernels.transitionStatistics(button[pressed], time[pressed], 12, timeLimit, pairFirst))
+    assertSameStatistics(numpyResult, numbaResult)
+
+#%% merge of partial statistics
+def test_mergeStatistics():
+    rng = np.random.default_rng(4)
+    cell = rng.integers(0, 20, 1000)
+    values = rng.normal(1.0, 0.2, 1000)
+    for split in (0, 1, 500, 999, 1000):
+        merged = kernels.mergeStatistics(kernels.cellStatistics(cell[:split], values[:split], 20),
+                                         kernels.cellStatistics(cell[split:], values[split:], 20))
+        assertSameStatistics(merged, kernels.cellStatistics(cell, values, 20))
+
+#%% partitioned vs serial kernels
+@pytest.mark.parametrize('log', logs)
+@pytest.mark.parametrize('processes', [2, 3])
+def test_parallel_pairPressRelease(smallPartitions, log, processes):
+    session, button, event, time = randomLog(5, **logs[log])
+    assertSamePairs(parallel.pairPressRelease(session, button, event, time, 12, processes),
+                    kernels.pairPressRelease(session, button, event, time, 12))
+
+@pytest.mark.parametrize('pairFirst', [False, True])
+@pytest.mark.parametrize('processes', [2, 3])
+def test_parallel_transitionStatistics(smallPartitions, pairFirst, processes):
+    session, button, event, time = randomLog(6)
+    pressed = event > 0
+    assertSameStatistics(parallel.transitionStatistics(button[pressed], time[pressed], 12, 0.15, pairFirst, processes),
+                         kernels.transitionStatistics(button[pressed], time[pressed], 12, 0.15, pairFirst))
+
+#%% key rollover
+def test_rolloverMatrices_heldModifier():
+    # shift (0) held over A, B and C (1, 2, 3), D (4) after the release of C
+    button = np.array([0, 1, 2, 3, 4])
+    timeIn = np.array([0.0, 0.1, 0.3, 0.5, 1.0])
+    timeOut = np.array([0.9, 0.2, 0.4, 0.95, 1.1])
+    overlap, rollovers, strokes, overlapping = kernels.rolloverMatrices(button, timeIn, timeOut, 5)
+    np.testing.assert_array_equal(rollovers[:, 0], [0, 1, 1, 1, 0])
+    np.testing.assert_allclose(overlap[1:4, 0], [0.1, 0.1, 0.4])
+    assert rollovers[4].sum() == 0 and overlapping == 3
+
+def test_rolloverMatrices_sweep():
+    # every key stroke held down at a press, compared with all pairs
+    rng = np.random.default_rng(7)
+    timeIn = np.round(np.cumsum(rng.exponential(0.1, 400)), 2)
+    timeOut = timeIn + np.round(rng.exponential(0.12, 400), 2)
+    button = rng.integers(0, 6, 400)
+    overlap, rollovers, strokes, overlapping = kernels.rolloverMatrices(button, timeIn, timeOut, 6)
+    order = np.argsort(timeIn, kind='stable')
+    rank = np.empty(400, dtype=int)
+    rank[order] = np.arange(400)
+    periods = np.minimum(timeOut[:, None], timeOut[None, :]) - timeIn[:, None]
+    pairs = (rank[None, :] < rank[:, None]) & (timeOut[None, :] > timeIn[:, None]) & (periods > 0)
+    count, total = np.zeros((6, 6)), np.zeros((6, 6))
+    y, x = np.nonzero(pairs)
+    np.add.at(count, (button[y], button[x]), 1)
+    np.add.at(total, (button[y], button[x]), periods[y, x])
+    np.testing.assert_array_equal(rollovers, count)
+    with np.errstate(invalid='ignore'):
+        np.testing.assert_allclose(overlap, total / count)
+    assert overlapping == len(np.unique(y))
+    time, keysDown, timeAtKeysDown = kernels.concurrencyTimeline(timeIn, timeOut)
+    assert keysDown.min() >= 0
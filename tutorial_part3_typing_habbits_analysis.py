@@ -197,34 +197,41 @@ plt.show()
 #   The dictionary will take the buttons, and store the relation 
 #   in between the buttons. In this case, the relation is the mean 
 #   time of transition from one button to another.
+#   The hand of every analysed button (0 - left, 1 - right) is aligned 
+#   to the rows and columns of the matrix Mmean, so that the transitions 
+#   between the hands are selected by a mask instead of testing every 
+#   pair of buttons.
+hand = layout.getHandIndex(buttonAnalysis)
+#   Transitions shorter than minTransitionPeriod are not plotted (NaN).
+lineWidth = np.where(Mmean > minTransitionPeriod, (Mmean - minTransitionPeriod)/maxTransitionPeriod + 0.1, np.nan)
+
 meanTransitionLeftGivenRight = {}
-for r in range(len(buttonAnalysis)):
-    for l in range(len(buttonAnalysis)):
-        buttonR, buttonL = buttonAnalysis[r], buttonAnalysis[l]
-        if ( buttonR in layout.rightHandButtons and buttonL in layout.leftHandButtons ):
-            lineColor = 'black'
-            if(Mmean[l, r] > minTransitionPeriod):
-                normalizedValue = ( Mmean[l, r]- minTransitionPeriod )/maxTransitionPeriod
-                lineWidth = (normalizedValue+0.1)/2
-                meanTransitionLeftGivenRight[buttonR, buttonL] = ( lineWidth, lineColor )
-            else:
-                meanTransitionLeftGivenRight[buttonR, buttonL] = ( np.nan, lineColor )
-            
+for l, r in zip(*np.nonzero((hand[:, None] == 0) & (hand[None, :] == 1))):
+    meanTransitionLeftGivenRight[buttonAnalysis[r], buttonAnalysis[l]] = ( lineWidth[l, r]/2, 'black' )
+
 meanTransitionRightGivenLeft = {}
-for r in range(len(buttonAnalysis)):
-    for l in range(len(buttonAnalysis)):
-        buttonR, buttonL = buttonAnalysis[r], buttonAnalysis[l]
-        if ( buttonR in layout.rightHandButtons and buttonL in layout.leftHandButtons ):
-            lineColor = 'black'
-            if(Mmean[r, l] > minTransitionPeriod):
-                normalizedValue = ( Mmean[r, l]- minTransitionPeriod )/maxTransitionPeriod
-                lineWidth = (normalizedValue+0.1)/3
-                meanTransitionRightGivenLeft[buttonL, buttonR] = ( lineWidth , lineColor )
-            else:
-                meanTransitionRightGivenLeft[buttonL, buttonR] = ( np.nan, lineColor )
+for r, l in zip(*np.nonzero((hand[:, None] == 1) & (hand[None, :] == 0))):
+    meanTransitionRightGivenLeft[buttonAnalysis[l], buttonAnalysis[r]] = ( lineWidth[r, l]/3, 'black' )
             
 #   Add to the 2D layout - ax1
 layout.plotButtonRelations(ax1, meanTransitionLeftGivenRight)
 #   Add to the 2D layout - ax2
 layout.plotButtonRelations(ax2, meanTransitionRightGivenLeft)
 
+
+
+#%% Hand and finger statistics
+#   The comparison of the hands does not need the matrices at all. 
+#   Analytics aggregates the key strokes directly by the groups of buttons 
+#   (hands or fingers) and returns the dwell time of every group and 
+#   the transitions between the groups (the element [Y, X] relates 
+#   the preceding group X to the current group Y).
+handStatistics = analytics.getGroupStatistics(hand, maxTransitionPeriod, buttonAnalysis)
+dwellMean, dwellVar, dwellCount = handStatistics['dwell']
+transitionMean, transitionVar, transitionCount = handStatistics['transitions']
+print('Mean time of press [ms]:       left hand '+'{:.1f}'.format(dwellMean[0]*1000)+', right hand '+'{:.1f}'.format(dwellMean[1]*1000))
+print('Mean time of transition [ms]:  left->right '+'{:.1f}'.format(transitionMean[1, 0]*1000)+', right->left '+'{:.1f}'.format(transitionMean[0, 1]*1000))
+
+#   Transitions typed by the same finger are usually the slowest ones.
+fingerStatistics = analytics.getGroupStatistics(layout.getFingerIndex(buttonAnalysis), maxTransitionPeriod, buttonAnalysis)
+print('Mean time of transition [ms]:  same finger '+'{:.1f}'.format(fingerStatistics['sameGroup'][0]*1000)+', other finger '+'{:.1f}'.format(fingerStatistics['otherGroup'][0]*1000))